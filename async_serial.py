@@ -0,0 +1,262 @@
+'''
+    asyncio 串口后端
+    AsyncSerialOperator 提供 async open/read_frame/write/close，
+    QtAsyncioBridge 在 Qt 主线程中驱动 asyncio 事件循环，串口协程、定时器和界面更新在同一线程中协作运行；
+    SerialController.RECEIVE_BACKEND 为 'asyncio' 时各串口由 get_qt_asyncio_bridge() 的事件循环接收
+'''
+import heapq
+import asyncio
+import selectors
+
+import serial
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, Qt
+
+from model import SerialModel
+from logger import logger
+
+
+class _QtDrivenEventLoop(asyncio.SelectorEventLoop):
+    '''
+    由 QtAsyncioBridge 逐轮驱动的事件循环：有新回调或新定时器时通知桥接对象安排下一轮。
+    '''
+    def __init__(self, selector, bridge):
+        self._bridge = bridge
+        super().__init__(selector)
+
+    def call_soon(self, callback, *args, context=None):
+        handle = super().call_soon(callback, *args, context=context)
+        self._bridge.schedule_step(self.time())
+        return handle
+
+    def call_at(self, when, callback, *args, context=None):
+        handle = super().call_at(when, callback, *args, context=context)
+        self._bridge.schedule_step(when)
+        return handle
+
+
+class QtAsyncioBridge(QObject):
+    '''
+    把 asyncio 事件循环嵌入 Qt 事件循环。
+
+    事件循环的 selector（Linux 下为 epoll）本身的文件描述符由 QSocketNotifier 监听，
+    任何串口可读时 Qt 都会唤醒并运行一轮 asyncio；call_soon/call_later 通过单次 QTimer 安排下一轮。
+    selector 没有文件描述符的平台（Windows）退化为按 POLL_INTERVAL_MS 定时运行。
+
+    用法:
+        app = QApplication(sys.argv)
+        bridge = QtAsyncioBridge()
+        bridge.loop.create_task(coroutine())
+        app.exec_()
+    '''
+    POLL_INTERVAL_MS = 10
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._selector = selectors.DefaultSelector()
+        self.loop = _QtDrivenEventLoop(self._selector, self)
+        asyncio.set_event_loop(self.loop)
+        self._deadlines = []    # 已安排的定时器到期时间（最小堆）
+        self._step_timer = QTimer(self)
+        self._step_timer.setSingleShot(True)
+        self._step_timer.setTimerType(Qt.PreciseTimer)
+        self._step_timer.timeout.connect(self._step)
+        self._notifier = None
+        self._poll_timer = None
+        fileno = getattr(self._selector, 'fileno', None)
+        if fileno is not None:
+            self._notifier = QSocketNotifier(fileno(), QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self._step)
+        else:
+            self._poll_timer = QTimer(self)
+            self._poll_timer.timeout.connect(self._step)
+            self._poll_timer.start(self.POLL_INTERVAL_MS)
+        logger.debug('asyncio 事件循环已接入 Qt 事件循环')
+
+    def schedule_step(self, when):
+        '''
+        安排在 loop.time() 为 when 时运行一轮事件循环。
+        '''
+        heapq.heappush(self._deadlines, when)
+        if self._deadlines[0] == when:
+            self._restart_timer()
+
+    def _restart_timer(self):
+        if not self._deadlines:
+            self._step_timer.stop()
+            return
+        delay_ms = max(0, int((self._deadlines[0] - self.loop.time()) * 1000 + 0.999))
+        if not self._step_timer.isActive() or self._step_timer.remainingTime() > delay_ms:
+            self._step_timer.start(delay_ms)
+
+    def _step(self, *args):
+        loop = self.loop
+        if loop.is_running() or loop.is_closed():
+            return
+        # 先弹出已到期的时间点，本轮运行中新安排的回调会重新加入
+        now = loop.time()
+        while self._deadlines and self._deadlines[0] <= now:
+            heapq.heappop(self._deadlines)
+        # 放入一个 stop 回调，run_forever 只以零超时轮询一次 selector 并运行一轮就返回
+        asyncio.SelectorEventLoop.call_soon(loop, loop.stop)
+        loop.run_forever()
+        self._restart_timer()
+
+    def close(self):
+        '''
+        停止驱动并关闭事件循环。
+        '''
+        self._step_timer.stop()
+        if self._notifier:
+            self._notifier.setEnabled(False)
+        if self._poll_timer:
+            self._poll_timer.stop()
+        self.loop.close()
+
+
+class AsyncSerialOperator:
+    '''
+    串口操作类的 asyncio 版本，所有串口共享一个事件循环，不需要为每个串口创建线程。
+    打开串口可能阻塞较长时间，放到线程池中执行；读取通过 loop.add_reader 等待串口可读。
+    帧重组、丢帧统计和帧格式上限都由 SerialModel 负责，与接收线程、串口反应器使用同一套处理，
+    帧长为插件型号的帧长时按 model.frame_limits（型号注册表中该型号的帧格式）检查。
+
+    :param model: 使用的 SerialModel，可以是已经打开串口的（由接收线程打开后交给事件循环接收）
+    '''
+    def __init__(self, model=None):
+        self.model = model or SerialModel()
+        self._frames = []       # 已解析但尚未取走的帧
+        self._reader = None     # (loop, fd, future)，正在等待可读的文件描述符
+
+    @property
+    def operator(self):
+        return self.model.serial
+
+    @property
+    def port(self):
+        return self.model.serial.port
+
+    @property
+    def is_open(self):
+        return self.model.is_serial_open()
+
+    async def open(self, port, **options):
+        '''
+        打开串口（由串口池管理）。
+
+        :param options: 传给 SerialOperator.open_serial_port 的其他参数，例如 baudrate=115200
+        :return: 若成功打开串口，返回 True；若打开失败，返回 False
+        '''
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, lambda: self.model.open_serial_port(port, **options))
+        self._frames.clear()
+        return result
+
+    async def read_frame(self, size, timeout=None):
+        '''
+        读取一帧完整数据。返回的 memoryview 只在下一次调用 read_frame 之前有效。
+
+        :param size: 一帧的字节数
+        :param timeout: 超时时间，单位为秒，None 表示一直等待
+        :return: (frame, timestamp_ns)，timestamp_ns 为帧到达时刻 time.monotonic_ns()；超时返回 None
+        :raises serial.SerialException: 串口断开或未打开
+        '''
+        try:
+            return await asyncio.wait_for(self._next_frame(size), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def read_frames(self, size):
+        '''
+        等待串口可读，读取已到达的数据并重组成完整帧。
+
+        :param size: 一帧的字节数
+        :return: (frames, message)，同 SerialModel.receive_data_with_message
+        :raises serial.SerialException: 串口断开或未打开
+        '''
+        data = await self._read_available(size)
+        return self.model.process_data(data, size)
+
+    async def _next_frame(self, size):
+        while not self._frames:
+            frames, _ = await self.read_frames(size)
+            self._frames.extend(frames)
+        return self._frames.pop(0)
+
+    async def _read_available(self, size):
+        loop = asyncio.get_running_loop()
+        serial_operator = self.model.serial
+        fd = serial_operator.fileno()
+        if fd is None:
+            if not self.is_open:
+                raise serial.SerialException('serial port is not open')
+            # 没有文件描述符（Windows）时在线程池中阻塞读取
+            return await loop.run_in_executor(None, serial_operator.receive_frame, size)
+        while True:
+            # 先等待可读再读取：VMIN=0 的串口在没有数据时 read 也返回空，无法与断开区分
+            ready = loop.create_future()
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+            self._reader = (loop, fd, ready)
+            try:
+                await ready
+            finally:
+                self.cancel()
+            data = serial_operator.receive_available()
+            if data:
+                return data
+
+    def cancel(self):
+        '''
+        立即停止等待串口可读（从事件循环注销文件描述符），之后可以安全关闭串口；
+        正在等待的 read_frame/read_frames 抛出 CancelledError。必须在事件循环所在的线程中调用。
+        '''
+        reader, self._reader = self._reader, None
+        if reader:
+            loop, fd, ready = reader
+            loop.remove_reader(fd)
+            ready.cancel()
+
+    async def write(self, data):
+        '''
+        发送数据，数据放入发送队列后立即返回，由发送线程写出。
+
+        :return: 放入发送队列的字节数
+        '''
+        return self.model.serial.send_data(data)
+
+    async def close(self):
+        '''
+        关闭串口。
+        '''
+        self.cancel()
+        self._frames.clear()
+        self.model.close_serial_port()
+
+
+async def stream_frames(operator: AsyncSerialOperator, size, on_frame):
+    '''
+    持续读取帧并交给 on_frame(frame, timestamp_ns) 处理，串口断开时结束。
+
+    :param operator: 已打开的 AsyncSerialOperator
+    :param size: 一帧的字节数
+    :param on_frame: 帧回调，在 Qt 主线程中执行，可以直接更新界面
+    '''
+    while operator.is_open:
+        try:
+            frame, timestamp_ns = await operator.read_frame(size)
+        except serial.SerialException as e:
+            logger.warning('串口 %s 读取结束: %s', operator.port, e)
+            break
+        on_frame(frame, timestamp_ns)
+
+
+_bridge = None
+
+
+def get_qt_asyncio_bridge():
+    '''
+    获取全局共享的 QtAsyncioBridge，第一次获取时创建，必须在 Qt 主线程中调用。
+    '''
+    global _bridge
+    if _bridge is None:
+        _bridge = QtAsyncioBridge()
+    return _bridge
@@ -0,0 +1,844 @@
+'''
+    benchmark.py
+    串口接收链路的性能测量脚本（仅 Linux，使用伪终端模拟串口，不需要真实硬件）
+
+    用法: python benchmark.py reactor [--ports 1 8 64] [--rate 10] [--duration 5]
+          python benchmark.py alloc [--frames 20000]
+          python benchmark.py pipeline [--devices 8] [--rate 1000] [--duration 5] [--noise 0.001] [--framed crc16] ...
+          python benchmark.py transport [--frames 2000] [--megabytes 4]
+          python benchmark.py poll [--windows 1 2 4 8] [--delay 0.002] [--duration 3]
+          python benchmark.py open [--ports 48] [--timeout 2]
+          python benchmark.py decode [--frames 200000] [--invalid 0.01] [--batch 4096]
+          python benchmark.py signal [--frames 50000]
+          python benchmark.py detect [--devices 50] [--rates 10 100 1000]
+          python benchmark.py plugins [--plugins 200]
+          python benchmark.py framing [--frames 100000] [--corrupt 0.01] [--noise 0.001]
+          python benchmark.py backend [--ports 1 8 64] [--rate 10] [--duration 5] [--backends thread reactor asyncio]
+'''
+import os
+import sys
+import time
+import tty
+import random
+import logging
+import resource
+import socket
+import argparse
+import threading
+import statistics
+import tempfile
+import tracemalloc
+
+from PyQt5.QtCore import QCoreApplication, QObject, QEventLoop, QTimer, pyqtSignal, pyqtSlot
+
+from serial_handle import SerialOperator
+from serial_reactor import SerialReactor
+from frame_assembler import FrameAssembler, FRAME_LIMITS, make_range_validator
+from device_simulator import DeviceSimulator, FrameGenerator
+from frame_schema import SCHEMAS, np
+from model import SerialModel
+from device_registry import DeviceRegistry
+from framed_protocol import FramedProtocol, FramedAssembler, crc8, crc16
+from port_pool import PortPool, get_port_pool
+from logger import logger
+
+FRAME_10 = bytes([60, 50, 30, 60, 90, 20, 50, 10, 50, 10])
+
+
+def open_pty_ports(count):
+    '''
+    创建 count 对伪终端，并用 SerialOperator 打开从端。
+
+    :return: (主端文件描述符列表, 已打开的 SerialOperator 列表)
+    '''
+    masters, operators = [], []
+    for _ in range(count):
+        master, slave = os.openpty()
+        tty.setraw(master)
+        operator = SerialOperator()
+        operator.open_serial_port(os.ttyname(slave))
+        os.close(slave)
+        masters.append(master)
+        operators.append(operator)
+    return masters, operators
+
+
+def close_pty_ports(masters, operators):
+    for operator in operators:
+        operator.close_serial_port()
+    for master in masters:
+        os.close(master)
+
+
+class FrameFeeder(threading.Thread):
+    '''
+    按固定帧率向所有伪终端主端写入帧，模拟下位机持续上报数据。
+    '''
+    def __init__(self, masters, rate, frame=FRAME_10):
+        super().__init__(daemon=True)
+        self.masters = masters
+        self.period = 1 / rate
+        self.frame = frame
+        self.frames_sent = 0
+        self._running = True
+
+    def run(self):
+        next_time = time.perf_counter()
+        while self._running:
+            for master in self.masters:
+                os.write(master, self.frame)
+            self.frames_sent += 1
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def stop(self):
+        self._running = False
+        self.join()
+
+
+def measure(run, duration):
+    '''
+    运行 run(stop_event) duration 秒，统计本进程消耗的 CPU 时间和上下文切换次数。
+
+    :return: (CPU 秒数, 上下文切换次数, run 的返回值)
+    '''
+    stop_event = threading.Event()
+    result = {}
+    start = resource.getrusage(resource.RUSAGE_SELF)
+    worker = threading.Thread(target=lambda: result.setdefault('value', run(stop_event)))
+    worker.start()
+    time.sleep(duration)
+    stop_event.set()
+    worker.join()
+    end = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (end.ru_utime - start.ru_utime) + (end.ru_stime - start.ru_stime)
+    switches = (end.ru_nvcsw - start.ru_nvcsw) + (end.ru_nivcsw - start.ru_nivcsw)
+    return cpu, switches, result.get('value')
+
+
+def run_thread_per_port(operators, blocking):
+    '''
+    每个串口一个接收线程：blocking=False 为 in_waiting 轮询 + sleep(0.1)，True 为阻塞整帧接收。
+
+    :return: 返回一个 run(stop_event) 函数，结果为 (唤醒次数, 接收字节数)
+    '''
+    def run(stop_event):
+        counters = [[0, 0] for _ in operators]
+
+        def loop(operator, counter):
+            while not stop_event.is_set():
+                if blocking:
+                    data = operator.receive_frame(len(FRAME_10), timeout=0.5)
+                else:
+                    data = operator.receive_data()
+                    time.sleep(0.1)
+                counter[0] += 1
+                counter[1] += len(data)
+
+        threads = [threading.Thread(target=loop, args=(operator, counter))
+                   for operator, counter in zip(operators, counters)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(c[0] for c in counters), sum(c[1] for c in counters)
+    return run
+
+
+def run_reactor(operators):
+    '''
+    单个反应器线程服务所有串口。
+
+    :return: 返回一个 run(stop_event) 函数，结果为 (唤醒次数, 接收字节数)
+    '''
+    def run(stop_event):
+        reactor = SerialReactor()
+        for operator in operators:
+            reactor.register(operator, lambda data, timestamp_ns: None)
+        reactor.start()
+        stop_event.wait()
+        reactor.close()
+        return reactor.wakeups, reactor.bytes_received
+    return run
+
+
+def bench_reactor(args):
+    '''
+    对比每串口一个线程与单反应器线程在不同串口数量下的 CPU 占用与唤醒次数。
+    '''
+    print(f'{"ports":>5} {"model":>14} {"cpu(s)":>8} {"cpu%":>6} {"wakeups/s":>10} {"ctxsw/s":>9} {"bytes":>9}')
+    models = [
+        ('thread+sleep', lambda ops: run_thread_per_port(ops, blocking=False)),
+        ('thread+block', lambda ops: run_thread_per_port(ops, blocking=True)),
+        ('reactor', run_reactor),
+    ]
+    for count in args.ports:
+        for name, factory in models:
+            masters, operators = open_pty_ports(count)
+            feeder = FrameFeeder(masters, args.rate)
+            feeder.start()
+            cpu, switches, (wakeups, received) = measure(factory(operators), args.duration)
+            feeder.stop()
+            close_pty_ports(masters, operators)
+            print(f'{count:>5} {name:>14} {cpu:>8.3f} {cpu / args.duration * 100:>5.1f}% '
+                  f'{wakeups / args.duration:>10.1f} {switches / args.duration:>9.1f} {received:>9}')
+
+
+def bench_alloc(args):
+    '''
+    对比 bytes 读取与 readinto 预分配缓冲区两种接收方式的单帧耗时和内存分配。
+    '''
+    size = len(FRAME_10)
+    masters, operators = open_pty_ports(1)
+    master, operator = masters[0], operators[0]
+
+    def read_bytes(assembler):
+        data = operator.receive_frame(size)
+        return assembler.feed(data, len(data) < size, operator.last_receive_ns)
+
+    def read_into(assembler):
+        buffer = assembler.buffer
+        need = size - len(buffer) % size
+        received = operator.receive_into(buffer.writable(size), need)
+        buffer.commit(received)
+        return assembler.process(received < need, operator.last_receive_ns)
+
+    print(f'{"path":>10} {"us/frame":>9} {"alloc B/frame":>14}')
+    for name, receive in (('bytes', read_bytes), ('readinto', read_into)):
+        assembler = FrameAssembler(size, make_range_validator(FRAME_LIMITS[size]))
+        # 耗时（不开启 tracemalloc）
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            os.write(master, FRAME_10)
+            receive(assembler)
+        elapsed = (time.perf_counter() - start) / args.frames * 1e6
+        # 每帧分配：tracemalloc 记录单帧处理过程中临时对象占用的内存峰值
+        tracemalloc.start()
+        peak_total = 0
+        for _ in range(args.frames // 10):
+            os.write(master, FRAME_10)
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            receive(assembler)
+            peak_total += tracemalloc.get_traced_memory()[1] - current
+        tracemalloc.stop()
+        print(f'{name:>10} {elapsed:>9.2f} {peak_total / (args.frames // 10):>14.1f}')
+    close_pty_ports(masters, operators)
+
+
+def bench_pipeline(args):
+    '''
+    用虚拟下位机压测完整接收链路：每个设备一个 SerialModel 阻塞接收并重组帧，
+    统计解析出的帧率、重新同步次数和 CPU 占用。
+    '''
+    simulator = DeviceSimulator()
+    framing = FramedProtocol(args.framed) if args.framed else None
+    for _ in range(args.devices):
+        simulator.add_device(args.type, args.rate, args.invalid, args.partial, args.noise,
+                             framing=framing, corrupt_rate=args.corrupt)
+    models = []
+    for device in simulator.devices:
+        model = SerialModel()
+        model.framing = framing
+        model.open_serial_port(device.port)
+        models.append(model)
+    frame_size = simulator.devices[0].generator.frame_size
+
+    def run(stop_event):
+        counts = [0] * len(models)
+
+        def loop(index, model):
+            while not stop_event.is_set():
+                frames, _ = model.receive_frame_with_message(frame_size)
+                counts[index] += len(frames)
+
+        threads = [threading.Thread(target=loop, args=(i, model)) for i, model in enumerate(models)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts
+
+    simulator.start()
+    cpu, switches, counts = measure(run, args.duration)
+    simulator.stop()
+    sent = sum(device.frames_sent for device in simulator.devices)
+    print(f'devices {args.devices} x {args.rate:.0f} Hz, {args.duration:.0f}s, framing {args.framed or "raw"}')
+    print(f'frames sent {sent}, decoded {sum(counts)} ({sum(counts) / args.duration:.0f}/s), '
+          f'partial {sum(d.partial_frames for d in simulator.devices)}, '
+          f'dropped by pty {sum(d.frames_dropped for d in simulator.devices)}')
+    print(f'resyncs {sum(m.assembler.resyncs for m in models if m.assembler)}, '
+          f'discarded bytes {sum(m.assembler.discarded_bytes for m in models if m.assembler)}')
+    if framing:
+        print(f'corrupted frames sent {sum(d.corrupted_frames for d in simulator.devices)}, '
+              f'crc failures {sum(m.frame_stats()["crc_failures"] for m in models)}')
+    print(f'cpu {cpu:.3f}s ({cpu / args.duration * 100:.1f}%), ctxsw/s {switches / args.duration:.0f}')
+    for model in models:
+        model.close_serial_port()
+    simulator.close()
+
+
+def open_transport(name):
+    '''
+    打开一种传输并返回 (SerialOperator, 写入函数, 清理函数)，写入函数模拟下位机发送数据。
+    pty: 本地伪终端；socket: 本机 TCP（相当于串口服务器的原始 TCP 端口）；loop: pyserial 回环。
+    '''
+    operator = SerialOperator()
+    if name == 'pty':
+        master, slave = os.openpty()
+        tty.setraw(master)
+        operator.open_serial_port(os.ttyname(slave))
+        os.close(slave)
+
+        def cleanup():
+            operator.close_serial_port()
+            os.close(master)
+        return operator, lambda data: os.write(master, data), cleanup
+    if name == 'socket':
+        server = socket.create_server(('127.0.0.1', 0))
+        operator.open_serial_port(f'socket://127.0.0.1:{server.getsockname()[1]}', low_latency=True)
+        client, _ = server.accept()
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def cleanup():
+            operator.close_serial_port()
+            client.close()
+            server.close()
+        return operator, client.sendall, cleanup
+    operator.open_serial_port('loop://')
+
+    def write(data):
+        # send_data 只是放入发送队列，等待写出，避免吞吐量测量时队列溢出
+        operator.send_data(data)
+        operator.wait_write_drained()
+    return operator, write, operator.close_serial_port
+
+
+def bench_transport(args):
+    '''
+    对比本地伪终端与 pyserial URL 传输（socket://、loop://）的单帧延迟和吞吐量。
+    延迟为写入一帧到 receive_into 收齐整帧的时间；吞吐量为写入线程尽快发送时接收端的速率。
+    '''
+    size = len(FRAME_10)
+    chunk = 4096
+    total = int(args.megabytes * 1024 * 1024)
+    line_rate = 115200 / 10     # 115200 8N1 每秒字节数
+    print(f'{"transport":>9} {"p50 us":>8} {"p99 us":>8} {"MB/s":>8} {"x 115200 8N1":>13}')
+    for name in args.transports:
+        operator, write, cleanup = open_transport(name)
+        buffer = memoryview(bytearray(max(size, chunk)))
+        latencies = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            write(FRAME_10)
+            received = 0
+            while received < size:
+                received += operator.receive_into(buffer[received:], size - received, 1, None)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+        payload = bytes(chunk)
+        writer = threading.Thread(target=lambda: [write(payload) for _ in range(total // chunk)])
+        start = time.perf_counter()
+        writer.start()
+        received = 0
+        while received < total:
+            data = operator.receive_frame(chunk, timeout=1, inter_byte_timeout=None)
+            if not data:
+                break
+            received += len(data)
+        elapsed = time.perf_counter() - start
+        writer.join()
+        cleanup()
+        rate = received / elapsed
+        print(f'{name:>9} {statistics.median(latencies) * 1e6:>8.1f} '
+              f'{latencies[int(len(latencies) * 0.99)] * 1e6:>8.1f} {rate / 1e6:>8.2f} {rate / line_rate:>13.0f}')
+
+
+def bench_poll(args):
+    '''
+    轮询模式下不同在途请求数（流水线深度）的采样率和往返时间，虚拟下位机每个查询延迟 --delay 秒回复。
+    '''
+    command = b'\x01'
+    print(f'{"window":>6} {"samples/s":>10} {"srtt ms":>8} {"min ms":>7} {"max ms":>7} {"timeouts":>8} {"cpu%":>6}')
+    for window in args.windows:
+        simulator = DeviceSimulator()
+        device = simulator.add_device(args.type, poll_command=command, response_delay=args.delay)
+        model = SerialModel()
+        model.open_serial_port(device.port)
+        frame_size = device.generator.frame_size
+        simulator.start()
+
+        def run(stop_event):
+            target = model.start_polling(command, interval=0, max_in_flight=window, timeout=args.timeout)
+            while not stop_event.is_set():
+                model.receive_frame_with_message(frame_size, 0.1)
+            model.stop_polling()
+            return target
+
+        cpu, _, target = measure(run, args.duration)
+        simulator.stop()
+        model.close_serial_port()
+        simulator.close()
+        print(f'{window:>6} {target.responses / args.duration:>10.0f} {(target.smoothed_rtt or 0) * 1e3:>8.2f} '
+              f'{(target.min_rtt or 0) * 1e3:>7.2f} {(target.max_rtt or 0) * 1e3:>7.2f} {target.timeouts:>8} '
+              f'{cpu / args.duration * 100:>5.1f}%')
+
+
+def bench_open(args):
+    '''
+    对比逐个打开与 PortPool.open_many 并发打开 --ports 个虚拟串口的总耗时，
+    另加一个不存在的串口，演示失败的报告。
+    '''
+    simulator = DeviceSimulator()
+    for _ in range(args.ports):
+        simulator.add_device()
+    ports = [device.port for device in simulator.devices]
+    bad_ports = ['/dev/ttyNOTEXIST']
+
+    pool = PortPool()
+    start = time.perf_counter()
+    operators = [pool.acquire(port) for port in ports]
+    sequential = time.perf_counter() - start
+    for operator in operators:
+        pool.release(operator)
+    pool.close_all()
+
+    pool = PortPool()
+    start = time.perf_counter()
+    results = pool.open_many(ports + bad_ports, timeout=args.timeout)
+    parallel = time.perf_counter() - start
+    latencies = sorted(result.latency for result in results if result.ok)
+    print(f'{args.ports} ports: sequential {sequential * 1000:.1f} ms, open_many {parallel * 1000:.1f} ms '
+          f'(per-port p50 {statistics.median(latencies) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms)')
+    for result in results:
+        if not result.ok:
+            print(f'  {result.port}: {result.error}')
+    pool.close_all()
+    simulator.close()
+
+
+def legacy_decode_10(data):
+    '''
+    改用帧格式编译之前 SerialThread.emit_frame 中手写的 10 字节帧解析，作为对比基准。
+    '''
+    usb_c1_pow = f'{data[0]}' if data[0] != '\xFF' else None
+    usb_c1_vbus_vol = f'{round(data[1] / 10, 1)}' if data[1] != '\xFF' else None
+    usb_c1_vbus_cur = f'{round(data[2] / 10, 1)}' if data[2] != '\xFF' else None
+    usb_c1_cur_pow = f'{round(data[1] * data[2] / 100, 2)}' if data[1] != '\xFF' and data[2] != '\xFF' else None
+    usb_c2_pow = f'{data[3]}' if data[3] != '\xFF' else None
+    usb_c2_vbus_vol = f'{round(data[4] / 10, 1)}' if data[4] != '\xFF' else None
+    usb_c2_vbus_cur = f'{round(data[5] / 10, 1)}' if data[5] != '\xFF' else None
+    usb_c2_cur_pow = f'{round(data[4] * data[5] / 100, 2)}' if data[4] != '\xFF' and data[5] != '\xFF' else None
+    usb1_vbus_vol = f'{round(data[6] / 10, 1)}' if data[6] != '\xFF' else None
+    usb1_vbus_cur = f'{round(data[7] / 10, 1)}' if data[7] != '\xFF' else None
+    usb1_cur_pow = f'{round(data[6] * data[7] / 100, 2)}' if data[6] != '\xFF' and data[7] != '\xFF' else None
+    usb2_vbus_vol = f'{round(data[8] / 10, 1)}' if data[8] != '\xFF' else None
+    usb2_vbus_cur = f'{round(data[9] / 10, 1)}' if data[9] != '\xFF' else None
+    usb2_cur_pow = f'{round(data[8] * data[9] / 100, 2)}' if data[8] != '\xFF' and data[9] != '\xFF' else None
+    return (usb_c1_pow, usb_c1_vbus_vol, usb_c1_vbus_cur, usb_c1_cur_pow,
+            usb_c2_pow, usb_c2_vbus_vol, usb_c2_vbus_cur, usb_c2_cur_pow,
+            usb1_vbus_vol, usb1_vbus_cur, usb1_cur_pow,
+            usb2_vbus_vol, usb2_vbus_cur, usb2_cur_pow)
+
+
+def bench_decode(args):
+    '''
+    对比手写解析与帧格式编译的解码函数解析 10 字节帧的单帧耗时，并检查两者结果一致（0xFF 字段除外，
+    手写版本把整数与字符串 '\\xFF' 比较，从未识别出无效值）。
+    安装了 numpy 时另外测量批量解码（--batch 帧一次）的平均单帧耗时。
+    '''
+    generator = FrameGenerator('CYPD7291', invalid_rate=args.invalid, seed=1)
+    frames = [generator.next_frame() for _ in range(args.frames)]
+    decoders = (('handwritten', legacy_decode_10),
+                ('schema', SCHEMAS['CYPD7291'].compile(text=True)),
+                ('schema/num', SCHEMAS['CYPD7291'].compile()),
+                ('schema/mask', SCHEMAS['CYPD7291'].compile(mask=True)))
+    for frame in frames[:1000]:
+        if 0xFF not in frame and legacy_decode_10(frame) != decoders[1][1](frame):
+            raise AssertionError(f'decoders disagree on {frame.hex()}')
+    print(f'{"decoder":>12} {"ns/frame":>9}')
+    for name, decode in decoders:
+        best = None
+        for _ in range(3):
+            start = time.perf_counter_ns()
+            for frame in frames:
+                decode(frame)
+            elapsed = (time.perf_counter_ns() - start) / len(frames)
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{name:>12} {best:>9.0f}')
+    if np is None:
+        print('numpy not installed, skipping batch decoding')
+        return
+    decode_batch = SCHEMAS['CYPD7291'].compile_batch()
+    buffers = [b''.join(frames[i:i + args.batch]) for i in range(0, len(frames), args.batch)]
+    best = None
+    for _ in range(3):
+        start = time.perf_counter_ns()
+        for buffer in buffers:
+            decode_batch(buffer)
+        elapsed = (time.perf_counter_ns() - start) / len(frames)
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{"numpy batch":>12} {best:>9.0f}  ({args.batch} frames/call)')
+
+
+class _FrameSignals(QObject):
+    '''
+    改为数值元组前后的两种 10 字节数据信号。
+    '''
+    text_signal = pyqtSignal(str, str, str, str, str, str, str, str, str, str, str, str, str, str, 'qint64')
+    record_signal = pyqtSignal(tuple, int, 'qint64')
+
+
+class _FrameReceiver(QObject):
+    '''
+    主线程中的接收端，模拟界面的格式化（不写控件），收齐后退出事件循环。
+    '''
+    def __init__(self, count):
+        super().__init__()
+        self.count = count
+        self.received = 0
+        self.shown = [None] * 14
+
+    def _done(self):
+        self.received += 1
+        if self.received == self.count:
+            QCoreApplication.instance().quit()
+
+    @pyqtSlot(str, str, str, str, str, str, str, str, str, str, str, str, str, str, 'qint64')
+    def on_text(self, *args):
+        # 原来的 set_line_data 对每个值再调用一次 str()
+        for value in args[:-1]:
+            str(value)
+        self._done()
+
+    @pyqtSlot(tuple, int, 'qint64')
+    def on_record(self, values, invalid, timestamp_ns):
+        # 同 SerialView.set_line_values：只格式化与当前显示不同的值
+        shown = self.shown
+        for index, value in enumerate(values):
+            if invalid >> index & 1:
+                value = '--'
+            if shown[index] != value:
+                shown[index] = value
+                str(value)
+        self._done()
+
+
+def bench_signal(args):
+    '''
+    对比 14 个 str 参数与一个数值元组的 10 字节数据信号：工作线程解码并发送每帧的 CPU 耗时、
+    主线程接收并格式化每帧的 CPU 耗时，以及全部帧从第一帧发送到最后一帧处理完的总时间。
+    '''
+    app = QCoreApplication.instance() or QCoreApplication([])
+    generator = FrameGenerator('CYPD7291', seed=1)
+    frames = [generator.next_frame() for _ in range(args.frames)]
+    signals = _FrameSignals()
+    text_decode = SCHEMAS['CYPD7291'].compile(text=True)
+    record_decode = SCHEMAS['CYPD7291'].compile(mask=True)
+
+    def emit_text(frame, timestamp_ns):
+        signals.text_signal.emit(*text_decode(frame), timestamp_ns)
+
+    def emit_record(frame, timestamp_ns):
+        values, invalid = record_decode(frame)
+        signals.record_signal.emit(values, invalid, timestamp_ns)
+
+    print(f'{"payload":>10} {"emit us/frame":>14} {"slot us/frame":>14} {"total us/frame":>15}')
+    for name, signal, slot_name, emit in (('14 x str', signals.text_signal, 'on_text', emit_text),
+                                           ('tuple', signals.record_signal, 'on_record', emit_record)):
+        receiver = _FrameReceiver(len(frames))
+        signal.connect(getattr(receiver, slot_name))
+        worker_cpu = []
+
+        def worker():
+            start_cpu = time.thread_time()
+            for frame in frames:
+                emit(frame, time.monotonic_ns())
+            worker_cpu.append(time.thread_time() - start_cpu)
+
+        start = time.perf_counter()
+        start_cpu = time.thread_time()
+        thread = threading.Thread(target=worker)
+        thread.start()
+        app.exec_()
+        main_cpu = time.thread_time() - start_cpu
+        total = time.perf_counter() - start
+        thread.join()
+        signal.disconnect()
+        count = len(frames)
+        print(f'{name:>10} {worker_cpu[0] / count * 1e6:>14.2f} {main_cpu / count * 1e6:>14.2f} '
+              f'{total / count * 1e6:>15.2f}')
+
+
+def bench_detect(args):
+    '''
+    用混合型号的虚拟下位机测试帧格式自动识别：每个设备一个 SerialModel 同时嗅探，
+    统计识别正确、错误和无法判断的数量以及嗅探耗时。
+    '''
+    types = sorted(SCHEMAS)
+    print(f'{"rate Hz":>8} {"correct":>8} {"wrong":>6} {"unknown":>8} {"p50 ms":>7} {"max ms":>7}')
+    for rate in args.rates:
+        simulator = DeviceSimulator()
+        for index in range(args.devices):
+            simulator.add_device(types[index % len(types)], rate, args.invalid, 0.0, args.noise)
+        models = []
+        for device in simulator.devices:
+            model = SerialModel()
+            model.open_serial_port(device.port)
+            models.append(model)
+        results = [None] * len(models)
+
+        def sniff(index, model):
+            start = time.perf_counter()
+            schema = model.detect_format()
+            results[index] = (schema, time.perf_counter() - start)
+
+        simulator.start()
+        threads = [threading.Thread(target=sniff, args=(i, model)) for i, model in enumerate(models)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        simulator.stop()
+        correct = sum(1 for (schema, _), device in zip(results, simulator.devices)
+                      if schema and schema.size == device.generator.frame_size)
+        unknown = sum(1 for schema, _ in results if schema is None)
+        latencies = sorted(latency for _, latency in results)
+        print(f'{rate:>8.0f} {correct:>8} {len(models) - correct - unknown:>6} {unknown:>8} '
+              f'{statistics.median(latencies) * 1000:>7.0f} {latencies[-1] * 1000:>7.0f}')
+        for model in models:
+            model.close_serial_port()
+        # 串口池会延迟关闭空闲串口，这里立即关闭，避免多组测量累积文件描述符
+        get_port_pool().close_all()
+        simulator.close()
+
+
+_PLUGIN_TEMPLATE = '''
+from frame_schema import FrameSchema, Field, Derived
+from device_registry import DeviceDecoder
+
+SCHEMA = FrameSchema({name!r}, 3, [Field('pow', 0), Field('vol', 1, scale=0.1, digits=1),
+                                   Field('cur', 2, scale=0.1, digits=1)],
+                     [Derived('cur_pow', 'vol * cur', digits=2)])
+DEVICE = DeviceDecoder(SCHEMA)
+'''
+
+
+def bench_plugins(args):
+    '''
+    在临时插件目录中生成 --plugins 个型号插件，对比启动时发现插件（只记录名称）、
+    使用其中一个型号和加载全部插件的耗时。
+    '''
+    with tempfile.TemporaryDirectory() as plugin_dir:
+        for index in range(args.plugins):
+            with open(os.path.join(plugin_dir, f'PD{index:04d}.py'), 'w') as file:
+                file.write(_PLUGIN_TEMPLATE.format(name=f'PD{index:04d}'))
+        start = time.perf_counter()
+        registry = DeviceRegistry(plugin_dirs=(plugin_dir,))
+        discover = time.perf_counter() - start
+        start = time.perf_counter()
+        registry.get('PD0000').schema.compile(mask=True)
+        one = time.perf_counter() - start
+        start = time.perf_counter()
+        schemas = registry.schemas()
+        load_all = time.perf_counter() - start
+    print(f'{args.plugins} plugins: discover {discover * 1000:.1f} ms, first use of one device {one * 1000:.1f} ms, '
+          f'load all {load_all * 1000:.1f} ms ({len(schemas)} schemas)')
+
+
+def _crc8_bitwise(data, crc=0):
+    # 不查表的逐位 CRC-8，作为查找表的对照
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def bench_framing(args):
+    '''
+    对比原始定长帧与带帧头、CRC 的帧协议的重组耗时：相同的帧流（含噪声字节和翻转一位的损坏帧）
+    按 64 字节一块输入，统计每帧耗时、输出帧数和 CRC 失败次数；另外单独测量各 CRC 算法的每帧耗时。
+    '''
+    rnd = random.Random(1)
+    generator = FrameGenerator('CYPD7291', 0.01, seed=1)
+    payloads = [generator.next_frame() for _ in range(args.frames)]
+    size = len(payloads[0])
+
+    def stream(encode):
+        chunks = []
+        for payload in payloads:
+            frame = bytearray(encode(payload))
+            if rnd.random() < args.corrupt:
+                frame[rnd.randrange(len(frame))] ^= 1 << rnd.randrange(8)
+            if rnd.random() < args.noise:
+                chunks.append(bytes(rnd.randint(0, 255) for _ in range(rnd.randint(1, 4))))
+            chunks.append(bytes(frame))
+        data = b''.join(chunks)
+        return [data[i:i + 64] for i in range(0, len(data), 64)]
+
+    print(f'{"crc":>14} {"us/frame":>9}')
+    for name, crc in (('crc8 bitwise', _crc8_bitwise), ('crc8 table', crc8), ('crc16 crc_hqx', crc16)):
+        body = bytes((size,)) + payloads[0]
+        start = time.perf_counter()
+        for _ in payloads:
+            crc(body)
+        print(f'{name:>14} {(time.perf_counter() - start) / args.frames * 1e6:>9.3f}')
+
+    print(f'{"assembler":>14} {"us/frame":>9} {"frames":>8} {"resyncs":>8} {"crc fail":>9}')
+    cases = [('raw', lambda: FrameAssembler(size, make_range_validator(FRAME_LIMITS[size])), bytes)]
+    for crc_name in sorted(FramedProtocol.CRCS):
+        protocol = FramedProtocol(crc_name)
+        cases.append((crc_name, lambda protocol=protocol: FramedAssembler(size, protocol), protocol.encode))
+    for name, make, encode in cases:
+        chunks = stream(encode)
+        assembler = make()
+        count = 0
+        start = time.perf_counter()
+        for chunk in chunks:
+            count += len(assembler.feed(chunk, False, 0))
+        elapsed = time.perf_counter() - start
+        print(f'{name:>14} {elapsed / args.frames * 1e6:>9.3f} {count:>8} {assembler.resyncs:>8} '
+              f'{getattr(assembler, "crc_failures", "-"):>9}')
+
+
+def bench_backend(args):
+    '''
+    用程序实际的接收路径（SerialThread）对比接收后端：每串口一个接收线程、共享的串口反应器和
+    主线程中的 asyncio 事件循环，统计解码帧数、进程 CPU 占用、上下文切换次数和进程线程数。
+    测量期间主线程运行 Qt 事件循环（asyncio 后端在其中接收）。
+    '''
+    from controller import SerialThread
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    def run_event_loop(duration):
+        loop = QEventLoop()
+        QTimer.singleShot(int(duration * 1000), loop.quit)
+        loop.exec_()
+    print(f'{"ports":>5} {"backend":>8} {"frames":>8} {"cpu%":>6} {"ctxsw/s":>9} {"threads":>8}')
+    for count in args.ports:
+        for backend in args.backends:
+            simulator = DeviceSimulator()
+            for _ in range(count):
+                simulator.add_device('CYPD7291', args.rate)
+            threads = []
+            for index, device in enumerate(simulator.devices):
+                thread = SerialThread(SerialModel(), f'Serial{index}', 'CYPD7291', device.port, backend=backend)
+                thread.restart(device.port)
+                threads.append(thread)
+            simulator.start()
+            # 等待全部串口打开（反应器和 asyncio 后端的线程此时已经退出）
+            run_event_loop(0.5)
+            os_threads = len(os.listdir('/proc/self/task'))
+            start = resource.getrusage(resource.RUSAGE_SELF)
+            run_event_loop(args.duration)
+            end = resource.getrusage(resource.RUSAGE_SELF)
+            cpu = (end.ru_utime - start.ru_utime) + (end.ru_stime - start.ru_stime)
+            switches = (end.ru_nvcsw - start.ru_nvcsw) + (end.ru_nivcsw - start.ru_nivcsw)
+            simulator.stop()
+            frames = sum(thread.model.frame_stats()['frames'] for thread in threads)
+            for thread in threads:
+                thread.stop()
+                thread.wait()
+            get_port_pool().close_all()
+            simulator.close()
+            print(f'{count:>5} {backend:>8} {frames:>8} {cpu / args.duration * 100:>5.1f}% '
+                  f'{switches / args.duration:>9.1f} {os_threads:>8}')
+
+
+BENCHMARKS = {
+    'reactor': bench_reactor,
+    'alloc': bench_alloc,
+    'pipeline': bench_pipeline,
+    'transport': bench_transport,
+    'poll': bench_poll,
+    'open': bench_open,
+    'decode': bench_decode,
+    'signal': bench_signal,
+    'detect': bench_detect,
+    'plugins': bench_plugins,
+    'framing': bench_framing,
+    'backend': bench_backend,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='串口接收链路性能测量')
+    subparsers = parser.add_subparsers(dest='name', required=True)
+
+    reactor_parser = subparsers.add_parser('reactor', help='反应器与每串口一个线程的 CPU/唤醒次数对比')
+    reactor_parser.add_argument('--ports', type=int, nargs='+', default=[1, 8, 64])
+    reactor_parser.add_argument('--rate', type=float, default=10, help='每个串口的帧率(Hz)')
+    reactor_parser.add_argument('--duration', type=float, default=5, help='每组测量时长(s)')
+
+    alloc_parser = subparsers.add_parser('alloc', help='bytes 读取与 readinto 预分配缓冲区的单帧开销对比')
+    alloc_parser.add_argument('--frames', type=int, default=20000)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='用虚拟下位机压测完整接收链路')
+    pipeline_parser.add_argument('--devices', type=int, default=8)
+    pipeline_parser.add_argument('--type', default='CYPD7291')
+    pipeline_parser.add_argument('--rate', type=float, default=1000, help='每个设备的帧率(Hz)')
+    pipeline_parser.add_argument('--duration', type=float, default=5, help='测量时长(s)')
+    pipeline_parser.add_argument('--invalid', type=float, default=0.0, help='字段为 0xFF 的概率')
+    pipeline_parser.add_argument('--partial', type=float, default=0.0, help='发送半帧的概率')
+    pipeline_parser.add_argument('--noise', type=float, default=0.0, help='插入噪声字节的概率')
+    pipeline_parser.add_argument('--framed', choices=sorted(FramedProtocol.CRCS), help='使用带帧头和 CRC 的帧协议')
+    pipeline_parser.add_argument('--corrupt', type=float, default=0.0, help='--framed 时一帧中翻转一位的概率')
+
+    transport_parser = subparsers.add_parser('transport', help='伪终端与 socket://、loop:// 传输的延迟和吞吐量对比')
+    transport_parser.add_argument('--transports', nargs='+', choices=['pty', 'socket', 'loop'],
+                                  default=['pty', 'socket', 'loop'])
+    transport_parser.add_argument('--frames', type=int, default=2000, help='测量延迟的帧数')
+    transport_parser.add_argument('--megabytes', type=float, default=4, help='测量吞吐量的数据量(MB)')
+
+    poll_parser = subparsers.add_parser('poll', help='轮询模式下不同在途请求数的采样率和往返时间')
+    poll_parser.add_argument('--windows', type=int, nargs='+', default=[1, 2, 4, 8], help='最多在途请求数')
+    poll_parser.add_argument('--type', default='CYPD7291')
+    poll_parser.add_argument('--delay', type=float, default=0.002, help='虚拟下位机的回复延迟(s)')
+    poll_parser.add_argument('--timeout', type=float, default=0.5, help='请求超时时间(s)')
+    poll_parser.add_argument('--duration', type=float, default=3, help='每组测量时长(s)')
+
+    open_parser = subparsers.add_parser('open', help='逐个打开与并发批量打开多个串口的耗时对比')
+    open_parser.add_argument('--ports', type=int, default=48)
+    open_parser.add_argument('--timeout', type=float, default=2, help='批量打开的最长等待时间(s)')
+
+    decode_parser = subparsers.add_parser('decode', help='手写解析与帧格式编译的解码函数的单帧耗时对比')
+    decode_parser.add_argument('--frames', type=int, default=200000)
+    decode_parser.add_argument('--invalid', type=float, default=0.01, help='字段为 0xFF 的概率')
+    decode_parser.add_argument('--batch', type=int, default=4096, help='批量解码每次的帧数')
+
+    signal_parser = subparsers.add_parser('signal', help='14 个字符串参数与数值元组的跨线程数据信号开销对比')
+    signal_parser.add_argument('--frames', type=int, default=50000)
+
+    detect_parser = subparsers.add_parser('detect', help='混合型号虚拟下位机的帧格式自动识别准确率和耗时')
+    detect_parser.add_argument('--devices', type=int, default=50)
+    detect_parser.add_argument('--rates', type=float, nargs='+', default=[10, 100, 1000], help='每个设备的帧率(Hz)')
+    detect_parser.add_argument('--invalid', type=float, default=0.01, help='字段为 0xFF 的概率')
+    detect_parser.add_argument('--noise', type=float, default=0.0, help='插入噪声字节的概率')
+
+    plugins_parser = subparsers.add_parser('plugins', help='型号插件延迟加载与全部加载的耗时对比')
+    plugins_parser.add_argument('--plugins', type=int, default=200)
+
+    framing_parser = subparsers.add_parser('framing', help='原始定长帧与帧头 + CRC 帧协议的重组耗时对比')
+    framing_parser.add_argument('--frames', type=int, default=100000)
+    framing_parser.add_argument('--corrupt', type=float, default=0.01, help='一帧中翻转一位的概率')
+    framing_parser.add_argument('--noise', type=float, default=0.001, help='帧前插入噪声字节的概率')
+
+    backend_parser = subparsers.add_parser('backend', help='程序接收路径中每串口一个线程与串口反应器的对比')
+    backend_parser.add_argument('--ports', type=int, nargs='+', default=[1, 8, 64])
+    backend_parser.add_argument('--rate', type=float, default=10, help='每个串口的帧率(Hz)')
+    backend_parser.add_argument('--duration', type=float, default=5, help='每组测量时长(s)')
+    backend_parser.add_argument('--backends', nargs='+', default=['thread', 'reactor', 'asyncio'],
+                                choices=['thread', 'reactor', 'asyncio'])
+
+    args = parser.parse_args(argv)
+    # 测量时不输出逐帧调试日志
+    logger.setLevel(logging.WARNING)
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
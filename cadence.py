@@ -0,0 +1,94 @@
+'''
+    自适应接收节奏
+    根据实测的帧间隔安排接收线程的唤醒：有数据时按帧周期唤醒，串口静默时逐步拉长间隔，
+    并统计每个接收线程的唤醒次数和 CPU 占用
+'''
+import time
+
+
+class AdaptiveCadence:
+    '''
+    接收线程的唤醒节奏。
+
+    每次唤醒后调用 update() 报告本次收到的帧数：连续有数据时用指数平滑估计帧周期，
+    轮询间隔取帧周期（限制在 [MIN_INTERVAL, MAX_INTERVAL]）；连续多次没有数据时间隔和阻塞读超时
+    按倍数增长到 IDLE_INTERVAL / IDLE_TIMEOUT，数据恢复后立即回到帧周期。
+    '''
+    MIN_INTERVAL = 0.005    # 最短轮询间隔(s)
+    MAX_INTERVAL = 0.1      # 有数据时的最长轮询间隔(s)
+    IDLE_INTERVAL = 2.0     # 静默时的最长轮询间隔(s)
+    IDLE_TIMEOUT = 5.0      # 静默时阻塞读的最长超时(s)
+    IDLE_GRACE = 3          # 连续没有数据的唤醒次数超过该值才开始退避
+    SMOOTHING = 0.25
+
+    def __init__(self, timeout=0.5):
+        '''
+        :param timeout: 有数据时阻塞读的超时时间(s)
+        '''
+        self.base_timeout = timeout
+        self.period = None      # 估计的帧周期(s)
+        self.interval = self.MAX_INTERVAL
+        self.timeout = timeout
+        self._last_frame_ns = None
+        self._empty = 0         # 连续没有数据的唤醒次数
+
+    @property
+    def idle(self):
+        '''
+        串口是否处于静默退避状态。
+        '''
+        return self._empty > self.IDLE_GRACE
+
+    def update(self, frames, timestamp_ns=None):
+        '''
+        报告一次唤醒的结果。
+
+        :param frames: 本次收到的完整帧数
+        :param timestamp_ns: 最后一帧的到达时刻 time.monotonic_ns()
+        '''
+        if frames:
+            if self._last_frame_ns is not None and not self.idle and timestamp_ns:
+                # 静默之后的第一批帧不参与估计，避免静默时长拉大帧周期
+                period = (timestamp_ns - self._last_frame_ns) / 1e9 / frames
+                self.period = period if self.period is None else self.period + (period - self.period) * self.SMOOTHING
+            self._last_frame_ns = timestamp_ns
+            self._empty = 0
+            self.interval = min(max(self.period or self.MAX_INTERVAL, self.MIN_INTERVAL), self.MAX_INTERVAL)
+            self.timeout = self.base_timeout
+            return
+        self._empty += 1
+        if self.idle:
+            self.interval = min(self.interval * 2, self.IDLE_INTERVAL)
+            self.timeout = min(self.timeout * 2, self.IDLE_TIMEOUT)
+
+
+class LoadMeter:
+    '''
+    统计当前线程每秒的唤醒次数和 CPU 占用（time.thread_time，只计算本线程）。
+    '''
+    def __init__(self, window=1.0):
+        self.window = window
+        self.wakeups_per_s = 0.0
+        self.cpu_percent = 0.0
+        self._wakeups = 0
+        self._start = time.monotonic()
+        self._start_cpu = time.thread_time()
+
+    def tick(self):
+        '''
+        记录一次唤醒。
+
+        :return: 统计窗口结束时返回 True，此时 wakeups_per_s 和 cpu_percent 已更新
+        '''
+        self._wakeups += 1
+        now = time.monotonic()
+        elapsed = now - self._start
+        if elapsed < self.window:
+            return False
+        cpu = time.thread_time()
+        self.wakeups_per_s = self._wakeups / elapsed
+        self.cpu_percent = (cpu - self._start_cpu) / elapsed * 100
+        self._wakeups = 0
+        self._start = now
+        self._start_cpu = cpu
+        return True
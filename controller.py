@@ -3,96 +3,259 @@
     业务逻辑处理
 '''
 import time
+import threading
 
+import serial
 from PyQt5.QtCore import QThread, QObject, QTimer, pyqtSignal
-from PyQt5.QtWidgets import QComboBox, QPushButton
+from PyQt5.QtWidgets import QComboBox, QPushButton, QShortcut
+from PyQt5.QtGui import QKeySequence
 
 from model import SerialModel
 from view import SerialView
+from port_registry import get_port_registry
+from port_pool import get_port_pool
+from serial_reactor import get_serial_reactor
+from async_serial import AsyncSerialOperator, get_qt_asyncio_bridge
+from cadence import AdaptiveCadence, LoadMeter
+from frame_schema import InvalidStats
+from device_registry import get_device_registry, DISPLAY_QUANTITIES
 
 from logger import logger
 
 class SerialThread(QThread):
     '''
     自定义线程类，用于打开串口并接收解析数据
+
+    backend 为 'reactor' 时线程只负责打开串口和识别帧格式，之后把串口注册到全局共享的串口反应器，
+    由反应器线程读取并在其中重组、解码，本线程退出；为 'asyncio' 时改为在主线程的 asyncio 事件循环
+    （async_serial.QtAsyncioBridge）中由一个协程接收，数据信号直接在主线程中处理。
+    串口没有文件描述符（Windows、loop:// 等）时仍由本线程阻塞接收。
+    isRunning() 在串口由反应器或事件循环接收期间也返回 True。
     '''
     result_signal = pyqtSignal(str, bool, str)  # 自定义信号，用于传递打开串口结果给主线程
-    DATA_10_SERIAL = 'CYPD7291'      # 用于log输出时区分串口
-    DATA_10_BYTES = 10
-    DATA_6_SERIAL = 'CYPD7299'       # 用于log输出时区分串口
-    DATA_6_BYTES = 6
-    data_received_10_bytes = pyqtSignal(str, str, str, str, str, str, str, str, str, str, str, str, str, str)
-    data_received_6_bytes = pyqtSignal(str, str, str, str, str, str, str, str)
+    FRAME_TIMEOUT = 0.5             # 阻塞接收时等待整帧的超时时间(s)，也是停止线程的最长等待时间
+    INTER_BYTE_TIMEOUT = 0.01       # 阻塞接收时帧内字节间隔超时时间(s)
+    # 串口名称（界面中的串口位置），型号名称，帧解码后的数值元组（顺序见该型号 FrameSchema 的 outputs，无效值为 None），
+    # 无效掩码（FrameSchema.bits 中置位的值无效，全部有效时为 0），帧到达时刻 time.monotonic_ns()
+    data_received = pyqtSignal(str, str, tuple, int, 'qint64')
     serial_closed_signal = pyqtSignal(str, str)  # 自定义信号，用于通知界面串口已关闭
     serial_message_signal = pyqtSignal(str)  # 自定义信号，用于传递串口消息给主线程
-
-    def __init__(self, model: SerialModel, data_length, port_name):
+    load_signal = pyqtSignal(str, float, float, float)  # 串口名称, 每秒唤醒次数, 接收线程 CPU 占用(%), 估计帧周期(s)
+    frame_stats_signal = pyqtSignal(str, dict)  # 串口名称, SerialModel.frame_stats()
+    line_stats_signal = pyqtSignal(str, dict)   # 串口名称, LineMeter.rates()
+    _detached_signal = pyqtSignal()     # 反应器读取出错、已注销串口，在主线程中重新启动本线程等待重连
+    _attach_async_signal = pyqtSignal()  # 串口已打开，在主线程中创建 asyncio 接收协程
+
+    def __init__(self, model: SerialModel, serial_name, device_name, port_name, blocking=True, open_options=None,
+                 poll_options=None, detect=False, framing=None, backend='thread'):
+        '''
+        :param serial_name: 串口名称（界面中的串口位置），用于log输出时区分串口
+        :param device_name: 默认型号，未开启或无法自动识别帧格式时按该型号解析，型号见 device_registry
+        :param backend: 'thread' 由本线程接收；'reactor' 由全局共享的串口反应器接收；
+                        'asyncio' 由主线程中的 asyncio 事件循环接收
+        '''
         super().__init__()
         self.model = model
-        self.data_length = data_length
+        self.name = serial_name
+        self.default_device = device_name
         self.port_name = port_name
+        self.blocking = blocking    # True: 阻塞等待整帧；False: 按实测帧周期轮询
+        self.open_options = open_options or {}  # 打开串口的其他参数，例如 {'low_latency': True}
+        # 轮询模式的参数（SerialModel.start_polling），例如 {'command': b'\x01', 'interval': 0}，None 为被动接收
+        self.poll_options = poll_options
+        # True: 打开串口后根据数据识别帧格式，识别出的型号只在本次连接中有效
+        self.detect = detect
+        # 下位机固件使用带帧头和 CRC 的帧协议时为 FramedProtocol，None 为原始定长帧
+        self.model.framing = framing
+        self.backend = backend
+        self._reactor = None    # 串口已注册到的反应器，None 表示由本线程接收
+        self._reactor_meter = None
+        self._async_operator = None # asyncio 后端接收时的 AsyncSerialOperator
+        self._async_task = None
+        self._resume = False    # True: 重新启动线程只为等待重连，不重新打开串口
         self._running = True
-        self.name = ''
-        self.set_serial_name()
+        self._stop_event = threading.Event()
+        self._detached_signal.connect(self._resume_after_detach)
+        self._attach_async_signal.connect(self._start_async_stream)
+        self.set_device(get_device_registry().get(device_name))
         logger.debug('创建打开串口%s并接收解析数据子线程%d', self.name, id(self))
 
-    def run(self):
-        result = self.model.open_serial_port(self.port_name)
-        self.result_signal.emit(self.name, result, self.port_name)
+    def isRunning(self):
+        return self._reactor is not None or self._async_operator is not None or super().isRunning()
 
-        while self._running and self.model.is_serial_open():
+    def run(self):
+        if self._resume:
+            self._resume = False
+        else:
+            result = self.model.open_serial_port(self.port_name, **self.open_options)
+            self.result_signal.emit(self.name, result, self.port_name)
+            if result and self.open_options.get('low_latency'):
+                self.serial_message_signal.emit(f'{self.name} low latency settings: {self.model.serial.tty_settings}')
+            if result and self.poll_options:
+                self.model.start_polling(**self.poll_options)
+            if result and self.detect:
+                self.detect_format()
+            if result and self.attach():
+                return
+
+        reconnecting = False
+        cadence = AdaptiveCadence(self.FRAME_TIMEOUT)
+        meter = LoadMeter()
+        while self._running and (self.model.is_serial_open() or self.model.is_reconnecting()):
+            if meter.tick():
+                self.emit_stats(meter, cadence.period)
+            if self.model.is_reconnecting():
+                # 串口断开，由后台重连，这里只等待结果，不在接收线程中重开串口
+                if not reconnecting:
+                    reconnecting = True
+                    self.serial_message_signal.emit(f'{self.name} connection lost, reconnecting')
+                if self.model.wait_reconnected(self.FRAME_TIMEOUT):
+                    reconnecting = False
+                    latency = self.model.serial.last_reconnect_latency
+                    self.serial_message_signal.emit(f'{self.name} reconnected in {latency * 1000:.0f} ms')
+                    if self._running and self.attach():
+                        return
+                continue
             try:
-                data, message = self.model.receive_data_with_message(self.data_length)
-                if data and len(data) == self.data_length:
-                    if self.data_length == self.DATA_10_BYTES:
-                        # FF 255无效值
-                        usb_c1_pow = f'{data[0]}' if data[0] != '\xFF' else None
-                        usb_c1_vbus_vol = f'{round(data[1] / 10, 1)}' if data[1]!= '\xFF' else None
-                        usb_c1_vbus_cur = f'{round(data[2] / 10, 1)}' if data[2]!= '\xFF' else None
-                        usb_c1_cur_pow = f'{round(data[1] * data[2] / 100, 2)}' if data[1]!= '\xFF' and data[2]!= '\xFF' else None
-                        usb_c2_pow = f'{data[3]}' if data[3]!= '\xFF' else None
-                        usb_c2_vbus_vol = f'{round(data[4] / 10, 1)}' if data[4]!= '\xFF' else None
-                        usb_c2_vbus_cur = f'{round(data[5] / 10, 1)}' if data[5]!= '\xFF' else None
-                        usb_c2_cur_pow = f'{round(data[4] * data[5] / 100, 2)}' if data[4]!= '\xFF' and data[5]!= '\xFF' else None
-                        usb1_vbus_vol = f'{round(data[6] / 10, 1)}' if data[6]!= '\xFF' else None
-                        usb1_vbus_cur = f'{round(data[7] / 10, 1)}' if data[7]!= '\xFF' else None
-                        usb1_cur_pow = f'{round(data[6] * data[7] / 100, 2)}' if data[6]!= '\xFF' and data[7]!= '\xFF' else None
-                        usb2_vbus_vol = f'{round(data[8] / 10, 1)}' if data[8]!= '\xFF' else None
-                        usb2_vbus_cur = f'{round(data[9] / 10, 1)}' if data[9]!= '\xFF' else None
-                        usb2_cur_pow = f'{round(data[8] * data[9] / 100, 2)}' if data[8]!= '\xFF' and data[9]!= '\xFF' else None
-
-                        # 触发 10 字节数据接收信号
-                        self.data_received_10_bytes.emit(
-                            usb_c1_pow, usb_c1_vbus_vol, usb_c1_vbus_cur, usb_c1_cur_pow, 
-                            usb_c2_pow, usb_c2_vbus_vol, usb_c2_vbus_cur, usb_c2_cur_pow,
-                            usb1_vbus_vol, usb1_vbus_cur, usb1_cur_pow, 
-                            usb2_vbus_vol, usb2_vbus_cur, usb2_cur_pow
-                        )
-                    elif self.data_length == self.DATA_6_BYTES:
-                        # 假设这里处理 6 字节数据
-                        usb4_c1_pow = f'{data[0]}' if data[0]!= '\xFF' else None
-                        usb4_c1_vbus_vol = f'{round(data[1] / 10, 1)}' if data[1]!= '\xFF' else None
-                        usb4_c1_vbus_cur = f'{round(data[2] / 10, 1)}' if data[2]!= '\xFF' else None
-                        usb4_c1_cur_pow = f'{round(data[1] * data[2] / 100, 2)}' if data[1]!= '\xFF' and data[2]!= '\xFF' else None
-                        usb4_c2_pow = f'{data[3]}' if data[3]!= '\xFF' else None
-                        usb4_c2_vbus_vol = f'{round(data[4] / 10, 1)}' if data[4]!= '\xFF' else None
-                        usb4_c2_vbus_cur = f'{round(data[5] / 10, 1)}' if data[5]!= '\xFF' else None
-                        usb4_c2_cur_pow = f'{round(data[4] * data[5] / 100, 2)}' if data[4]!= '\xFF' and data[5]!= '\xFF' else None
-
-                        # 触发 6 字节数据接收信号
-                        self.data_received_6_bytes.emit(
-                            usb4_c1_pow, usb4_c1_vbus_vol, usb4_c1_vbus_cur, usb4_c1_cur_pow, 
-                            usb4_c2_pow, usb4_c2_vbus_vol, usb4_c2_vbus_cur, usb4_c2_cur_pow
-                        )
+                if self.blocking:
+                    # 串口静默时拉长阻塞超时，关闭串口时 SerialModel.close_serial_port 取消读取，立即唤醒；
+                    # 传输不支持取消读取（socket:// 等）时不拉长，停止线程最多等待 FRAME_TIMEOUT
+                    timeout = cadence.timeout if self.model.serial.can_cancel_read \
+                        else min(cadence.timeout, self.FRAME_TIMEOUT)
+                    frames, message = self.model.receive_frame_with_message(
+                        self.data_length, timeout, self.INTER_BYTE_TIMEOUT)
+                else:
+                    frames, message = self.model.receive_data_with_message(self.data_length)
+                cadence.update(len(frames), frames[-1][1] if frames else None)
+                for data, timestamp_ns in frames:
+                    self.emit_frame(data, timestamp_ns)
                 if message:
                     self.serial_message_signal.emit(f'{self.name} {message}')
             except Exception as e:
                 logger.error('Error receiving data from serial %s: %s', self.name, e)
-            time.sleep(0.1)
+            if not self.blocking:
+                # stop() 会唤醒等待，静默时的长轮询间隔不会拖慢断开
+                self._stop_event.wait(cadence.interval)
         self.stop()
 
+    def emit_stats(self, meter, frame_period):
+        '''
+        发送负载、接收统计和线路统计信号（每个 LoadMeter 统计窗口一次）。
+        '''
+        self.load_signal.emit(self.name, meter.wakeups_per_s, meter.cpu_percent, frame_period or 0.0)
+        stats = self.model.frame_stats()
+        stats.update(self.invalid_stats.stats())
+        self.frame_stats_signal.emit(self.name, stats)
+        self.line_stats_signal.emit(self.name, self.model.serial.line_meter.rates())
+
+    def attach(self):
+        '''
+        backend 为 'reactor'/'asyncio' 且串口有文件描述符时，把串口交给串口反应器或 asyncio 事件循环接收。
 
-    def restart(self, port_name, data_length):
+        :return: 已交出时返回 True，本线程随后退出；否则返回 False，由本线程接收
+        '''
+        if self.backend not in ('reactor', 'asyncio'):
+            return False
+        if self.model.serial.fileno() is None:
+            logger.info('%s 串口 %s 没有文件描述符，由接收线程接收', self.name, self.port_name)
+            return False
+        if self.backend == 'asyncio':
+            # 事件循环只能在主线程中操作，由主线程创建接收协程
+            self._async_operator = AsyncSerialOperator(self.model)
+            self._attach_async_signal.emit()
+            logger.debug('%s 串口 %s 由 asyncio 事件循环接收', self.name, self.port_name)
+            return True
+        reactor = get_serial_reactor()
+        # 反应器线程中的唤醒次数和 CPU 占用（CPU 为所有串口共享的反应器线程）
+        self._reactor_meter = LoadMeter()
+        self._reactor = reactor
+        if not reactor.register(self.model.serial, self.on_reactor_data, self.on_reactor_error):
+            self._reactor = None
+            return False
+        logger.debug('%s 串口 %s 由串口反应器接收', self.name, self.port_name)
+        return True
+
+    def detach(self):
+        '''
+        从串口反应器注销或停止 asyncio 接收协程，返回时已不再读取该串口，可以安全关闭。
+        asyncio 后端时必须在主线程中调用（界面断开、restart 和线程结束时都满足）。
+        '''
+        reactor, self._reactor = self._reactor, None
+        if reactor:
+            reactor.unregister(self.model.serial)
+        operator, self._async_operator = self._async_operator, None
+        task, self._async_task = self._async_task, None
+        if operator:
+            operator.cancel()
+        if task:
+            task.cancel()
+
+    def on_reactor_data(self, data, timestamp_ns):
+        '''
+        反应器线程中的数据回调：重组、解码并发送数据信号。
+        '''
+        frames, message = self.model.process_data(data, self.data_length)
+        for frame, frame_timestamp_ns in frames:
+            self.emit_frame(frame, frame_timestamp_ns)
+        if message:
+            self.serial_message_signal.emit(f'{self.name} {message}')
+        if self._reactor_meter.tick():
+            self.emit_stats(self._reactor_meter, self.model.gap_detector.nominal_interval)
+
+    def on_reactor_error(self, operator, error):
+        '''
+        反应器线程中的错误回调（串口已从反应器注销）：交给后台重连，在主线程中重新启动本线程等待重连结果。
+        '''
+        self._reactor = None
+        operator.handle_io_error(error)
+        self._detached_signal.emit()
+
+    def _start_async_stream(self):
+        operator = self._async_operator
+        if operator is not None and self._async_task is None:
+            self._async_task = get_qt_asyncio_bridge().loop.create_task(self._receive_async(operator))
+
+    async def _receive_async(self, operator):
+        '''
+        asyncio 后端的接收协程，在主线程中运行：重组、解码并发送数据信号。
+        '''
+        meter = LoadMeter()
+        while True:
+            try:
+                frames, message = await operator.read_frames(self.data_length)
+            except serial.SerialException as e:
+                if self._async_operator is operator:
+                    # 交给后台重连，重新启动本线程等待重连结果
+                    self._async_operator = self._async_task = None
+                    self.model.serial.handle_io_error(e)
+                    self._resume_after_detach()
+                return
+            for frame, timestamp_ns in frames:
+                self.emit_frame(frame, timestamp_ns)
+            if message:
+                self.serial_message_signal.emit(f'{self.name} {message}')
+            if meter.tick():
+                self.emit_stats(meter, self.model.gap_detector.nominal_interval)
+
+    def _resume_after_detach(self):
+        if self._running and not super().isRunning():
+            self._resume = True
+            self.start()
+
+    def emit_frame(self, data, timestamp_ns):
+        '''
+        解析一帧完整数据并发送对应的数据信号
+
+        :param data: 一帧完整数据
+        :param timestamp_ns: 帧到达时刻 time.monotonic_ns()
+        '''
+        # FF 255无效值为 None，并在无效掩码中置位，格式化在界面中进行
+        values, invalid = self.decode(data)
+        if invalid:
+            self.invalid_stats.add(invalid)
+        self.data_received.emit(self.name, self.device.name, values, invalid, timestamp_ns)
+
+    def restart(self, port_name):
         '''
         重启线程
         '''
@@ -101,36 +264,90 @@ class SerialThread(QThread):
             self.wait()  # 等待线程结束
 
         self._running = True
+        self._resume = False
+        self._stop_event.clear()
         self.port_name = port_name
-        self.data_length = data_length
-        self.set_serial_name()
+        # 上一次连接识别出的型号不沿用，重新按默认型号开始
+        self.set_device(get_device_registry().get(self.default_device))
         self.start()
         logger.debug('%s串口子线程restart %d', self.name, id(self))
 
-    def set_serial_name(self):
+    def set_device(self, device):
+        '''
+        设置下位机型号：帧长和由帧格式编译的解码函数（data_length 为该型号的帧长）
+        '''
+        self.device = device
+        self.data_length = device.frame_size
+        self.decode = device.schema.compile(mask=True)
+        self.invalid_stats = InvalidStats(device.schema)    # 本串口的无效值统计
+        self.model.frame_limits = device.schema.limits
+
+    def detect_format(self):
         '''
-        根据串口长度设置串口名称
+        嗅探数据识别帧格式，无法识别时保持按位置设定的格式
         '''
-        if self.data_length == self.DATA_10_BYTES:
-            self.name = self.DATA_10_SERIAL
-        elif self.data_length == self.DATA_6_BYTES:
-            self.name = self.DATA_6_SERIAL
+        schema = self.model.detect_format()
+        if schema is None:
+            self.serial_message_signal.emit(f'{self.name} could not detect the frame format of {self.port_name}, '
+                                            f'assuming {self.device.name}')
+            self.model.frame_limits = self.device.schema.limits
+            return
+        if schema.name != self.device.name:
+            self.set_device(get_device_registry().get(schema.name))
+        self.serial_message_signal.emit(f'{self.name} detected {schema.name} frames on {self.port_name}')
 
     def stop(self):
         logger.debug('串口子线程%d stop', id(self))
         self._running = False
+        self._stop_event.set()
+        self.detach()
         self.model.close_serial_port()  # 关闭串口
         self.serial_closed_signal.emit(self.name, self.port_name)  # 发送串口关闭信号
 
     def __del__(self):
         logger.debug('串口子线程%d被销毁', id(self))
 
+class PortOpenThread(QThread):
+    '''
+    在串口池中并发打开多个串口（PortPool.open_many），全部完成或超时后一次发出每个串口的结果
+    '''
+    opened_signal = pyqtSignal(list, list)  # 串口名称列表, 与之对应的 OpenResult 列表
+
+    def __init__(self, serial_names, port_names, timeout):
+        super().__init__()
+        self.serial_names = serial_names
+        self.port_names = port_names
+        self.timeout = timeout
+
+    def run(self):
+        results = get_port_pool().open_many(self.port_names, timeout=self.timeout)
+        self.opened_signal.emit(self.serial_names, results)
+
 class SerialController(QObject):
     '''
         主线程
-        串口1对应10字节数据
-        串口2对应6字节数据
+        界面中有两个串口位置，各自有默认型号（串口1为 CYPD7291，串口2为 CYPD7299），
+        开启自动识别时任意型号都可以接在任意位置
     '''
+    # 界面中的两个串口位置，用于log输出时区分串口
+    SERIAL_1 = 'Serial1'
+    SERIAL_2 = 'Serial2'
+    AUTO_DETECT = True  # 打开串口后自动识别帧格式，任意型号的数据都显示在所接串口位置的控件中
+    # 串口位置 -> 显示通道依次对应的端口编号（端口 n 的控件为 powEdit{n}、volEdit{n} ...，LED 为 n）
+    SLOT_PORTS = {SERIAL_1: (1, 2, 5, 6), SERIAL_2: (3, 4)}
+    # 串口位置 -> 默认型号（未开启或无法自动识别时使用）
+    SLOT_DEVICES = {SERIAL_1: 'CYPD7291', SERIAL_2: 'CYPD7299'}
+    FRAMING = None      # 下位机固件支持时设为 FramedProtocol('crc8') 或 FramedProtocol('crc16')，按帧头和 CRC 接收
+    # 下位机固件只在收到查询命令后才上报时设为轮询参数（SerialModel.start_polling），
+    # 例如 {'command': b'\x01', 'interval': 0.05, 'max_in_flight': 2}；None 为被动接收
+    POLL_OPTIONS = None
+    # 'reactor': 有文件描述符的串口由一个共享的反应器线程接收（Windows 等没有文件描述符时退回每串口一个线程）；
+    # 'asyncio': 有文件描述符的串口由主线程中的 asyncio 事件循环接收（async_serial.QtAsyncioBridge）；
+    # 'thread': 每个串口一个接收线程
+    RECEIVE_BACKEND = 'reactor'
+    OPEN_TIMEOUT = 2.0  # 全部连接时等待所有串口打开的最长时间(s)，超时的串口报告失败
+    CONNECT_ALL_SHORTCUT = 'Ctrl+Shift+O'
+
     def __init__(self, title, myappid, icon_path):
         super().__init__()  # 调用父类的构造函数
         logger.debug('程序开始运行')
@@ -146,9 +363,15 @@ class SerialController(QObject):
         self.thread_10 = None
         self.thread_6 = None
         self.threads = [self.thread_10, self.thread_6]
+        self.open_thread = None     # 全部连接时并发打开串口的线程
 
         self.receive_thread_10_flag = False
         self.receive_thread_6_flag = False
+        # 各串口 LED 提示信息的组成部分：接收线程负载、接收统计
+        self.thread_status = {self.SERIAL_1: {}, self.SERIAL_2: {}}
+        self.line_edits = {}    # (串口名称, 型号名称) -> 与该型号 outputs 一一对应的控件列表（不显示的为 None）
+        self.slot_devices = {}  # 串口名称 -> 最近一次显示的型号名称
+        self.invalid_reported = {}  # 串口名称 -> 已提示过的无效值数量
         # 启动定时器，每隔一定时间检查一次串口数据是否超时
         self.serial_timer = QTimer(self)
         self.serial_timer.timeout.connect(self.check_serial_data)
@@ -161,15 +384,63 @@ class SerialController(QObject):
     def connect_serial_msg(self):
         self.view.ui.connectButton1.clicked.connect(self.handle_serial1_connect)
         self.view.ui.connectButton2.clicked.connect(self.handle_serial2_connect)
+        self.connect_all_shortcut = QShortcut(QKeySequence(self.CONNECT_ALL_SHORTCUT), self.view)
+        self.connect_all_shortcut.activated.connect(self.connect_all)
+
+    def slot_widgets(self):
+        '''
+        串口名称 -> (SerialModel, 连接按钮, 串口选择下拉框, 连接处理函数)
+        '''
+        ui = self.view.ui
+        return {self.SERIAL_1: (self.model_10, ui.connectButton1, ui.serialBox1, self.handle_serial1_connect),
+                self.SERIAL_2: (self.model_6, ui.connectButton2, ui.serialBox2, self.handle_serial2_connect)}
+
+    def connect_all(self):
+        '''
+        连接所有已选择串口、尚未连接的位置：在后台线程中并发打开全部串口，最多等待 OPEN_TIMEOUT 秒，
+        一次报告每个串口的打开耗时或失败原因，打开成功的再启动各自的接收线程。
+        '''
+        if self.open_thread and self.open_thread.isRunning():
+            return
+        serial_names, port_names = [], []
+        for serial_name, (_, button, combobox, _) in self.slot_widgets().items():
+            port_name = combobox.currentText()
+            if port_name and button.text() == SerialView.BTN_CONNECT:
+                serial_names.append(serial_name)
+                port_names.append(port_name)
+                button.setEnabled(False)
+                combobox.setEnabled(False)
+        if not port_names:
+            return
+        self.open_thread = PortOpenThread(serial_names, port_names, self.OPEN_TIMEOUT)
+        self.open_thread.opened_signal.connect(self.handle_ports_opened)
+        self.open_thread.start()
+
+    def handle_ports_opened(self, serial_names, results):
+        '''
+        处理全部连接的结果。打开成功的串口由该位置的 SerialModel 从串口池获取共享句柄（不会重新打开），
+        再释放批量打开时持有的引用，然后启动接收线程。
+        '''
+        widgets = self.slot_widgets()
+        for serial_name, result in zip(serial_names, results):
+            model, button, combobox, connect = widgets[serial_name]
+            button.setEnabled(True)
+            combobox.setEnabled(True)
+            if result.ok:
+                logger.info('%s 串口 %s 打开耗时 %.1f ms', serial_name, result.port, result.latency * 1000)
+                model.open_serial_port(result.port)
+                get_port_pool().release(result.operator)
+                connect()
+            else:
+                self.view.log_message(f'{serial_name} Failed to open serial port {result.port}: {result.error}', True)
 
-    def handle_serial_connect(self, model:SerialModel, button:QPushButton, combobox:QComboBox, thread:QThread, data_length, serial_name):
+    def handle_serial_connect(self, model:SerialModel, button:QPushButton, combobox:QComboBox, thread:QThread, serial_name):
         '''
         处理串口连接按钮的点击事件的通用方法。
 
         :param button: 连接按钮
         :param combobox: 串口选择下拉框
         :param thread: 串口线程
-        :param data_length: 数据长度
         :param serial_name: 串口名称
         '''
         port_name = combobox.currentText()
@@ -178,7 +449,8 @@ class SerialController(QObject):
             return
 
         if button.text() == SerialView.BTN_DISCONNECT:
-            # 如果线程正在运行，关闭串口
+            # 如果线程正在运行，关闭串口。串口池会让非独占打开的串口在断开后再保持打开 PortPool.LINGER_TIME 秒，
+            # 期间重新连接不会复位设备，但其他程序打开同一串口可能失败
             if thread and thread.isRunning():
                 thread.stop()
                 thread.wait()
@@ -190,15 +462,17 @@ class SerialController(QObject):
         else:
             # 如果线程未运行，打开串口
             if thread is None:
-                thread = SerialThread(model, data_length, port_name)
+                thread = SerialThread(model, serial_name, self.SLOT_DEVICES[serial_name], port_name,
+                                      detect=self.AUTO_DETECT, framing=self.FRAMING, backend=self.RECEIVE_BACKEND,
+                                      poll_options=self.POLL_OPTIONS)
                 thread.result_signal.connect(self.handle_serial_open_result)
                 thread.serial_closed_signal.connect(self.handle_serial_closed)
                 thread.serial_message_signal.connect(self.view.log_message)
-                if data_length == SerialThread.DATA_10_BYTES:
-                    thread.data_received_10_bytes.connect(self.handle_received_10_data)
-                elif data_length == SerialThread.DATA_6_BYTES:
-                    thread.data_received_6_bytes.connect(self.handle_received_6_data)
-            thread.restart(port_name, data_length)
+                thread.load_signal.connect(self.handle_thread_load)
+                thread.frame_stats_signal.connect(self.handle_frame_stats)
+                thread.line_stats_signal.connect(self.handle_line_stats)
+                thread.data_received.connect(self.handle_received_data)
+            thread.restart(port_name)
             # 串口连接后，设置下拉框不可编辑
             combobox.setEnabled(False)
         return thread
@@ -212,8 +486,7 @@ class SerialController(QObject):
             self.view.ui.connectButton1,
             self.view.ui.serialBox1,
             self.thread_10,
-            SerialThread.DATA_10_BYTES,
-            SerialThread.DATA_10_SERIAL
+            self.SERIAL_1
         )
 
     def handle_serial2_connect(self):
@@ -225,8 +498,7 @@ class SerialController(QObject):
             self.view.ui.connectButton2,
             self.view.ui.serialBox2,
             self.thread_6,
-            SerialThread.DATA_6_BYTES,
-            SerialThread.DATA_6_SERIAL
+            self.SERIAL_2
         )
 
     def update_ui_and_log(self, button, combobox, serial_name, port_name, success):
@@ -265,12 +537,58 @@ class SerialController(QObject):
         if self.thread_10.name == serial_name:
             if self.view.ui.connectButton1.text() == SerialView.BTN_DISCONNECT:
                 self.update_ui_and_log(self.view.ui.connectButton1, self.view.ui.serialBox1,
-                    SerialThread.DATA_10_SERIAL, port_name, False)
+                    self.SERIAL_1, port_name, False)
         elif self.view.ui.connectButton2.text() == SerialView.BTN_DISCONNECT:
             if self.thread_6.isRunning():
                 self.update_ui_and_log(self.view.ui.connectButton2, self.view.ui.serialBox2,
-                    SerialThread.DATA_6_SERIAL, port_name, False)
+                    self.SERIAL_2, port_name, False)
             
+    def handle_thread_load(self, serial_name, wakeups_per_s, cpu_percent, frame_period):
+        '''
+        在 LED 的提示信息中显示接收线程的负载：每秒唤醒次数、CPU 占用和估计的帧周期。
+        '''
+        text = f'{wakeups_per_s:.1f} wakeups/s, CPU {cpu_percent:.1f}%'
+        if frame_period:
+            text += f', frame period {frame_period * 1000:.1f} ms'
+        self.thread_status[serial_name]['load'] = text
+        self.update_led_tooltip(serial_name)
+        logger.debug('%s 接收线程负载: %s', serial_name, text)
+
+    def handle_frame_stats(self, serial_name, stats):
+        '''
+        在 LED 的提示信息中显示接收统计：收到的帧数、估计丢帧数、重新同步次数、积压次数，带帧头时还有 CRC 校验失败次数。
+        '''
+        text = (f'frames {stats["frames"]}, dropped ~{stats["dropped"]} in {stats["gaps"]} gaps, '
+                f'resyncs {stats["resyncs"]}, bursts {stats["bursts"]} (max {stats["max_burst"]}), '
+                f'invalid FF fields {stats["invalid_fields"]} in {stats["invalid_frames"]} frames')
+        if self.FRAMING:
+            text += f', CRC failures {stats["crc_failures"]}, length errors {stats["length_errors"]}'
+        self.thread_status[serial_name]['frames'] = text
+        if stats['invalid_fields'] > self.invalid_reported.get(serial_name, 0):
+            # 每个统计周期最多提示一次，而不是每帧一次
+            new = stats['invalid_fields'] - self.invalid_reported.get(serial_name, 0)
+            by_field = ', '.join(f'{name} {count}' for name, count in stats['invalid_by_field'].items())
+            logger.warning('%s 新增 %d 个 FF 无效值，累计: %s', serial_name, new, by_field)
+            self.view.log_message(f'{serial_name} received {new} invalid FF values (total: {by_field})')
+        self.invalid_reported[serial_name] = stats['invalid_fields']
+        self.update_led_tooltip(serial_name)
+        logger.debug('%s 接收统计: %s', serial_name, stats)
+
+    def handle_line_stats(self, serial_name, rates):
+        '''
+        在 LED 旁显示串口线路利用率、每秒字节数和帧数。
+        '''
+        text = (f'{rates["rx_utilization"]:.0f}%  {rates["rx_bytes_per_s"]:.0f} B/s  '
+                f'{rates["frames_per_s"]:.0f} fps')
+        for index in self.SLOT_PORTS[serial_name]:
+            self.view.set_line_stats(index, text, rates['rx_utilization'])
+        logger.debug('%s 线路统计: %s', serial_name, rates)
+
+    def update_led_tooltip(self, serial_name):
+        text = '\n'.join(self.thread_status[serial_name].values())
+        for index in self.SLOT_PORTS[serial_name]:
+            self.view.set_led_tooltip(index, text)
+
     def handle_serial_open_result(self, serial_name, result, port_name):
         '''
         处理打开串口的结果，根据结果更新界面和记录日志。
@@ -279,90 +597,75 @@ class SerialController(QObject):
         :param result: 打开串口的结果，True 表示成功，False 表示失败
         :param port_name: 端口名称
         '''
-        if serial_name == SerialThread.DATA_10_SERIAL:
+        if serial_name == self.SERIAL_1:
             self.update_ui_and_log(self.view.ui.connectButton1, self.view.ui.serialBox1,
                 serial_name, port_name, result)
-        elif serial_name == SerialThread.DATA_6_SERIAL:
+        elif serial_name == self.SERIAL_2:
             self.update_ui_and_log(self.view.ui.connectButton2, self.view.ui.serialBox2,
                 serial_name, port_name, result)
 
 
 
-    def handle_received_10_data(self, 
-                            usb_c1_pow, usb_c1_vbus_vol, usb_c1_vbus_cur, usb_c1_cur_pow, 
-                            usb_c2_pow, usb_c2_vbus_vol, usb_c2_vbus_cur, usb_c2_cur_pow,
-                            usb1_vbus_vol, usb1_vbus_cur, usb1_cur_pow, 
-                            usb2_vbus_vol, usb2_vbus_cur, usb2_cur_pow):
-        '''
-        处理接收到的 10 字节数据。
-
-        :param usb_c1_pow: USB-C1 电源          对应Port1_Type C1
-        :param usb_c1_vbus_vol: USB-C1 电压
-        :param usb_c1_vbus_cur: USB-C1 电流
-        :param usb1_cur_pow: USB1 当前功率       
-        :param usb_c2_pow: USB-C2 电源          对应Port2_Type C2
-        :param usb_c2_vbus_vol: USB-C2 电压
-        :param usb_c2_vbus_cur: USB-C2 电流
-        :param usb2_cur_pow: USB2 当前功率       
-        :param usb1_vbus_vol: USB1 电压         对应Port5_WPC1
-        :param usb1_vbus_cur: USB1 电流
-        :param usb1_cur_pow: USB1 当前功率
-        :param usb2_vbus_vol: USB2 电压         对应Port6_WPC2
-        :param usb2_vbus_cur: USB2 电流
-        :param usb2_cur_pow: USB2 当前功率       
-        '''
-        if None in (usb_c1_pow, usb_c1_vbus_vol, usb_c1_vbus_cur, usb_c1_cur_pow, 
-                    usb_c2_pow, usb_c2_vbus_vol, usb_c2_vbus_cur, usb_c2_cur_pow,
-                    usb1_vbus_vol, usb1_vbus_cur, usb1_cur_pow, 
-                    usb2_vbus_vol, usb2_vbus_cur, usb2_cur_pow):
-            logger.warning("接收到的 10 字节数据中包含 FF 无效值")
-            self.view.log_message(f'{SerialThread.DATA_10_SERIAL} received data contains invalid FF values')
-
-
-        self.view.set_line_data(self.view.ui.powEdit1, usb_c1_pow)
-        self.view.set_line_data(self.view.ui.volEdit1, usb_c1_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit1, usb_c1_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit1, usb_c1_cur_pow)
-
-        self.view.set_line_data(self.view.ui.powEdit2, usb_c2_pow)
-        self.view.set_line_data(self.view.ui.volEdit2, usb_c2_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit2, usb_c2_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit2, usb_c2_cur_pow)
-
-        self.view.set_line_data(self.view.ui.volEdit5, usb1_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit5, usb1_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit5, usb1_cur_pow)
-
-        self.view.set_line_data(self.view.ui.volEdit6, usb2_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit6, usb2_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit6, usb2_cur_pow)
-
-    def handle_received_6_data(self, 
-                            usb4_c1_pow, usb4_c1_vbus_vol, usb4_c1_vbus_cur, usb4_c1_cur_pow, 
-                            usb4_c2_pow, usb4_c2_vbus_vol, usb4_c2_vbus_cur, usb4_c2_cur_pow):
-        '''
-        处理接收到的 6 字节数据。
-        :param usb4_c1_pow: USB4-C1 电源         对应Port3_Type C3
-        :param usb4_c1_vbus_vol: USB4-C1 电压
-        :param usb4_c1_vbus_cur: USB4-C1 电流
-        :param usb4_c2_pow: USB4-C2 电源         对应Port4_Type C4
-        :param usb4_c2_vbus_vol: USB4-C2 电压
-        :param usb4_c2_vbus_cur: USB4-C2 电流
-        '''
-        if None in (usb4_c1_pow, usb4_c1_vbus_vol, usb4_c1_vbus_cur, usb4_c1_cur_pow, 
-                            usb4_c2_pow, usb4_c2_vbus_vol, usb4_c2_vbus_cur, usb4_c2_cur_pow):
-            logger.warning("接收到的 10 字节数据中包含 FF 无效值")
-            self.view.log_message(f'{SerialThread.DATA_6_SERIAL} received data contains invalid FF values')
-
-        self.view.set_line_data(self.view.ui.powEdit3, usb4_c1_pow)
-        self.view.set_line_data(self.view.ui.volEdit3, usb4_c1_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit3, usb4_c1_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit3, usb4_c1_cur_pow)
-
-        self.view.set_line_data(self.view.ui.powEdit4, usb4_c2_pow)
-        self.view.set_line_data(self.view.ui.volEdit4, usb4_c2_vbus_vol)
-        self.view.set_line_data(self.view.ui.curEdit4, usb4_c2_vbus_cur)
-        self.view.set_line_data(self.view.ui.curPowEdit4, usb4_c2_cur_pow)
+    def handle_received_data(self, serial_name, device_name, values, invalid, timestamp_ns):
+        '''
+        把一帧的数值写入该串口位置的控件，无效值的计数由接收线程汇总，在 handle_frame_stats 中提示。
+
+        :param serial_name: 串口名称，决定写入哪个位置的控件（SLOT_PORTS），与型号无关
+        :param device_name: 型号名称，决定各数值写入该位置的哪个端口的哪个控件（DeviceDecoder.display），例如
+                            CYPD7291 的 14 个数值依次为
+                            USB-C1 协商功率、电压、电流、当前功率      对应所在位置的第 1 个端口
+                            USB-C2 协商功率、电压、电流、当前功率      对应第 2 个端口
+                            USB1 电压、电流、当前功率                  对应第 3 个端口
+                            USB2 电压、电流、当前功率                  对应第 4 个端口
+        :param values: 数值元组
+        :param invalid: 无效掩码，第 i 位对应第 i 个数值
+        :param timestamp_ns: 帧到达时刻 time.monotonic_ns()
+        '''
+        logger.debug('%s 帧从到达到界面处理耗时 %.3f ms', serial_name, (time.monotonic_ns() - timestamp_ns) / 1e6)
+
+        line_edits = self.line_edits.get((serial_name, device_name))
+        if line_edits is None:
+            line_edits = self.map_line_edits(serial_name, device_name)
+            self.line_edits[(serial_name, device_name)] = line_edits
+        if self.slot_devices.get(serial_name) != device_name:
+            # 该位置换接了其他型号，清除上一个型号留下的数值
+            self.view.clear_line_values(self.slot_line_edits(serial_name))
+            self.slot_devices[serial_name] = device_name
+        if line_edits:
+            self.view.set_line_values(line_edits, values, invalid)
+
+    def slot_line_edits(self, serial_name):
+        '''
+        获取串口位置的全部数值控件。
+        '''
+        return [getattr(self.view.ui, f'{quantity}Edit{port}')
+                for port in self.SLOT_PORTS[serial_name] for quantity in DISPLAY_QUANTITIES]
+
+    def map_line_edits(self, serial_name, device_name):
+        '''
+        把型号的显示映射（通道序号, 量）对应到串口位置的控件：第 i 个通道显示在该位置的第 i 个端口。
+        位置的端口数少于型号的通道数时，多出的通道不显示并提示。
+
+        :return: 与型号 outputs 一一对应的控件列表，不显示的为 None；整个型号不显示时为空列表
+        '''
+        device = get_device_registry().get(device_name)
+        if device is None or device.display is None:
+            logger.info('型号 %s 没有界面映射，数据不在界面中显示', device_name)
+            return []
+        ports = self.SLOT_PORTS[serial_name]
+        line_edits = [getattr(self.view.ui, f'{entry[1]}Edit{ports[entry[0]]}')
+                      if entry is not None and entry[0] < len(ports) else None
+                      for entry in device.display]
+        if device.channel_count > len(ports):
+            hidden = [device.channels[i] if i < len(device.channels) else f'#{i + 1}'
+                      for i in range(len(ports), device.channel_count)]
+            logger.warning('%s 位置只有 %d 个端口，%s 的通道 %s 不显示', serial_name, len(ports), device_name, hidden)
+            self.view.log_message(f'{serial_name} slot shows {len(ports)} ports, {device_name} channels '
+                                  f'{", ".join(hidden)} are not displayed', True)
+        if not any(line_edits):
+            return []
+        logger.info('%s 位置显示 %s 的 %d 个通道', serial_name, device_name, min(device.channel_count, len(ports)))
+        return line_edits
 
     def check_serial_data(self):
         '''
@@ -372,9 +675,9 @@ class SerialController(QObject):
         # 定义一个辅助函数来检查单个线程的数据接收情况
         def check_thread(thread:SerialThread, flags, led_indices):
             if thread and thread.isRunning():
-                last_time = thread.model.last_receive_time
-                current_time = time.time()
-                if current_time - last_time < timeout_threshold:
+                last_time = thread.model.last_receive_ns
+                current_time = time.monotonic_ns()
+                if current_time - last_time < timeout_threshold * 1_000_000_000:
                     if not flags[0]:
                         self.view.log_message(f'{thread.name} received data within {timeout_threshold}s') # (f'{thread.name}在{timeout_threshold}s内接收到数据')
                     flags[0] = True
@@ -394,9 +697,11 @@ class SerialController(QObject):
             return flags[0]
 
         # 检查 10 字节数据的线程
-        self.receive_thread_10_flag = check_thread(self.thread_10, [self.receive_thread_10_flag], [1, 2, 5, 6])
+        self.receive_thread_10_flag = check_thread(self.thread_10, [self.receive_thread_10_flag],
+                                                   self.SLOT_PORTS[self.SERIAL_1])
         # 检查 6 字节数据的线程
-        self.receive_thread_6_flag = check_thread(self.thread_6, [self.receive_thread_6_flag], [3, 4])
+        self.receive_thread_6_flag = check_thread(self.thread_6, [self.receive_thread_6_flag],
+                                                  self.SLOT_PORTS[self.SERIAL_2])
 
     def cleanup(self):
         logger.debug('Controller %d clean up', id(self))
@@ -405,6 +710,8 @@ class SerialController(QObject):
                 thread.stop()
                 thread.quit()
                 thread.wait()
+        get_port_registry().stop()
+        get_port_pool().close_all()
                 
 
     def show(self):
@@ -0,0 +1,17 @@
+'''
+    型号插件示例（以下划线开头的文件不会被加载）
+    复制为 <型号>.py（例如 CYPD3177.py）并修改帧格式，文件名必须与 FrameSchema 的名称相同。
+    只有串口实际用到该型号（手动指定或自动识别）时才会导入本文件。
+'''
+from frame_schema import FrameSchema, Field, Derived
+from device_registry import DeviceDecoder, display_port
+
+# 单口 PD 控制器：协商功率(W)、电压(0.01V，2 字节小端)、电流(0.01A，2 字节小端)
+SCHEMA = FrameSchema('EXAMPLE', 5, [
+    Field('pow', 0, maximum=240),
+    Field('vol', 1, width=2, scale=0.01, digits=2, invalid=0xFFFF),
+    Field('cur', 3, width=2, scale=0.01, digits=2, invalid=0xFFFF),
+], [Derived('cur_pow', 'vol * cur', digits=2)], outputs=['pow', 'vol', 'cur', 'cur_pow'])
+
+# 一个通道，显示在所接串口位置的第一个端口；display 为 None 时只统计、不在界面中显示
+DEVICE = DeviceDecoder(SCHEMA, channels=('USB-C',), display=display_port(0))
@@ -0,0 +1,205 @@
+'''
+    下位机型号注册表
+    每种型号（PD 控制器）是一个插件：帧格式、通道名称和界面控件映射。
+    内置型号直接注册；其他型号通过 entry points 或插件目录发现，只记录名称，
+    某个串口实际用到时才导入，型号再多也不影响启动速度
+'''
+import os
+import threading
+import importlib.util
+from importlib import metadata
+
+from frame_schema import SCHEMAS
+from logger import logger
+
+ENTRY_POINT_GROUP = 'serial_real_time_show.devices'     # entry point 指向插件中的 DeviceDecoder 对象
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'device_plugins')
+# 界面中每个端口的一组控件：协商功率、电压、电流、当前功率（控件名为 powEdit{n}、volEdit{n} ...）
+DISPLAY_QUANTITIES = ('pow', 'vol', 'cur', 'curPow')
+
+
+class DeviceDecoder:
+    '''
+    一种下位机型号。
+
+    :param schema: FrameSchema，schema.name 即型号名称
+    :param channels: 通道名称，例如 ('USB-C1', 'USB-C2')，用于日志和提示信息
+    :param display: 界面显示映射，与 schema.outputs 一一对应的 (通道序号, 量)，量为 DISPLAY_QUANTITIES 之一，
+                    某一项为 None 时该值不显示，整个参数为 None 时不在界面中显示。
+                    通道序号与串口位置无关：第 i 个通道显示在下位机所接的串口位置的第 i 个端口的控件中
+    '''
+    def __init__(self, schema, channels=(), display=None):
+        if display is not None:
+            if len(display) != len(schema.outputs):
+                raise ValueError(f'{schema.name}: {len(display)} display entries for {len(schema.outputs)} outputs')
+            for entry in display:
+                if entry is not None and entry[1] not in DISPLAY_QUANTITIES:
+                    raise ValueError(f'{schema.name}: unknown display quantity {entry[1]!r}')
+        self.schema = schema
+        self.channels = tuple(channels)
+        self.display = tuple(display) if display is not None else None
+
+    @property
+    def name(self):
+        return self.schema.name
+
+    @property
+    def frame_size(self):
+        return self.schema.size
+
+    @property
+    def channel_count(self):
+        '''
+        界面中显示的通道数。
+        '''
+        return max((entry[0] + 1 for entry in self.display or () if entry is not None), default=0)
+
+
+def display_port(channel, quantities=DISPLAY_QUANTITIES):
+    '''
+    生成一个通道的显示映射，例如 display_port(0) 为 ((0, 'pow'), (0, 'vol'), (0, 'cur'), (0, 'curPow'))。
+    '''
+    return tuple((channel, quantity) for quantity in quantities)
+
+
+BUILTIN_DEVICES = (
+    DeviceDecoder(SCHEMAS['CYPD7291'], ('USB-C1', 'USB-C2', 'USB1', 'USB2'),
+                  display_port(0) + display_port(1) +
+                  display_port(2, ('vol', 'cur', 'curPow')) + display_port(3, ('vol', 'cur', 'curPow'))),
+    DeviceDecoder(SCHEMAS['CYPD7299'], ('USB4-C1', 'USB4-C2'),
+                  display_port(0) + display_port(1)),
+)
+
+
+class DeviceRegistry:
+    '''
+    型号名称 -> DeviceDecoder。
+
+    插件目录中每个不以下划线开头的 .py 文件是一个插件，文件名即型号名称，模块中的 DEVICE 为 DeviceDecoder；
+    entry point 的名称即型号名称，指向 DeviceDecoder 对象。发现插件时只记录名称和加载方式，
+    get() 第一次用到时才导入，导入失败只记录日志，不影响其他型号。
+    '''
+    def __init__(self, plugin_dirs=(PLUGIN_DIR,), entry_point_group=ENTRY_POINT_GROUP):
+        self._devices = {}      # 已加载的型号
+        self._loaders = {}      # 未加载的型号 -> 加载函数
+        self._lock = threading.Lock()   # 多个接收线程可能同时加载插件
+        for device in BUILTIN_DEVICES:
+            self.register(device)
+        for plugin_dir in plugin_dirs:
+            self._discover_dir(plugin_dir)
+        self._discover_entry_points(entry_point_group)
+
+    def register(self, device):
+        '''
+        注册一个已加载的型号，同名型号被替换。
+        '''
+        self._devices[device.name] = device
+        self._loaders.pop(device.name, None)
+
+    def register_lazy(self, name, loader):
+        '''
+        注册一个延迟加载的型号，已有同名型号时忽略（内置型号优先于插件）。
+
+        :param loader: 无参数的加载函数，返回 DeviceDecoder
+        '''
+        if name in self._devices or name in self._loaders:
+            logger.warning('型号 %s 重复注册，忽略', name)
+            return
+        self._loaders[name] = loader
+
+    @property
+    def names(self):
+        '''
+        全部型号名称（包括尚未加载的插件）。
+        '''
+        return sorted(set(self._devices) | set(self._loaders))
+
+    @property
+    def loaded(self):
+        '''
+        已加载的型号名称。
+        '''
+        return sorted(self._devices)
+
+    @property
+    def unloaded(self):
+        '''
+        已发现、尚未导入的插件型号名称。
+        '''
+        return sorted(self._loaders)
+
+    def get(self, name):
+        '''
+        获取型号，插件在这里才导入。
+
+        :return: DeviceDecoder，型号不存在或插件加载失败时返回 None
+        '''
+        device = self._devices.get(name)
+        if device is not None or name not in self._loaders:
+            return device
+        with self._lock:
+            loader = self._loaders.get(name)
+            if loader is None:
+                return self._devices.get(name)
+            try:
+                device = loader()
+                if not isinstance(device, DeviceDecoder) or device.name != name:
+                    raise TypeError(f'plugin {name} must provide a DeviceDecoder whose schema is named {name}')
+            except Exception as e:
+                logger.error('加载型号插件 %s 失败: %s', name, e)
+                del self._loaders[name]
+                return None
+            self._devices[name] = device
+            del self._loaders[name]
+        logger.info('已加载型号插件 %s（帧长 %d 字节）', name, device.frame_size)
+        return device
+
+    def schemas(self, loaded_only=False):
+        '''
+        型号的帧格式，用于帧格式识别。
+
+        :param loaded_only: True 时只返回已加载的型号（内置型号和已用到的插件），不导入插件；
+                            False 时返回全部型号（会加载全部插件）
+        '''
+        devices = [self.get(name) for name in (self.loaded if loaded_only else self.names)]
+        return [device.schema for device in devices if device]
+
+    def _discover_dir(self, plugin_dir):
+        try:
+            files = sorted(os.listdir(plugin_dir))
+        except OSError:
+            return
+        for file_name in files:
+            name, ext = os.path.splitext(file_name)
+            if ext == '.py' and not name.startswith('_'):
+                self.register_lazy(name, lambda path=os.path.join(plugin_dir, file_name), name=name:
+                                   _load_file(path, name))
+
+    def _discover_entry_points(self, group):
+        try:
+            entry_points = metadata.entry_points(group=group)
+        except Exception as e:
+            logger.debug('读取 entry points 失败: %s', e)
+            return
+        for entry_point in entry_points:
+            self.register_lazy(entry_point.name, entry_point.load)
+
+
+def _load_file(path, name):
+    spec = importlib.util.spec_from_file_location(f'device_plugins.{name}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DEVICE
+
+
+_registry = None
+
+
+def get_device_registry():
+    '''
+    获取全局共享的型号注册表，第一次调用时发现插件（只记录名称，不导入）。
+    '''
+    global _registry
+    if _registry is None:
+        _registry = DeviceRegistry()
+    return _registry
@@ -0,0 +1,339 @@
+'''
+    device_simulator.py
+    基于伪终端的 CYPD7291/CYPD7299 虚拟下位机（仅 Linux/macOS）
+    按设定帧率持续发送二进制帧，可注入 0xFF 无效字段、半帧和线路噪声，
+    SerialOperator 可以像打开真实串口一样打开其 port，用于没有硬件时的压力测试和性能测量；
+    --tcp 时改为在 TCP 端口上发送，模拟串口服务器，用 socket://127.0.0.1:端口 打开
+
+    用法: python device_simulator.py [--devices 2] [--type CYPD7291] [--rate 10] [--invalid 0.01]
+                                     [--partial 0.001] [--noise 0.001] [--link /tmp/ttyV | --tcp 4001]
+                                     [--poll-command 01 --response-delay 0.002]
+'''
+import os
+import sys
+import tty
+import time
+import heapq
+import select
+import random
+import socket
+import argparse
+import threading
+
+from frame_generator import FrameGenerator, DEVICE_LAYOUTS
+from framed_protocol import FramedProtocol
+from logger import logger
+
+
+class VirtualDevice:
+    '''
+    一个虚拟下位机：一对伪终端，port 为从端路径，SerialOperator 打开 port 即可接收数据。
+
+    :param device_type: 'CYPD7291'（10 字节帧）或 'CYPD7299'（6 字节帧）
+    :param rate: 帧率(Hz)
+    :param invalid_rate: 每个字段被替换为 0xFF 的概率
+    :param partial_rate: 每帧只发送前一部分（半帧）的概率
+    :param noise_rate: 每帧之前插入 1~4 个随机噪声字节的概率
+    :param link: 可选的符号链接路径，指向从端，便于使用固定的串口名
+    :param poll_command: 设置后为查询模式：不再按帧率主动发送，每收到一次该命令回复一帧（仅伪终端）
+    :param response_delay: 查询模式下收到命令到回复的时间(s)，模拟固件的处理时间
+    :param framing: 设置后按该 FramedProtocol 加帧头和 CRC 发送；corrupt_rate 为一帧中翻转一位（CRC 应当发现）的概率
+    '''
+    WRITE_TIMEOUT = 1.0     # 一帧只写进一部分时，等待写完剩余部分的最长时间(s)
+
+    def __init__(self, device_type='CYPD7291', rate=10, invalid_rate=0.0, partial_rate=0.0,
+                 noise_rate=0.0, link=None, seed=None, poll_command=None, response_delay=0.0,
+                 framing=None, corrupt_rate=0.0):
+        self.device_type = device_type
+        self.framing = framing
+        self.corrupt_rate = corrupt_rate
+        self.corrupted_frames = 0
+        self.rate = rate
+        self.poll_command = poll_command
+        self.response_delay = response_delay
+        self.polls_received = 0
+        self._command_buffer = b''
+        self.partial_rate = partial_rate
+        self.noise_rate = noise_rate
+        self.generator = FrameGenerator(device_type, invalid_rate, seed)
+        self._random = random.Random(seed)
+        self.link = link
+        self.frames_sent = 0
+        self.partial_frames = 0
+        self.noise_bytes = 0
+        self.frames_dropped = 0     # 接收端读得太慢、缓冲区已满（或没有 TCP 客户端）而丢弃的帧
+        self._open()
+
+    def _open(self):
+        self.master, self._slave = os.openpty()
+        tty.setraw(self.master)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self._slave)
+        if self.link:
+            if os.path.lexists(self.link):
+                os.remove(self.link)
+            os.symlink(self.port, self.link)
+            self.port = self.link
+
+    def _write(self, data):
+        '''
+        写出一帧，缓冲区已满、一个字节也写不进时抛出 BlockingIOError（整帧丢弃）。
+        只写进一部分时等待缓冲区可写，直到整帧写完，不会在帧中间截断字节流。
+        '''
+        view = memoryview(data)
+        written = os.write(self.master, view)
+        deadline = time.perf_counter() + self.WRITE_TIMEOUT
+        while written < len(view):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # 接收端长时间不读，只能放弃剩余部分，接收端会按半帧重新同步
+                logger.warning('虚拟下位机 %s 写入超时，%d 字节未发送', self.port, len(view) - written)
+                raise BlockingIOError
+            select.select([], [self.master], [], remaining)
+            try:
+                written += os.write(self.master, view[written:])
+            except BlockingIOError:
+                pass
+
+    def send_next(self):
+        '''
+        按注入概率生成并发送下一帧（可能带噪声或只发送半帧）。
+        '''
+        rnd = self._random
+        frame = self.generator.next_frame()
+        if self.framing:
+            frame = self.framing.encode(frame)
+            if self.corrupt_rate and rnd.random() < self.corrupt_rate:
+                corrupted = bytearray(frame)
+                corrupted[rnd.randrange(len(corrupted))] ^= 1 << rnd.randrange(8)
+                frame = bytes(corrupted)
+                self.corrupted_frames += 1
+        data = frame
+        if self.noise_rate and rnd.random() < self.noise_rate:
+            noise = bytes(rnd.randint(0, 255) for _ in range(rnd.randint(1, 4)))
+            self.noise_bytes += len(noise)
+            data = noise + data
+        if self.partial_rate and rnd.random() < self.partial_rate:
+            data = data[:len(data) - rnd.randint(1, len(frame) - 1)]
+            self.partial_frames += 1
+        try:
+            self._write(data)
+            self.frames_sent += 1
+        except BlockingIOError:
+            self.frames_dropped += 1
+
+    def read_polls(self):
+        '''
+        查询模式下读取主端收到的数据，返回其中完整查询命令的个数。
+        '''
+        try:
+            data = os.read(self.master, 4096)
+        except BlockingIOError:
+            return 0
+        buffer = self._command_buffer + data
+        count = buffer.count(self.poll_command)
+        # 保留末尾可能是半条命令的字节
+        tail = buffer.rsplit(self.poll_command, 1)[-1]
+        self._command_buffer = tail[-(len(self.poll_command) - 1):] if len(self.poll_command) > 1 else b''
+        self.polls_received += count
+        return count
+
+    def close(self):
+        os.close(self.master)
+        os.close(self._slave)
+        if self.link and os.path.lexists(self.link):
+            os.remove(self.link)
+
+
+class TcpVirtualDevice(VirtualDevice):
+    '''
+    通过 TCP 发送数据的虚拟下位机，模拟串口服务器（ser2net、USR-TCP232 等）的原始 TCP 模式，
+    port 为 'socket://host:port'，SerialOperator 可以直接打开。同一时刻只服务一个客户端，
+    没有客户端连接时生成的帧计入 frames_dropped。
+
+    :param host: 监听地址
+    :param tcp_port: 监听端口，0 表示由系统分配
+    其他参数同 VirtualDevice（不支持 link）
+    '''
+    def __init__(self, device_type='CYPD7291', rate=10, invalid_rate=0.0, partial_rate=0.0,
+                 noise_rate=0.0, host='127.0.0.1', tcp_port=0, seed=None, framing=None, corrupt_rate=0.0):
+        self.host = host
+        self.tcp_port = tcp_port
+        super().__init__(device_type, rate, invalid_rate, partial_rate, noise_rate, None, seed,
+                         framing=framing, corrupt_rate=corrupt_rate)
+
+    def _open(self):
+        self.master = None
+        self._server = socket.create_server((self.host, self.tcp_port))
+        self._server.setblocking(False)
+        self.tcp_port = self._server.getsockname()[1]
+        self.port = f'socket://{self.host}:{self.tcp_port}'
+        self._client = None
+        self._unsent = b''  # 上一次只发出一部分的数据，保证字节流不被截断
+
+    def _accept(self):
+        try:
+            client, address = self._server.accept()
+        except BlockingIOError:
+            return None
+        client.setblocking(False)
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        logger.info('虚拟下位机 %s 接受连接: %s', self.port, address)
+        self._unsent = b''
+        return client
+
+    def _write(self, data):
+        if self._client is None:
+            self._client = self._accept()
+            if self._client is None:
+                raise BlockingIOError
+        try:
+            if self._unsent:
+                sent = self._client.send(self._unsent)
+                self._unsent = self._unsent[sent:]
+                if self._unsent:
+                    raise BlockingIOError
+            sent = self._client.send(data)
+            self._unsent = data[sent:]
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info('虚拟下位机 %s 的客户端断开', self.port)
+            self._client.close()
+            self._client = None
+            raise BlockingIOError
+
+    def close(self):
+        if self._client:
+            self._client.close()
+        self._server.close()
+
+
+class DeviceSimulator:
+    '''
+    在一个线程中驱动多个虚拟下位机，各自按帧率发送（1Hz 到数 kHz）。
+    '''
+    def __init__(self):
+        self.devices = []
+        self._thread = None
+        self._running = False
+
+    def add_device(self, *args, tcp=False, **kwargs):
+        '''
+        创建一个虚拟下位机，参数同 VirtualDevice；tcp=True 时创建 TcpVirtualDevice，参数同 TcpVirtualDevice。
+
+        :return: 创建的 VirtualDevice
+        '''
+        device = (TcpVirtualDevice if tcp else VirtualDevice)(*args, **kwargs)
+        self.devices.append(device)
+        logger.info('虚拟下位机 %s 已创建: %s，%.0f Hz', device.device_type, device.port, device.rate)
+        return device
+
+    def start(self):
+        '''
+        启动发送线程。
+        '''
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='DeviceSimulator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''
+        停止发送线程，伪终端保持打开。
+        '''
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        '''
+        停止发送并关闭所有虚拟下位机。
+        '''
+        self.stop()
+        for device in self.devices:
+            device.close()
+        self.devices.clear()
+
+    def _run(self):
+        now = time.perf_counter()
+        # (计划时间, 序号, 设备下标, 是否为查询应答)，主动发送的设备按帧率循环，查询应答只发送一次
+        schedule = [(now, i, i, False) for i, device in enumerate(self.devices) if not device.poll_command]
+        heapq.heapify(schedule)
+        sequence = len(self.devices)
+        polled = {device.master: i for i, device in enumerate(self.devices) if device.poll_command}
+        while self._running:
+            delay = min(schedule[0][0] - time.perf_counter(), 0.1) if schedule else 0.1
+            if polled:
+                ready, _, _ = select.select(list(polled), [], [], max(delay, 0))
+                for fd in ready:
+                    index = polled[fd]
+                    device = self.devices[index]
+                    for _ in range(device.read_polls()):
+                        sequence += 1
+                        heapq.heappush(schedule, (time.perf_counter() + device.response_delay, sequence, index, True))
+            elif delay > 0:
+                time.sleep(delay)
+            self._send_due(schedule)
+
+    def _send_due(self, schedule):
+        while schedule and schedule[0][0] <= time.perf_counter():
+            due, sequence, index, reply = schedule[0]
+            device = self.devices[index]
+            device.send_next()
+            if reply:
+                heapq.heappop(schedule)
+            else:
+                # 按计划时间累加，落后太多（超过 1 秒）时不再补发
+                due = max(due + 1 / device.rate, time.perf_counter() - 1)
+                heapq.heapreplace(schedule, (due, sequence, index, False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CYPD7291/CYPD7299 虚拟下位机')
+    parser.add_argument('--devices', type=int, default=1, help='虚拟下位机数量')
+    parser.add_argument('--type', choices=sorted(DEVICE_LAYOUTS), default='CYPD7291')
+    parser.add_argument('--rate', type=float, default=10, help='每个设备的帧率(Hz)')
+    parser.add_argument('--invalid', type=float, default=0.0, help='字段为 0xFF 的概率')
+    parser.add_argument('--partial', type=float, default=0.0, help='发送半帧的概率')
+    parser.add_argument('--noise', type=float, default=0.0, help='插入噪声字节的概率')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--link', help='符号链接前缀，例如 /tmp/ttyV 会创建 /tmp/ttyV0、/tmp/ttyV1 ...')
+    group.add_argument('--tcp', type=int, metavar='PORT',
+                       help='改为在 TCP 端口上发送（模拟串口服务器），第 i 个设备监听 PORT+i')
+    parser.add_argument('--host', default='127.0.0.1', help='--tcp 的监听地址')
+    parser.add_argument('--poll-command', type=bytes.fromhex, metavar='HEX',
+                        help='查询模式：收到该命令（十六进制，例如 01）才回复一帧，--rate 不再生效')
+    parser.add_argument('--response-delay', type=float, default=0.0, help='查询模式下的回复延迟(s)')
+    parser.add_argument('--framed', choices=sorted(FramedProtocol.CRCS),
+                        help='加帧头、长度和 CRC 发送（带帧头的帧协议）')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='--framed 时一帧中翻转一位的概率')
+    args = parser.parse_args(argv)
+
+    simulator = DeviceSimulator()
+    framing = FramedProtocol(args.framed) if args.framed else None
+    for i in range(args.devices):
+        if args.tcp is not None:
+            device = simulator.add_device(args.type, args.rate, args.invalid, args.partial, args.noise,
+                                          args.host, args.tcp + i if args.tcp else 0, tcp=True,
+                                          framing=framing, corrupt_rate=args.corrupt)
+        else:
+            link = f'{args.link}{i}' if args.link else None
+            device = simulator.add_device(args.type, args.rate, args.invalid, args.partial, args.noise, link,
+                                          poll_command=args.poll_command, response_delay=args.response_delay,
+                                          framing=framing, corrupt_rate=args.corrupt)
+        print(device.port)
+    simulator.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in simulator.devices:
+            print(f'{device.port}: sent {device.frames_sent}, partial {device.partial_frames}, '
+                  f'noise bytes {device.noise_bytes}, corrupted {device.corrupted_frames}, '
+                  f'dropped {device.frames_dropped}')
+        simulator.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+'''
+    帧格式识别
+    打开串口后先收一小段数据，根据到达时序和数值合理性推断帧长和设备型号，
+    任意串口都可以接任意型号的下位机，不需要逐个手动指定
+'''
+import statistics
+
+from frame_schema import SCHEMAS
+from frame_assembler import make_range_validator
+from framed_protocol import FramedAssembler
+
+
+class FormatDetector:
+    '''
+    根据一段原始数据从候选帧格式中选出最可能的一种。
+
+    对每个候选帧长 P 计算三项 0~1 的得分，取平均：
+      - 周期性：data[i] == data[i + P] 的比例。功率、电压很少变化，电流随机游走，
+        按真实帧长错开时大部分字节相同，按错误帧长错开时接近随机；
+      - 合理性：像帧重组器一样逐帧检查、不合理时滑动一个字节，各字段都在 schema.limits 范围内的帧
+        覆盖的字节比例；
+      - 时序：以字节间隔超过 BURST_GAP 的空闲切分数据块，长度为 P 整数倍的块的比例。
+        帧率高到帧之间没有空闲时这一项不参与。
+    最高分低于 MIN_SCORE，或与第二名相差不到 MIN_MARGIN 时认为无法判断。
+
+    framing 不为 None 时数据带帧头和 CRC，帧长直接由长度字节给出：
+    得分为 CRC 正确、长度等于候选帧长的帧覆盖的字节比例。
+    '''
+    SNIFF_TIME = 0.3        # 嗅探时间(s)，到时数据仍不足以判断时继续嗅探，最长 MAX_SNIFF_TIME
+    MAX_SNIFF_TIME = 2.0    # 低帧率设备最长嗅探时间(s)
+    BURST_GAP = 0.002       # 判定帧之间空闲的字节间隔(s)
+    MIN_FRAMES = 8          # 每个候选格式至少需要的帧数
+    ENOUGH_FRAMES = 32      # 收到这么多帧（按最长的候选帧长）即可提前结束
+    MAX_BYTES = 2048        # 最多保留的数据量
+    MIN_SCORE = 0.7
+    MIN_MARGIN = 0.1
+
+    def __init__(self, schemas=None, framing=None):
+        self.schemas = list(schemas or SCHEMAS.values())
+        self.framing = framing
+        self.scores = {}            # 设备型号 -> 得分，detect() 之后有效
+        self.frame_period = None    # 由数据块间隔估计的帧周期(s)，没有空闲时为 None
+        self._chunks = []           # (timestamp_ns, 数据块)，每块之后线路空闲
+        self._size = 0
+        self._validators = {schema.name: make_range_validator(schema.limits) for schema in self.schemas}
+
+    def with_schemas(self, schemas):
+        '''
+        用另一组候选帧格式创建识别器，已收到的数据保留（例如内置型号无法识别时加入插件型号继续识别）。
+        '''
+        detector = FormatDetector(schemas, self.framing)
+        detector._chunks = list(self._chunks)
+        detector._size = self._size
+        return detector
+
+    @property
+    def data(self):
+        '''
+        已收到的全部数据。
+        '''
+        return b''.join(chunk for _, chunk in self._chunks)
+
+    @property
+    def received(self):
+        '''
+        已收到的字节数。
+        '''
+        return self._size
+
+    @property
+    def enough(self):
+        '''
+        数据是否已足够判断，可以提前结束嗅探。
+        '''
+        largest = max(schema.size for schema in self.schemas) + (self.framing.overhead if self.framing else 0)
+        return self._size >= min(self.MAX_BYTES, self.ENOUGH_FRAMES * largest)
+
+    def feed(self, chunk, timestamp_ns):
+        '''
+        输入一块数据。
+
+        :param chunk: 一次读取得到的数据，读取在字节间隔超过 BURST_GAP 时返回
+        :param timestamp_ns: 数据块的到达时刻 time.monotonic_ns()
+        '''
+        if chunk and self._size < self.MAX_BYTES:
+            chunk = bytes(chunk[:self.MAX_BYTES - self._size])
+            self._chunks.append((timestamp_ns, chunk))
+            self._size += len(chunk)
+
+    def detect(self):
+        '''
+        判断帧格式。
+
+        :return: FrameSchema，无法判断时返回 None
+        '''
+        data = self.data
+        timing = self._burst_sizes()
+        self.scores = {}
+        if self.framing:
+            self._framed_scores(data)
+        else:
+            for schema in self.schemas:
+                if len(data) < (self.MIN_FRAMES + 1) * schema.size:
+                    continue
+                scores = [self._periodicity(data, schema.size), self._plausibility(data, schema)]
+                if timing:
+                    scores.append(sum(1 for size in timing if size % schema.size == 0) / len(timing))
+                self.scores[schema.name] = sum(scores) / len(scores)
+        if not self.scores:
+            return None
+        ranked = sorted(self.scores.items(), key=lambda item: item[1], reverse=True)
+        name, best = ranked[0]
+        if best < self.MIN_SCORE or (len(ranked) > 1 and best - ranked[1][1] < self.MIN_MARGIN):
+            return None
+        return next(schema for schema in self.schemas if schema.name == name)
+
+    def _burst_sizes(self):
+        # 第一块和最后一块可能是半帧，不参与；块数太少时说明帧之间没有空闲
+        chunks = self._chunks[1:-1]
+        if len(chunks) < self.MIN_FRAMES:
+            return None
+        self.frame_period = statistics.median(
+            (b[0] - a[0]) / 1e9 for a, b in zip(self._chunks, self._chunks[1:]))
+        return [len(chunk) for _, chunk in chunks]
+
+    def _framed_scores(self, data):
+        assembler = FramedAssembler(None, self.framing, max(len(data), 1))
+        assembler.feed(data)
+        overhead = self.framing.overhead
+        for schema in self.schemas:
+            if len(data) >= (self.MIN_FRAMES + 1) * (schema.size + overhead):
+                self.scores[schema.name] = assembler.lengths.get(schema.size, 0) * (schema.size + overhead) / len(data)
+
+    @staticmethod
+    def _periodicity(data, size):
+        count = len(data) - size
+        return sum(1 for a, b in zip(data, data[size:]) if a == b) / count
+
+    def _plausibility(self, data, schema):
+        # 与帧重组器相同的贪心切帧：合理则取一帧，不合理则滑动一个字节，噪声字节只影响局部的对齐
+        validator = self._validators[schema.name]
+        size = schema.size
+        position = accepted = 0
+        while position + size <= len(data):
+            if validator(data[position:position + size]):
+                accepted += size
+                position += size
+            else:
+                position += 1
+        return accepted / len(data)
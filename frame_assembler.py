@@ -0,0 +1,128 @@
+'''
+    帧重组
+    把任意切分的串口数据流还原成定长帧，并在错位、噪声、半帧之后重新找到帧边界
+'''
+import time
+
+from ring_buffer import ReceiveBuffer
+from frame_schema import SCHEMAS, INVALID_BYTE
+from logger import logger
+
+# 各字段的合理上限（原始字节值，0xFF 无效值始终允许），用于判断候选帧是否对齐，由帧格式中的 maximum 生成
+# 功率(W) <= 240，电压(0.1V) <= 250，电流(0.1A) <= 60
+FRAME_LIMITS = {schema.size: schema.limits for schema in SCHEMAS.values()}
+
+
+def make_range_validator(limits):
+    '''
+    根据各字段的上限生成帧合理性检查函数。
+
+    :param limits: 每个字节的最大合理值
+    :return: validator(frame) -> bool
+    '''
+    limits = tuple(limits)
+
+    def validator(frame):
+        for value, limit in zip(frame, limits):
+            if value > limit and value != INVALID_BYTE:
+                return False
+        return True
+    return validator
+
+
+class FrameAssembler:
+    '''
+    定长帧流式重组器。
+
+    feed() 接收任意长度的数据块，返回其中所有完整的帧（按到达顺序）；不完整的尾部留到下一次。
+    也可以通过 buffer.writable()/commit() 让串口直接 readinto 到内部缓冲区，再调用 process()。
+    每一帧以 (frame, timestamp_ns) 返回：frame 是内部缓冲区的 memoryview，只在下一次写入缓冲区之前有效；
+    timestamp_ns 是补齐该帧的那块数据的到达时刻（time.monotonic_ns()）。
+
+    帧没有帧头和校验，按两种方式确定边界：
+      - 调用方知道数据块之后线路空闲（例如字节间隔超时返回的短读）时，空闲点就是帧尾，
+        缓冲区按帧尾对齐，多出的开头字节作为残帧丢弃；
+      - 否则逐帧用 validator 检查合理性，不合理时滑动一个字节重新寻找边界。
+    '''
+    def __init__(self, frame_size, validator=None, capacity=4096):
+        self.frame_size = frame_size
+        self.validator = validator
+        self.buffer = ReceiveBuffer(capacity)
+        self._in_resync = False
+        self.frames = 0             # 输出的完整帧数
+        self.resyncs = 0            # 重新寻找帧边界的次数
+        self.discarded_bytes = 0    # 因错位/残帧丢弃的字节数
+
+    @property
+    def wire_size(self):
+        '''
+        一帧在线路上的字节数，定长帧即 frame_size。
+        '''
+        return self.frame_size
+
+    @property
+    def pending(self):
+        '''
+        获取缓冲区中尚未组成完整帧的字节数。
+        '''
+        return len(self.buffer)
+
+    def reset(self):
+        '''
+        清空缓冲区（例如重新打开串口后），计数器保持不变。
+        '''
+        self.buffer.clear()
+        self._in_resync = False
+
+    def feed(self, chunk, idle_after=False, timestamp_ns=None):
+        '''
+        输入一块数据，返回其中的完整帧。
+
+        :param chunk: 新到达的数据
+        :param idle_after: 这块数据之后线路空闲，即缓冲区末尾就是帧尾
+        :param timestamp_ns: 这块数据的到达时刻（time.monotonic_ns()），默认取当前时刻
+        :return: (frame, timestamp_ns) 的列表
+        '''
+        if chunk:
+            self.buffer.write(chunk)
+        return self.process(idle_after, timestamp_ns)
+
+    def process(self, idle_after=False, timestamp_ns=None):
+        '''
+        从缓冲区中取出所有完整的帧。
+
+        :param idle_after: 缓冲区末尾之后线路空闲，即缓冲区末尾就是帧尾
+        :param timestamp_ns: 最后写入的数据的到达时刻（time.monotonic_ns()），默认取当前时刻
+        :return: (frame, timestamp_ns) 的列表
+        '''
+        buffer = self.buffer
+        size = self.frame_size
+        if idle_after:
+            remainder = len(buffer) % size
+            if remainder:
+                self._discard(remainder, '空闲前的残帧')
+                self._in_resync = False
+        frames = []
+        if len(buffer) < size:
+            return frames
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        validator = self.validator
+        while len(buffer) >= size:
+            frame = buffer.peek(size)
+            if validator is None or validator(frame):
+                frames.append((frame, timestamp_ns))
+                buffer.consume(size)
+                self._in_resync = False
+            else:
+                self._discard(1, '帧内容不合理')
+        self.frames += len(frames)
+        return frames
+
+    def _discard(self, count, reason):
+        if not self._in_resync:
+            self.resyncs += 1
+            self._in_resync = True
+            logger.debug('帧边界错位(%s)，重新同步，第 %d 次', reason, self.resyncs)
+        self.buffer.consume(count)
+        self.discarded_bytes += count
@@ -0,0 +1,56 @@
+'''
+    frame_generator.py
+    生成与 CYPD7291/CYPD7299 下位机格式一致的二进制帧，供模拟数据、虚拟下位机和性能测量使用。
+    不依赖平台相关的模块，Windows 上也可以导入
+'''
+import random
+
+# 设备类型 -> 帧中各字节的含义，pow: 功率(W)，vol: 电压(0.1V)，cur: 电流(0.1A)
+DEVICE_LAYOUTS = {
+    'CYPD7291': ('pow', 'vol', 'cur', 'pow', 'vol', 'cur', 'vol', 'cur', 'vol', 'cur'),
+    'CYPD7299': ('pow', 'vol', 'cur', 'pow', 'vol', 'cur'),
+}
+PD_POWERS = (0, 15, 27, 45, 60, 65, 100)     # 常见的 PD 协商功率(W)
+PD_VOLTAGES = (50, 90, 120, 150, 200)          # 5V/9V/12V/15V/20V
+MAX_CURRENT = 50                               # 5A
+INVALID_BYTE = 0xFF
+
+
+class FrameGenerator:
+    '''
+    生成逼真的二进制帧：功率和电压在 PD 档位之间偶尔切换，电流随机游走。
+    '''
+    def __init__(self, device_type='CYPD7291', invalid_rate=0.0, seed=None):
+        self.layout = DEVICE_LAYOUTS[device_type]
+        self.invalid_rate = invalid_rate
+        self._random = random.Random(seed)
+        self._values = [self._initial(kind) for kind in self.layout]
+
+    @property
+    def frame_size(self):
+        return len(self.layout)
+
+    def _initial(self, kind):
+        if kind == 'pow':
+            return self._random.choice(PD_POWERS)
+        if kind == 'vol':
+            return self._random.choice(PD_VOLTAGES)
+        return self._random.randint(0, MAX_CURRENT)
+
+    def next_frame(self):
+        '''
+        生成下一帧。
+        '''
+        rnd = self._random
+        values = self._values
+        frame = bytearray(len(values))
+        for i, kind in enumerate(self.layout):
+            if kind == 'cur':
+                values[i] = min(MAX_CURRENT, max(0, values[i] + rnd.randint(-2, 2)))
+            elif rnd.random() < 0.001:
+                values[i] = self._initial(kind)
+            if self.invalid_rate and rnd.random() < self.invalid_rate:
+                frame[i] = INVALID_BYTE
+            else:
+                frame[i] = values[i]
+        return bytes(frame)
@@ -0,0 +1,351 @@
+'''
+    帧格式描述
+    用声明式的字段表描述下位机的帧（偏移、宽度、比例、无效值、派生量），
+    编译成一个基于 struct.Struct 的解码函数，新增设备只需要新增一张表；
+    安装了 numpy 时还可以编译批量解码函数，一次把 N 帧解码成结构化数组
+'''
+import re
+import struct
+try:
+    import numpy as np
+except ImportError:     # numpy 是可选依赖，只有批量解码需要
+    np = None
+
+from logger import logger
+
+INVALID_BYTE = 0xFF     # 下位机用 0xFF 表示该字段无效
+
+_STRUCT_CODES = {(1, False): 'B', (1, True): 'b', (2, False): 'H', (2, True): 'h',
+                 (4, False): 'I', (4, True): 'i'}
+
+
+class Field:
+    '''
+    帧中的一个原始字段。
+
+    :param name: 字段名，同时用作派生量表达式中的变量名
+    :param offset: 字节偏移
+    :param width: 字节数，1/2/4
+    :param scale: 比例，物理值 = 原始值 * scale
+    :param digits: 物理值保留的小数位数，None 表示不取整
+    :param invalid: 表示无效的原始值，None 表示没有无效值
+    :param signed: 是否为有符号数
+    :param maximum: 合理的最大原始值（用于帧边界检查），None 表示不检查
+    '''
+    def __init__(self, name, offset, width=1, scale=1, digits=None, invalid=INVALID_BYTE, signed=False,
+                 maximum=None):
+        self.name = name
+        self.offset = offset
+        self.width = width
+        self.scale = scale
+        self.digits = digits
+        self.invalid = invalid
+        self.signed = signed
+        self.maximum = maximum
+
+
+class Derived:
+    '''
+    由原始字段计算的派生量，例如功率 = 电压 * 电流。
+
+    :param name: 派生量名称
+    :param expression: Python 表达式，变量为字段名（取物理值），任一变量无效时结果无效
+    :param digits: 保留的小数位数，None 表示不取整
+    '''
+    def __init__(self, name, expression, digits=None):
+        self.name = name
+        self.expression = expression
+        self.digits = digits
+
+
+class FrameSchema:
+    '''
+    一种设备的帧格式。
+
+    :param name: 设备型号
+    :param size: 帧长（字节）
+    :param fields: Field 列表
+    :param derived: Derived 列表
+    :param outputs: 解码结果中各值的顺序（字段名或派生量名），默认为全部字段后接全部派生量
+    :param byteorder: 多字节字段的字节序，'<' 小端或 '>' 大端
+    '''
+    def __init__(self, name, size, fields, derived=(), outputs=None, byteorder='<'):
+        self.name = name
+        self.size = size
+        self.fields = list(fields)
+        self.derived = list(derived)
+        self.outputs = list(outputs) if outputs else [f.name for f in self.fields] + [d.name for d in self.derived]
+        self.byteorder = byteorder
+        # 无效掩码中每个值对应的位：outputs 依次为第 0、1、2... 位，不在 outputs 中的值排在后面
+        names = self.outputs + [value.name for value in self.fields + self.derived if value.name not in self.outputs]
+        self.bits = {name: 1 << index for index, name in enumerate(names)}
+        self.field_bits = 0     # 所有原始字段（不含派生量）对应的位
+        for field in self.fields:
+            self.field_bits |= self.bits[field.name]
+        self._inputs = {derived.name: [name for name in dict.fromkeys(re.findall(r'[A-Za-z_]\w*', derived.expression))
+                                       if name in self.bits]
+                        for derived in self.derived}
+        self._decoders = {}     # (text, mask) -> 编译好的解码函数
+        self._batch_decoder = None
+
+    @property
+    def limits(self):
+        '''
+        每个字节的最大合理值（多字节字段和未声明的字节为 0xFF），可传给 frame_assembler.make_range_validator。
+        '''
+        limits = [0xFF] * self.size
+        for field in self.fields:
+            if field.width == 1 and field.maximum is not None:
+                limits[field.offset] = field.maximum
+        return tuple(limits)
+
+    def invalid_names(self, invalid):
+        '''
+        列出无效掩码中置位的值的名称。
+        '''
+        return [name for name, bit in self.bits.items() if invalid & bit]
+
+    def compile(self, text=False, mask=False):
+        '''
+        编译解码函数（结果会缓存）。
+
+        :param text: True 时返回值转换为界面显示用的字符串（无效值仍为 None）
+        :param mask: True 时同时返回无效掩码
+        :return: decode(frame) -> tuple，按 outputs 顺序返回物理值，无效值为 None；
+                 mask 为 True 时返回 (tuple, invalid)，invalid 中按 bits 置位的值无效（原始值为无效值，
+                 或派生量的输入无效），全部有效时为 0；
+                 frame 可以是 bytes、bytearray 或 memoryview，decode.source 为生成的源码
+        '''
+        decoder = self._decoders.get((text, mask))
+        if decoder is None:
+            decoder = self._decoders[(text, mask)] = self._build(text, mask)
+        return decoder
+
+    def compile_batch(self):
+        '''
+        编译批量解码函数（需要 numpy，结果会缓存）。
+
+        :return: decode_batch(buffer) -> numpy 结构化数组，buffer 为 N 帧首尾相连的数据
+                 （bytes、bytearray、memoryview 或 uint8 数组），每帧一行，每个输出值一列（float64），
+                 已按比例换算和取整，无效值为 NaN；另有 'invalid' 列（uint32）为每帧的无效掩码
+        '''
+        if np is None:
+            raise RuntimeError('batch decoding requires numpy')
+        if self._batch_decoder is None:
+            self._batch_decoder = self._build_batch()
+        return self._batch_decoder
+
+    def _check_layout(self):
+        position = 0
+        for field in sorted(self.fields, key=lambda f: f.offset):
+            if field.offset < position:
+                raise ValueError(f'{self.name}: field {field.name} overlaps the previous field')
+            position = field.offset + field.width
+        if position > self.size:
+            raise ValueError(f'{self.name}: fields exceed the frame size {self.size}')
+        if 'invalid' in self.bits:
+            raise ValueError(f'{self.name}: "invalid" is reserved for the invalid mask')
+
+    def _derived_bits(self, derived):
+        bits = 0
+        for name in self._inputs[derived.name]:
+            bits |= self.bits[name]
+        return bits
+
+    def _build(self, text, mask):
+        self._check_layout()
+        fmt, names, position = self.byteorder, [], 0
+        for field in sorted(self.fields, key=lambda f: f.offset):
+            fmt += 'x' * (field.offset - position) + _STRUCT_CODES[(field.width, field.signed)]
+            position = field.offset + field.width
+            names.append(field.name)
+        layout = struct.Struct(fmt)
+
+        lines = [f'def decode(frame, _unpack=_layout.unpack_from):',
+                 f'    {"".join(name + ", " for name in names)}= _unpack(frame)']
+        # 一次比较得到全部原始字段的无效掩码；通常全部有效，直接走没有逐值判断的分支
+        checks = [f'({field.name} == {field.invalid}) << {self.bits[field.name].bit_length() - 1}'
+                  for field in self.fields if field.invalid is not None]
+        if checks:
+            lines.append(f'    invalid = {" | ".join(checks)}')
+            lines.append(f'    if invalid:')
+            for derived in self.derived:
+                inputs = self._derived_bits(derived)
+                if inputs:
+                    lines.append(f'        if invalid & {inputs}:')
+                    lines.append(f'            invalid |= {self.bits[derived.name]}')
+            lines += [f'        {line}' for line in self._decode_lines(text, mask, 'invalid')]
+        lines += [f'    {line}' for line in self._decode_lines(text, mask, None)]
+        source = '\n'.join(lines)
+        namespace = {'_layout': layout}
+        exec(compile(source, f'<frame schema {self.name}>', 'exec'), namespace)
+        decode = namespace['decode']
+        decode.source = source
+        logger.debug('帧格式 %s 编译完成%s:\n%s', self.name, '（文本）' if text else '', source)
+        return decode
+
+    def _decode_lines(self, text, mask, invalid):
+        '''
+        生成换算、派生量和返回语句；invalid 为掩码变量名时按掩码把无效值置为 None，为 None 时假定全部有效。
+        '''
+        lines = []
+        for field in self.fields:
+            value = _scaled(field.name, field.scale, field.digits)
+            if invalid and field.invalid is not None:
+                lines.append(f'{field.name} = None if {invalid} & {self.bits[field.name]} else {value}')
+            elif value != field.name:
+                lines.append(f'{field.name} = {value}')
+        nullable = set()
+        for derived in self.derived:
+            value = derived.expression if derived.digits is None else f'round({derived.expression}, {derived.digits})'
+            if invalid and self._derived_bits(derived):
+                lines.append(f'{derived.name} = None if {invalid} & {self.bits[derived.name]} else {value}')
+            else:
+                lines.append(f'{derived.name} = {value}')
+        if invalid:
+            nullable = {name for name in self.outputs if self._nullable(name)}
+        if text:
+            outputs = [f'None if {name} is None else str({name})' if name in nullable else f'str({name})'
+                       for name in self.outputs]
+        else:
+            outputs = self.outputs
+        values = f'({"".join(value + ", " for value in outputs)})'
+        lines.append(f'return {values}, {invalid or 0}' if mask else f'return {values}')
+        return lines
+
+    def _nullable(self, name):
+        for field in self.fields:
+            if field.name == name:
+                return field.invalid is not None
+        return any(self._nullable(input_name) for input_name in self._inputs.get(name, ()))
+
+    def _build_batch(self):
+        self._check_layout()
+        raw_dtype = np.dtype({'names': [field.name for field in self.fields],
+                              'formats': [self.byteorder + _STRUCT_CODES[(field.width, field.signed)]
+                                          for field in self.fields],
+                              'offsets': [field.offset for field in self.fields],
+                              'itemsize': self.size})
+        out_dtype = np.dtype([(name, np.float64) for name in self.outputs] + [('invalid', np.uint32)])
+        expressions = [(derived, compile(derived.expression, f'<frame schema {self.name}>', 'eval'),
+                        self._derived_bits(derived), self.bits[derived.name])
+                       for derived in self.derived]
+        size, fields, bits = self.size, self.fields, self.bits
+
+        def decode_batch(buffer):
+            if len(buffer) % size:
+                raise ValueError(f'buffer length {len(buffer)} is not a multiple of the frame size {size}')
+            raw = np.frombuffer(buffer, raw_dtype)
+            invalid = np.zeros(len(raw), np.uint32)
+            columns = {}
+            for field in fields:
+                column = raw[field.name]
+                values = column.astype(np.float64)
+                if field.scale != 1:
+                    values *= field.scale
+                    if field.digits is not None:
+                        np.round(values, field.digits, out=values)
+                if field.invalid is not None:
+                    flags = column == field.invalid
+                    values[flags] = np.nan
+                    invalid |= flags.astype(np.uint32) << (bits[field.name].bit_length() - 1)
+                columns[field.name] = values
+            for derived, code, inputs, bit in expressions:
+                # 任一输入为 NaN 时结果自然为 NaN
+                values = eval(code, {'__builtins__': {}}, columns)
+                if derived.digits is not None:
+                    values = np.round(values, derived.digits)
+                columns[derived.name] = values
+                if inputs:
+                    invalid |= np.where(invalid & inputs, bit, 0).astype(np.uint32)
+            result = np.empty(len(raw), out_dtype)
+            for name in self.outputs:
+                result[name] = columns[name]
+            result['invalid'] = invalid
+            return result
+        return decode_batch
+
+
+class InvalidStats:
+    '''
+    按串口汇总无效值：含无效值的帧数、无效的原始字段数和每个字段的无效次数。
+    '''
+    def __init__(self, schema):
+        self.schema = schema
+        self.frames = 0             # 含无效值的帧数
+        self.fields = 0             # 无效的原始字段总数
+        self.by_field = dict.fromkeys((field.name for field in schema.fields), 0)
+        self._field_bits = [(field.name, schema.bits[field.name]) for field in schema.fields]
+
+    def add(self, invalid):
+        '''
+        记录一帧的无效掩码（0 时不需要调用）。
+        '''
+        self.frames += 1
+        for name, bit in self._field_bits:
+            if invalid & bit:
+                self.by_field[name] += 1
+                self.fields += 1
+
+    def add_batch(self, invalid):
+        '''
+        记录一批帧的无效掩码（compile_batch 结果的 'invalid' 列）。
+        '''
+        invalid = invalid[invalid != 0]
+        if not len(invalid):
+            return
+        self.frames += len(invalid)
+        for name, bit in self._field_bits:
+            count = int(np.count_nonzero(invalid & bit))
+            self.by_field[name] += count
+            self.fields += count
+
+    def stats(self):
+        '''
+        获取统计信息。
+        '''
+        return {'invalid_frames': self.frames, 'invalid_fields': self.fields,
+                'invalid_by_field': {name: count for name, count in self.by_field.items() if count}}
+
+
+def _scaled(name, scale, digits):
+    if scale == 1:
+        value = name
+    elif abs(1 / scale - round(1 / scale)) < 1e-9:
+        # 比例是整数的倒数时用除法，与 round(x / 10, 1) 的结果完全一致
+        value = f'{name} / {round(1 / scale)}'
+    else:
+        value = f'{name} * {scale!r}'
+    return value if digits is None or scale == 1 else f'round({value}, {digits})'
+
+
+def _pd_port(prefix, offset, power=True):
+    '''
+    一个 PD 口的字段：[协商功率(W)]、电压(0.1V)、电流(0.1A)，以及派生的实时功率 = 电压 * 电流。
+    '''
+    fields = []
+    if power:
+        fields.append(Field(f'{prefix}_pow', offset, maximum=240))
+        offset += 1
+    fields += [Field(f'{prefix}_vol', offset, scale=0.1, digits=1, maximum=250),
+               Field(f'{prefix}_cur', offset + 1, scale=0.1, digits=1, maximum=60)]
+    derived = Derived(f'{prefix}_cur_pow', f'{prefix}_vol * {prefix}_cur', digits=2)
+    return fields, derived
+
+
+def _pd_schema(name, ports):
+    fields, derived, outputs, offset = [], [], [], 0
+    for prefix, power in ports:
+        port_fields, port_derived = _pd_port(prefix, offset, power)
+        fields += port_fields
+        derived.append(port_derived)
+        outputs += [field.name for field in port_fields] + [port_derived.name]
+        offset += len(port_fields)
+    return FrameSchema(name, offset, fields, derived, outputs)
+
+
+# 内置的帧格式，输出顺序与 SerialThread 的数据信号参数一致
+SCHEMAS = {
+    'CYPD7291': _pd_schema('CYPD7291', [('usb_c1', True), ('usb_c2', True), ('usb1', False), ('usb2', False)]),
+    'CYPD7299': _pd_schema('CYPD7299', [('usb4_c1', True), ('usb4_c2', True)]),
+}
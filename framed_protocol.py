@@ -0,0 +1,184 @@
+'''
+    带帧头、长度和 CRC 的帧协议（可选）
+    固件支持时每帧为 [AA 55][长度][数据][CRC]，帧边界由帧头和长度确定，CRC 发现传输错误，
+    不再像原始定长帧那样只能按数值合理性和线路空闲猜测边界
+'''
+import binascii
+import time
+
+from ring_buffer import ReceiveBuffer
+from logger import logger
+
+
+def make_crc8_table(poly=0x07):
+    '''
+    生成 CRC-8 查找表（高位在前，不反转）。
+
+    :param poly: 生成多项式，默认 0x07（CRC-8/SMBUS）
+    :return: 256 项的 bytes，table[crc ^ byte] 即下一个 crc
+    '''
+    table = bytearray(256)
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[index] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = make_crc8_table()
+
+
+def crc8(data, crc=0, table=CRC8_TABLE):
+    '''
+    查表计算 CRC-8/SMBUS，每个字节一次查表。
+    '''
+    for byte in data:
+        crc = table[crc ^ byte]
+    return crc
+
+
+def crc16(data, crc=0xFFFF):
+    '''
+    计算 CRC-16/CCITT-FALSE（多项式 0x1021，初值 0xFFFF），由 binascii.crc_hqx 在 C 中整块计算。
+    '''
+    return binascii.crc_hqx(data, crc)
+
+
+class FramedProtocol:
+    '''
+    帧格式：帧头 sync + 1 字节数据长度 + 数据 + CRC（大端）。CRC 覆盖长度字节和数据。
+
+    :param crc: 'crc8' 或 'crc16'
+    :param sync: 帧头
+    '''
+    SYNC = b'\xAA\x55'
+    CRCS = {'crc8': (crc8, 1), 'crc16': (crc16, 2)}     # 名称 -> (计算函数, 字节数)
+
+    def __init__(self, crc='crc16', sync=SYNC):
+        if crc not in self.CRCS:
+            raise ValueError(f'unknown crc {crc}, expected one of {sorted(self.CRCS)}')
+        self.name = crc
+        self.crc, self.crc_size = self.CRCS[crc]
+        self.sync = bytes(sync)
+        self.header_size = len(self.sync) + 1
+
+    @property
+    def overhead(self):
+        '''
+        每帧额外的字节数（帧头、长度和 CRC）。
+        '''
+        return self.header_size + self.crc_size
+
+    def encode(self, payload):
+        '''
+        把一帧数据封装成带帧头和 CRC 的帧（虚拟下位机和测试使用）。
+        '''
+        if len(payload) > 255:
+            raise ValueError(f'payload too long: {len(payload)} bytes')
+        body = bytes((len(payload),)) + bytes(payload)
+        return self.sync + body + self.crc(body).to_bytes(self.crc_size, 'big')
+
+    def __repr__(self):
+        return f'FramedProtocol({self.name!r}, sync={self.sync.hex()})'
+
+
+class FramedAssembler:
+    '''
+    带帧头的帧流式重组器，接口与 FrameAssembler 相同，输出的 frame 是去掉帧头和 CRC 的数据部分。
+
+    在缓冲区中查找帧头（bytearray.find，C 实现），长度不符或 CRC 错误时跳过一个字节重新查找；
+    帧边界不依赖线路空闲，idle_after 只为与 FrameAssembler 保持接口一致，被分成两段到达的帧不会被丢弃。
+
+    :param frame_size: 数据部分的字节数，None 表示接受任意长度（帧格式识别时使用）
+    :param protocol: FramedProtocol
+    '''
+    def __init__(self, frame_size, protocol, capacity=4096):
+        self.frame_size = frame_size
+        self.protocol = protocol
+        self.buffer = ReceiveBuffer(capacity)
+        self._in_resync = False
+        self.frames = 0             # 输出的完整帧数
+        self.resyncs = 0            # 重新寻找帧头的次数
+        self.discarded_bytes = 0    # 因错位/校验失败丢弃的字节数
+        self.crc_failures = 0       # CRC 校验失败的帧数
+        self.length_errors = 0      # 长度字节与帧长不符的次数
+        self.lengths = {}           # frame_size 为 None 时：数据长度 -> 帧数
+
+    @property
+    def wire_size(self):
+        '''
+        一帧在线路上的字节数，frame_size 为 None 时为 None。
+        '''
+        return None if self.frame_size is None else self.frame_size + self.protocol.overhead
+
+    @property
+    def pending(self):
+        '''
+        获取缓冲区中尚未组成完整帧的字节数。
+        '''
+        return len(self.buffer)
+
+    def reset(self):
+        '''
+        清空缓冲区（例如重新打开串口后），计数器保持不变。
+        '''
+        self.buffer.clear()
+        self._in_resync = False
+
+    def feed(self, chunk, idle_after=False, timestamp_ns=None):
+        '''
+        输入一块数据，返回其中的完整帧，参数同 FrameAssembler.feed()。
+        '''
+        if chunk:
+            self.buffer.write(chunk)
+        return self.process(idle_after, timestamp_ns)
+
+    def process(self, idle_after=False, timestamp_ns=None):
+        '''
+        从缓冲区中取出所有完整且校验通过的帧。
+
+        :return: (frame, timestamp_ns) 的列表，frame 为数据部分的 memoryview
+        '''
+        buffer = self.buffer
+        protocol = self.protocol
+        sync, crc, crc_size = protocol.sync, protocol.crc, protocol.crc_size
+        sync_size, header_size = len(sync), protocol.header_size
+        size = self.frame_size
+        frames = []
+        if timestamp_ns is None:
+            timestamp_ns = time.monotonic_ns()
+        while len(buffer) >= header_size:
+            index = buffer.find(sync)
+            if index:
+                # 帧头之前的字节是噪声或残帧；找不到时保留末尾可能是半个帧头的字节
+                self._discard(index if index > 0 else len(buffer) - sync_size + 1, '未找到帧头')
+                continue
+            length = buffer.peek(header_size)[sync_size]
+            if size is not None and length != size:
+                self.length_errors += 1
+                self._discard(1, '长度不符')
+                continue
+            end = header_size + length
+            if len(buffer) < end + crc_size:
+                break
+            frame = buffer.peek(end + crc_size)
+            if crc(frame[sync_size:end]) != int.from_bytes(frame[end:], 'big'):
+                self.crc_failures += 1
+                self._discard(1, 'CRC 错误')
+                continue
+            frames.append((frame[header_size:end], timestamp_ns))
+            buffer.consume(end + crc_size)
+            self._in_resync = False
+            if size is None:
+                self.lengths[length] = self.lengths.get(length, 0) + 1
+        self.frames += len(frames)
+        return frames
+
+    def _discard(self, count, reason):
+        if not self._in_resync:
+            self.resyncs += 1
+            self._in_resync = True
+            logger.debug('帧同步丢失(%s)，重新查找帧头，第 %d 次', reason, self.resyncs)
+        self.buffer.consume(count)
+        self.discarded_bytes += count
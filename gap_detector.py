@@ -0,0 +1,99 @@
+'''
+    丢帧检测
+    根据帧的到达间隔学习每个串口的标称帧周期，发现间隔异常（丢帧）和多帧同时到达（接收端读取滞后）
+'''
+
+
+class GapDetector:
+    '''
+    按到达时刻检测丢帧。
+
+    每次读取得到的一批帧调用一次 update()：
+      - 间隔正常时，用 间隔 / 帧数 的指数平滑更新标称帧周期；
+      - 间隔超过 GAP_FACTOR 倍标称周期且帧数不足以填满间隔时，记为疑似丢帧（间隔内应到达的帧数 - 实际帧数）；
+        之后 RECOVERY_FRAMES 个周期内提前到达的帧说明只是发送端或链路抖动、迟到的帧在补发，从疑似丢帧中扣除，
+        剩余的才确认为一次间隔（gap）并计入 dropped；
+      - 一批多于一帧（burst）说明帧已在驱动缓冲区中积压，是接收端读取滞后而不是丢帧，
+        如果之后出现重新同步或丢帧，问题在本机一侧。
+    学习满 LEARN_FRAMES 帧之前不判定间隔；超过 PAUSE_TIME 的静默视为下位机暂停发送，不计入丢帧。
+    '''
+    GAP_FACTOR = 1.5
+    LEARN_FRAMES = 8
+    SMOOTHING = 0.1
+    PAUSE_TIME = 2.0    # 超过该时间(s)的间隔视为暂停
+    RECOVERY_FRAMES = 10  # 间隔之后等待迟到帧的周期数，之后才确认丢帧
+
+    def __init__(self):
+        self.nominal_interval = None    # 标称帧周期(s)
+        self.frames = 0                 # 收到的帧数
+        self.gaps = 0                   # 间隔异常次数
+        self.dropped = 0                # 估计丢失的帧数
+        self.bursts = 0                 # 一次读到多帧的次数（接收端滞后）
+        self.max_burst = 0
+        self.pauses = 0                 # 静默超过 PAUSE_TIME 的次数
+        self._learned = 0
+        self._last_ns = None
+        self._suspect = 0               # 疑似丢失、尚未确认的帧数
+        self._suspect_deadline = 0
+
+    def reset(self):
+        '''
+        重新开始计时（例如重连后），计数器和标称周期保持不变。
+        '''
+        self._last_ns = None
+
+    def update(self, count, timestamp_ns):
+        '''
+        报告一批帧。
+
+        :param count: 这一批的帧数
+        :param timestamp_ns: 到达时刻 time.monotonic_ns()
+        :return: 本次确认丢失的帧数
+        '''
+        if not count:
+            return 0
+        self.frames += count
+        if count > 1:
+            self.bursts += 1
+            self.max_burst = max(self.max_burst, count)
+        last, self._last_ns = self._last_ns, timestamp_ns
+        if last is None:
+            return 0
+        elapsed = (timestamp_ns - last) / 1e9
+        if elapsed > self.PAUSE_TIME:
+            self.pauses += 1
+            self._suspect = 0
+            return 0
+        nominal = self.nominal_interval
+        if not nominal or self._learned < self.LEARN_FRAMES:
+            self._learn(elapsed / count)
+            self._learned += count
+            return 0
+        surplus = count - elapsed / nominal     # 正数：比预期多到达的帧（迟到的帧在补发）；负数：缺少的帧
+        if elapsed > self.GAP_FACTOR * nominal * count:
+            missing = round(-surplus)
+            if missing > 0:
+                # 先记为疑似丢帧，RECOVERY_FRAMES 个周期内迟到的帧到齐则不计入
+                self._suspect += missing
+                self._suspect_deadline = timestamp_ns + int(self.RECOVERY_FRAMES * nominal * 1e9)
+        elif self._suspect and surplus >= 0.5:
+            self._suspect -= min(self._suspect, round(surplus))
+        elif elapsed > 0.5 * nominal * count:
+            self._learn(elapsed / count)
+        if self._suspect and timestamp_ns >= self._suspect_deadline:
+            missing, self._suspect = self._suspect, 0
+            self.gaps += 1
+            self.dropped += missing
+            return missing
+        return 0
+
+    def _learn(self, interval):
+        nominal = self.nominal_interval
+        self.nominal_interval = interval if nominal is None else nominal + (interval - nominal) * self.SMOOTHING
+
+    def stats(self):
+        '''
+        获取统计信息。
+        '''
+        return {'frames': self.frames, 'dropped': self.dropped, 'gaps': self.gaps, 'bursts': self.bursts,
+                'max_burst': self.max_burst, 'pauses': self.pauses, 'nominal_interval': self.nominal_interval}
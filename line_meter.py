@@ -0,0 +1,90 @@
+'''
+    串口线路利用率
+    在滑动窗口内统计收发字节数和帧数，与波特率和帧格式决定的理论容量比较，
+    判断链路是否接近饱和（需要提高波特率或压缩帧格式）
+'''
+import threading
+import time
+
+
+def line_capacity(baudrate, bytesize=8, parity='N', stopbits=1):
+    '''
+    计算串口每个方向每秒最多传输的字节数。
+
+    :param baudrate: 波特率
+    :param bytesize: 数据位
+    :param parity: 校验位，'N' 为无校验
+    :param stopbits: 停止位
+    :return: 每秒字节数，例如 115200 8N1 为 11520
+    '''
+    bits = 1 + bytesize + (0 if parity == 'N' else 1) + stopbits    # 起始位 + 数据位 + 校验位 + 停止位
+    return baudrate / bits
+
+
+class LineMeter:
+    '''
+    滑动窗口内的收发字节数和帧数统计。
+
+    窗口由 BUCKETS 个时间片组成，过期的时间片循环复用，统计开销与数据量无关。
+    收（接收线程）、发（发送线程）、帧（解析线程）可以在不同线程中记录。
+    '''
+    BUCKETS = 10
+
+    def __init__(self, baudrate=115200, bytesize=8, parity='N', stopbits=1, window=1.0):
+        self.capacity = line_capacity(baudrate, bytesize, parity, stopbits)
+        self.window = window
+        self._bucket_ns = int(window / self.BUCKETS * 1e9)
+        self._buckets = [[0, 0, 0] for _ in range(self.BUCKETS)]    # [接收字节, 发送字节, 帧数]
+        self._current = time.monotonic_ns() // self._bucket_ns     # 当前时间片编号
+        self._started = self._current
+        self._lock = threading.Lock()
+        self.total_rx = 0
+        self.total_tx = 0
+        self.total_frames = 0
+
+    def add_rx(self, count):
+        self._add(0, count)
+        self.total_rx += count
+
+    def add_tx(self, count):
+        self._add(1, count)
+        self.total_tx += count
+
+    def add_frames(self, count, timestamp_ns=None):
+        '''
+        :param timestamp_ns: 帧的到达时刻 time.monotonic_ns()，默认为当前时刻；补记之前收到的帧时
+                             计入到达时的时间片，已移出窗口的只计入总数
+        '''
+        self._add(2, count, timestamp_ns)
+        self.total_frames += count
+
+    def rates(self):
+        '''
+        获取窗口内的平均速率。
+
+        :return: {'rx_bytes_per_s', 'tx_bytes_per_s', 'frames_per_s', 'rx_utilization', 'tx_utilization'}，
+                 利用率为占理论容量的百分比
+        '''
+        with self._lock:
+            self._advance(time.monotonic_ns() // self._bucket_ns)
+            # 刚开始统计时窗口还没填满，按实际时长计算
+            span = min(self.BUCKETS, self._current - self._started + 1) * self._bucket_ns / 1e9
+            rx = sum(bucket[0] for bucket in self._buckets) / span
+            tx = sum(bucket[1] for bucket in self._buckets) / span
+            frames = sum(bucket[2] for bucket in self._buckets) / span
+        return {'rx_bytes_per_s': rx, 'tx_bytes_per_s': tx, 'frames_per_s': frames,
+                'rx_utilization': rx / self.capacity * 100, 'tx_utilization': tx / self.capacity * 100}
+
+    def _add(self, kind, count, timestamp_ns=None):
+        with self._lock:
+            self._advance(time.monotonic_ns() // self._bucket_ns)
+            index = self._current if timestamp_ns is None else min(self._current, timestamp_ns // self._bucket_ns)
+            if self._current - index < self.BUCKETS:
+                self._buckets[index % self.BUCKETS][kind] += count
+
+    def _advance(self, current):
+        # 清空从上一次记录到现在之间过期的时间片
+        for index in range(self._current + 1, min(current, self._current + self.BUCKETS) + 1):
+            bucket = self._buckets[index % self.BUCKETS]
+            bucket[0] = bucket[1] = bucket[2] = 0
+        self._current = max(self._current, current)
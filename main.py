@@ -1,6 +1,7 @@
 '''
     main.py
     主程序入口
+    用法: python main.py [--connect-all]
 '''
 
 import sys
@@ -15,4 +16,7 @@ if __name__ == '__main__':
     qssStyle = CommonHelper.readQss(CommonHelper.resource_path('MacOS.qss'))
     controller.view.setStyleSheet(qssStyle)
     controller.show()
+    if '--connect-all' in sys.argv:
+        # 启动后并发打开所有已选择的串口
+        controller.connect_all()
     sys.exit(app.exec_())
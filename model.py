@@ -2,30 +2,183 @@
     model.py
 '''
 import time
-import random
 from serial_handle import SerialOperator
+from reconnect import get_reconnect_supervisor
+from port_pool import get_port_pool
+from poll_scheduler import get_poll_scheduler
+from frame_generator import FrameGenerator, DEVICE_LAYOUTS
+from gap_detector import GapDetector
+from frame_assembler import FrameAssembler, FRAME_LIMITS, make_range_validator
+from framed_protocol import FramedAssembler
+from format_detector import FormatDetector
+from device_registry import get_device_registry
 from logger import logger
 
 
 class SerialModel:
+    DROP_REPORT_INTERVAL = 1.0  # 丢帧提示的最短间隔(s)，避免持续丢帧时刷屏
+
     def __init__(self):
         logger.debug("Serial ID in SerialModel: %s", id(self))
-        self.last_receive_time = time.time()  # 为每个串口初始化时间戳
-        self.serial = SerialOperator()
+        self.last_receive_ns = time.monotonic_ns()  # 为每个串口初始化时间戳（单调时钟，不受系统校时影响）
+        self.serial = SerialOperator(get_reconnect_supervisor())  # 打开串口后替换为串口池中的共享句柄
+        self._acquired = False  # 是否持有串口池中的一个引用
+        self.poll_target = None # 轮询模式下的 PollTarget，被动接收时为 None
+        self.assembler = None   # 帧重组器，按帧长在首次接收时创建
+        self._assembler_limits = None
+        self.frame_limits = None    # 当前型号各字节的合理上限（FrameSchema.limits），None 时按帧长取内置型号的上限
+        self.framing = None     # 带帧头和 CRC 的帧协议 FramedProtocol，None 为原始定长帧
+        self._sniffed = []      # 识别帧格式时嗅探到的 (timestamp_ns, 数据块)，第一次接收时按到达时刻重组成帧
+        self._replayed = []     # 由嗅探数据重组出的 (frame, timestamp_ns)，随下一次接收返回
+        self._crc_failures_reported = 0
+        self._last_crc_report = 0.0
+        self.gap_detector = GapDetector()
+        self._dropped_reported = 0  # 已经报告过的丢帧数
+        self._last_drop_report = 0.0
+        self._mock_generator = None
         # self.data_callbacks = [None] * 6
 
     def get_all_serials(self):
-        return SerialOperator().list_available_ports()
+        return SerialOperator.list_available_ports()
+
+    def open_serial_port(self, port_name, **options):
+        '''
+        打开串口。串口由串口池管理，其他使用者已打开同一串口时直接共享其句柄，不会重新打开。
 
-    def open_serial_port(self, port_name):
-        self.last_receive_time = time.time()  # 更新时间戳
-        return self.serial.open_serial_port(port_name)
+        :param port_name: 串口号
+        :param options: 传给 SerialOperator.open_serial_port 的其他参数，例如 low_latency=True
+        '''
+        self.last_receive_ns = time.monotonic_ns()  # 更新时间戳
+        if self.assembler:
+            self.assembler.reset()
+        self._sniffed = []
+        self._replayed = []
+        self.gap_detector.reset()
+        pool = get_port_pool()
+        if self._acquired:
+            if self.serial.port == port_name.split(' #')[0]:
+                return True
+            self.close_serial_port()
+        operator = pool.acquire(port_name, **options)
+        if operator is None:
+            return False
+        self.serial = operator
+        self._acquired = True
+        return True
 
     def close_serial_port(self):
-        self.serial.close_serial_port()
+        '''
+        释放串口，没有其他使用者时由串口池关闭。
+        串口池会让串口保持打开一段时间（PortPool.LINGER_TIME，独占打开的串口除外），期间其他程序打开同一串口
+        可能失败；所以先取消阻塞中的读取，接收线程立即返回。
+        '''
+        self.stop_polling()
+        if self._acquired:
+            self._acquired = False
+            self.serial.cancel_read()
+            get_port_pool().release(self.serial)
+
+    def start_polling(self, command, interval=0.1, max_in_flight=1, timeout=0.5):
+        '''
+        开始轮询：按 interval 向串口发送查询命令，收到的帧按顺序匹配到请求上，用于只在查询时上报数据的固件。
+
+        :param command: 查询命令
+        :param interval: 发送间隔，单位为秒，0 表示在途请求数允许时立即发送（最高采样率）
+        :param max_in_flight: 最多同时在途的请求数
+        :param timeout: 请求超时时间，单位为秒
+        :return: PollTarget，可通过其 stats() 查看往返时间和超时次数
+        '''
+        self.poll_target = get_poll_scheduler().add(self.serial, command, interval, max_in_flight, timeout)
+        return self.poll_target
+
+    def stop_polling(self):
+        if self.poll_target:
+            get_poll_scheduler().remove(self.poll_target.operator)
+            self.poll_target = None
 
     def is_serial_open(self):
-        return self.serial.is_open
+        return self._acquired and self.serial.is_open
+
+    def is_reconnecting(self):
+        return self._acquired and self.serial.is_reconnecting
+
+    def wait_reconnected(self, timeout):
+        '''
+        等待后台重连结束。重连成功后丢弃断开前残留的半帧，帧重组器的计数保持不变。
+
+        :param timeout: 最长等待时间，单位为秒
+        :return: 串口已重新打开时返回 True
+        '''
+        if not self.serial.wait_reconnected(timeout):
+            return False
+        if self.assembler:
+            self.assembler.reset()
+        self.gap_detector.reset()
+        self.last_receive_ns = time.monotonic_ns()  # 更新时间戳
+        return True
+
+    def detect_format(self, timeout=FormatDetector.SNIFF_TIME, max_timeout=FormatDetector.MAX_SNIFF_TIME,
+                      schemas=None):
+        '''
+        嗅探一段数据，识别下位机的帧格式。无论能否识别，嗅探到的数据都会保留，在第一次接收时
+        按调用方当时使用的帧格式重组成帧，并保留各数据块的到达时刻。
+
+        :param timeout: 嗅探时间，单位为秒，数据足够时提前返回
+        :param max_timeout: 到达 timeout 时已有数据但还不能判断（低帧率），继续嗅探的最长时间
+        :param schemas: 候选帧格式，默认先用已加载的型号（内置型号和已用到的插件）识别，
+                        无法识别时才导入其他插件型号，用同一段数据继续识别
+        :return: FrameSchema，无法判断时返回 None
+        '''
+        registry = get_device_registry()
+        self._sniffed = []
+        detector = FormatDetector(schemas or registry.schemas(loaded_only=True), self.framing)
+        start = time.monotonic()
+        schema = self._sniff(detector, start, timeout, max_timeout)
+        if schema is None and not schemas and registry.unloaded and detector.received:
+            logger.info('串口 %s 已加载的型号无法识别，导入型号插件 %s 继续识别', self.serial.port, registry.unloaded)
+            detector = detector.with_schemas(registry.schemas())
+            schema = self._sniff(detector, start, timeout, max_timeout)
+        logger.info('串口 %s 帧格式识别结果 %s，得分 %s，帧周期 %s s，耗时 %.3f s', self.serial.port,
+                    schema.name if schema else None, detector.scores, detector.frame_period,
+                    time.monotonic() - start)
+        if schema:
+            self.last_receive_ns = self.serial.last_receive_ns
+            self.frame_limits = schema.limits
+        return schema
+
+    def _sniff(self, detector, start, timeout, max_timeout):
+        buffer = memoryview(bytearray(256))
+        schema = None
+        while not detector.enough and self.serial.is_open:
+            elapsed = time.monotonic() - start
+            if elapsed >= timeout:
+                # 串口静默时不再等待；有数据时每收到一块尝试判断一次
+                if not detector.received or elapsed >= max_timeout:
+                    break
+                schema = detector.detect()
+                if schema:
+                    break
+            deadline = timeout if elapsed < timeout else max_timeout
+            # 字节间隔超过 BURST_GAP 即返回，每次读取得到的是两次空闲之间的一块数据
+            received = self.serial.receive_into(buffer, len(buffer), deadline - elapsed, FormatDetector.BURST_GAP)
+            if received:
+                detector.feed(buffer[:received], self.serial.last_receive_ns)
+                self._sniffed.append((self.serial.last_receive_ns, bytes(buffer[:received])))
+        return schema or detector.detect()
+
+    def _replay_sniffed(self, assembler):
+        '''
+        把嗅探到的数据逐块按原来的到达时刻重组成帧。丢帧检测和帧数统计按各块的到达时刻记录，
+        不会把嗅探期间的帧当成一次到达的积压。
+        '''
+        sniffed, self._sniffed = self._sniffed, []
+        for timestamp_ns, chunk in sniffed:
+            assembler.buffer.write(chunk)
+            frames = assembler.process(False, timestamp_ns)
+            if frames:
+                # 帧是缓冲区的 memoryview，之后写入缓冲区会使其失效，复制一份
+                self._replayed.extend((bytes(frame), timestamp_ns) for frame, _ in frames)
+                self._record_frames(len(frames), timestamp_ns)
 
     def receive_data(self):
         '''
@@ -35,49 +188,152 @@ class SerialModel:
         # data = self.generate_mock_data()
         data = self.serial.receive_data()
         if data:
-            self.last_receive_time = time.time()  # 更新时间戳
+            self.last_receive_ns = self.serial.last_receive_ns  # 更新时间戳
         return data
         
+    def get_assembler(self, data_size):
+        '''
+        获取指定帧长的帧重组器，帧长或帧协议变化时重新创建。设置了 framing 时为 FramedAssembler。
+        '''
+        if self.framing:
+            assembler = self.assembler
+            if not isinstance(assembler, FramedAssembler) or assembler.frame_size != data_size \
+                    or assembler.protocol is not self.framing:
+                self.assembler = FramedAssembler(data_size, self.framing)
+                self._assembler_limits = None
+                self._crc_failures_reported = 0
+            return self.assembler
+        limits = self.frame_limits if self.frame_limits and len(self.frame_limits) == data_size \
+            else FRAME_LIMITS.get(data_size)
+        if not isinstance(self.assembler, FrameAssembler) or self.assembler.frame_size != data_size \
+                or self._assembler_limits != limits:
+            # 没有上限的帧长（插件型号未声明 maximum 时）不做合理性检查
+            self.assembler = FrameAssembler(data_size, make_range_validator(limits) if limits else None)
+            self._assembler_limits = limits
+        return self.assembler
+
     def receive_data_with_message(self, data_size):
         '''
-        接收数据。
+        轮询接收当前已到达的全部数据，并重组成完整帧。积压的多帧数据会全部解析，不会整体丢弃。
+
+        :param data_size: 一帧的字节数
+        :return: (frames, message)，frames 为 (frame, timestamp_ns) 列表，发生重新同步时 message 为提示信息
         '''
-        def update_timestamp():
-            # 封装更新时间戳的逻辑
-            self.last_receive_time = time.time()
-
-        def check_data_length(data, expected_size):
-            # 检查数据长度并记录日志
-            if len(data) == expected_size or data == b'':
-                return None
-            elif len(data) > expected_size:
-                logger.warning("接收到的数据长度超过预期，预期长度: %d，实际长度: %d", expected_size, len(data))
-                return 'receive data length is too long, please check your serial port'
-            else:
-                logger.warning("接收到的数据长度不足，预期长度: %d，实际长度: %d", expected_size, len(data))
-                return 'receive data length is too short, please check your serial port'
-
-        # 第一次接收数据
         data = self.serial.receive_data()
-        message = None
+        return self._assemble(data, data_size, False)
+
+    def process_data(self, data, data_size):
+        '''
+        重组在其他地方读到的一块数据（串口反应器在串口可读时读取），返回值同 receive_data_with_message。
+
+        :param data: 读到的数据
+        :param data_size: 一帧的字节数
+        '''
+        return self._assemble(data, data_size, False)
+
+    def receive_frame_with_message(self, data_size, timeout=0.5, inter_byte_timeout=0.01):
+        '''
+        阻塞接收一帧数据，数据到达时立即返回，不需要轮询等待。
+        数据直接读入帧重组器的预分配缓冲区，帧以 memoryview 返回，只在下一次接收前有效。
+        字节间隔超时返回的短读说明线路已空闲，以此对齐帧边界。
+
+        :param data_size: 一帧数据的字节数（带帧头时不含帧头和 CRC）
+        :param timeout: 等待整帧的超时时间，单位为秒
+        :param inter_byte_timeout: 帧内字节间隔超时时间，单位为秒
+        :return: (frames, message)，frames 为 (frame, timestamp_ns) 列表，发生重新同步时 message 为提示信息
+        '''
+        assembler = self.get_assembler(data_size)
+        if self._sniffed:
+            self._replay_sniffed(assembler)
+        buffer = assembler.buffer
+        wire_size = assembler.wire_size
+        need = wire_size - len(buffer) % wire_size
+        received = self.serial.receive_into(buffer.writable(wire_size), need, timeout, inter_byte_timeout)
+        if received:
+            buffer.commit(received)
+        return self._process(assembler, received, received < need)
+
+    def _assemble(self, data, data_size, idle_after):
+        assembler = self.get_assembler(data_size)
+        if self._sniffed:
+            self._replay_sniffed(assembler)
         if data:
-            update_timestamp()
-            message = check_data_length(data, data_size)
-            if message:
-                return None, message
-
-            # 如果第一次接收的数据长度不够，再接收一次
-            remaining_size = data_size - len(data)
-            if remaining_size > 0:
-                second_data = self.serial.receive_data(remaining_size)
-                if second_data:
-                    update_timestamp()
-                    data += second_data
-                    message = check_data_length(data, data_size)
-                    if message:
-                        return None, message
-
-        return data, message
+            assembler.buffer.write(data)
+        return self._process(assembler, len(data), idle_after)
+
+    def _process(self, assembler, received, idle_after):
+        replayed, self._replayed = self._replayed, []
+        if not received:
+            if idle_after and assembler.pending:
+                # 超时且缓冲区中有半帧，按空闲处理
+                assembler.process(True)
+            return replayed, None
+        self.last_receive_ns = self.serial.last_receive_ns  # 更新时间戳
+        discarded = assembler.discarded_bytes
+        frames = assembler.process(idle_after, self.last_receive_ns)
+        if frames:
+            self._record_frames(len(frames), self.last_receive_ns)
+        message = None
+        if assembler.discarded_bytes != discarded:
+            logger.warning("接收数据帧边界错位，丢弃 %d 字节，累计重新同步 %d 次",
+                           assembler.discarded_bytes - discarded, assembler.resyncs)
+            message = 'receive data is misaligned, resynchronized to frame boundary'
+        crc_message = self._crc_message(assembler)
+        if crc_message:
+            message = f'{message}; {crc_message}' if message else crc_message
+        gap_message = self._drop_message()
+        if gap_message:
+            message = f'{message}; {gap_message}' if message else gap_message
+        return replayed + frames if replayed else frames, message
+
+    def _record_frames(self, count, timestamp_ns):
+        '''
+        记录在 timestamp_ns 到达的 count 帧：帧数统计、轮询应答匹配和丢帧检测。
+        '''
+        self.serial.line_meter.add_frames(count, timestamp_ns)
+        if self.poll_target:
+            get_poll_scheduler().on_frames(self.serial, count, timestamp_ns)
+        self.gap_detector.update(count, timestamp_ns)
+
+    def _crc_message(self, assembler):
+        '''
+        有新的 CRC 校验失败时生成提示信息（只在带帧头的帧协议下），最多每 DROP_REPORT_INTERVAL 秒一条。
+        '''
+        failures = getattr(assembler, 'crc_failures', 0)
+        now = time.monotonic()
+        if failures <= self._crc_failures_reported or now - self._last_crc_report < self.DROP_REPORT_INTERVAL:
+            return None
+        self._last_crc_report = now
+        count = failures - self._crc_failures_reported
+        self._crc_failures_reported = failures
+        logger.warning('串口 %s CRC 校验失败 %d 帧，累计 %d 帧', self.serial.port, count, failures)
+        return f'{count} frames failed the CRC check (total {failures})'
+
+    def _drop_message(self):
+        '''
+        有新的丢帧时生成提示信息，最多每 DROP_REPORT_INTERVAL 秒一条。
+        '''
+        detector = self.gap_detector
+        now = time.monotonic()
+        if detector.dropped == self._dropped_reported or now - self._last_drop_report < self.DROP_REPORT_INTERVAL:
+            return None
+        dropped = detector.dropped - self._dropped_reported
+        self._dropped_reported = detector.dropped
+        self._last_drop_report = now
+        logger.warning('检测到丢帧约 %d 帧，标称周期 %.1f ms，累计丢帧 %d，间隔异常 %d 次，积压 %d 次',
+                       dropped, detector.nominal_interval * 1000, detector.dropped, detector.gaps, detector.bursts)
+        return f'about {dropped} frames dropped (total {detector.dropped})'
+
+    def frame_stats(self):
+        '''
+        获取接收统计：收到的帧数、估计丢帧数、间隔异常次数、积压次数、重新同步次数等。
+        '''
+        stats = self.gap_detector.stats()
+        stats['resyncs'] = self.assembler.resyncs if self.assembler else 0
+        stats['discarded_bytes'] = self.assembler.discarded_bytes if self.assembler else 0
+        stats['crc_failures'] = getattr(self.assembler, 'crc_failures', 0)
+        stats['length_errors'] = getattr(self.assembler, 'length_errors', 0)
+        return stats
 
     # def register_data_callback(self, index, callback):
     #     '''
@@ -103,17 +359,16 @@ class SerialModel:
     #             self.data_callbacks[index - 1](index, data)
 
 
-    def generate_mock_data(self):
+    def generate_mock_data(self, device_type='CYPD7291'):
+        '''
+        生成一帧与下位机格式一致的二进制模拟数据（完整的串口模拟见 device_simulator.py）。
+
+        :param device_type: 'CYPD7291'（10 字节）或 'CYPD7299'（6 字节）
+        '''
         try:
-            keys = ['vol', 'cur', 'pow']
-            # 随机选择 1 到 3 个指标
-            selected_keys = random.sample(keys, random.randint(1, 3))
-            data_parts = []
-            for key in selected_keys:
-                # 生成随机值
-                value = round(random.uniform(4, 15), 2)
-                data_parts.append(f"{key}={value}")
-            return " ".join(data_parts).encode()
+            if self._mock_generator is None or self._mock_generator.layout != DEVICE_LAYOUTS[device_type]:
+                self._mock_generator = FrameGenerator(device_type)
+            return self._mock_generator.next_frame()
         except Exception as e:
             logger.error("生成模拟数据时出错: %s", e)
             return None
\ No newline at end of file
@@ -1,36 +1,79 @@
 from PyQt5.QtWidgets import QComboBox
 from PyQt5.QtGui import QFontMetrics
+from PyQt5.QtCore import QEvent
 #导入串口模块
-from serial_handle import SerialOperator
+from port_registry import get_port_registry
 from logger import logger
 
 class MyComboBoxControl(QComboBox):
 
     def __init__(self, parent = None):
         super(MyComboBoxControl,self).__init__(parent) #调用父类初始化方法
+        # 可以直接输入 pyserial URL，例如 socket://192.168.1.20:4001 读取串口服务器上的设备
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.NoInsert)
+        self._stale_ports = set()   # 使用中被拔出、暂时保留的串口，释放（下拉框重新启用）时移除
+        # 串口列表由后台注册表维护，插拔时增量更新选项
+        registry = get_port_registry()
+        registry.ports_changed.connect(self.update_ports)
+        self.update_ports(registry.ports, [])
+
+    def update_ports(self, added, removed):
+        '''
+        根据串口注册表推送的差异更新选项，保留当前选中的串口。
+
+        :param added: 新增的串口
+        :param removed: 移除的串口
+        '''
+        for port in removed:
+            index = self.findText(port)
+            if index < 0:
+                continue
+            # 正在使用的串口（下拉框已禁用）保留选项，避免界面上的串口名被替换
+            if index == self.currentIndex() and not self.isEnabled():
+                self._stale_ports.add(port)
+            else:
+                self.removeItem(index)
+        for port in added:
+            self._stale_ports.discard(port)
+            if self.findText(port) < 0:
+                self.addItem(port)
+        logger.info('可用串口:%s', [self.itemText(i) for i in range(self.count())])
+        self.fit_popup_width()
+
+    def drop_stale_ports(self):
+        '''
+        移除使用期间已被拔出的串口选项。
+        '''
+        for port in self._stale_ports:
+            index = self.findText(port)
+            if index >= 0:
+                self.removeItem(index)
+        if self._stale_ports:
+            logger.info('移除已拔出的串口:%s', sorted(self._stale_ports))
+            self._stale_ports.clear()
+            self.fit_popup_width()
+
+    def fit_popup_width(self):
+        '''
+        下拉列表宽度适应最长的串口名。
+        '''
+        font_metrics = QFontMetrics(self.font())
+        max_width = 0
+        for i in range(self.count()):
+            width = font_metrics.width(self.itemText(i)) + 20
+            if max_width < width:
+                max_width = width
+        if max_width > self.maximumWidth():
+            self.view().setFixedWidth(max_width)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        # 断开连接后下拉框重新启用，串口已释放
+        if event.type() == QEvent.EnabledChange and self.isEnabled():
+            self.drop_stale_ports()
 
     # 重写showPopup函数
     def showPopup(self):  
-        # 获取原选项
-        index = self.currentIndex()
-        logger.info('当前索引:%d', index)
-        font_metrics = QFontMetrics(self.font())
-        # 先清空原有的选项
-        self.clear()
-        # 初始化串口列表
-        available_ports = SerialOperator().list_available_ports()
-        logger.info('可用串口:%s', available_ports)
-        # 添加关闭串口选项
-        # self.addItem('close')
-        for port in available_ports:
-            self.addItem(port)
-
-            width = font_metrics.width(port) + 10
-            previous_width = self.width()
-            if previous_width < width:
-                self.view().setFixedWidth(width)
-
-        # if self.count() >= index:
-        #     self.setCurrentIndex(index)
-        #     logger.info('重置串口数据，设置索引:%d', index)
-        QComboBox.showPopup(self)   # 弹出选项框  
\ No newline at end of file
+        # 选项已由串口注册表维护，直接弹出，不在界面线程中扫描串口
+        QComboBox.showPopup(self)   # 弹出选项框  
@@ -0,0 +1,247 @@
+'''
+    轮询调度
+    部分固件只在收到查询命令后才上报一帧数据。调度线程按设定节奏向各串口发送查询命令，
+    允许多个请求同时在途（流水线），按先进先出把收到的帧匹配到请求上，并测量往返时间
+'''
+import time
+import threading
+import collections
+
+from logger import logger
+
+
+class PollRequest:
+    '''
+    一个在途的查询请求。
+    '''
+    __slots__ = ('queued_ns', 'sent_ns')
+
+    def __init__(self, queued_ns):
+        self.queued_ns = queued_ns  # 放入发送队列的时刻 time.monotonic_ns()
+        self.sent_ns = None         # 发送线程实际写入串口的时刻，写出前为 None
+
+    def on_written(self, timestamp_ns):
+        self.sent_ns = timestamp_ns
+
+    @property
+    def start_ns(self):
+        '''
+        计算往返时间和超时的起点：已写出时为写出时刻，否则为入队时刻。
+        '''
+        return self.queued_ns if self.sent_ns is None else self.sent_ns
+
+
+class PollTarget:
+    '''
+    一个被轮询的串口及其统计。
+
+    串口上的应答按请求顺序返回，所以不需要请求编号：每收到一帧就完成最早的在途请求，
+    超过 timeout 仍未应答的请求视为丢失。超时的请求再保留 timeout，这段时间内到达的帧是它迟到的应答，
+    丢弃并计入 late，不会错配给后面的请求而得到偏小的往返时间。
+    '''
+    RTT_SMOOTHING = 0.125   # 平均往返时间的平滑系数（同 TCP SRTT）
+
+    def __init__(self, operator, command, interval, max_in_flight, timeout):
+        self.operator = operator
+        self.command = command
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = collections.deque()    # 在途的 PollRequest
+        self.expired = collections.deque()      # 已超时、应答可能迟到的请求的超时时刻 time.monotonic_ns()
+        self.next_due = time.monotonic()
+        self.requests = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.late = 0               # 超时后才到达、被丢弃的应答
+        self.skipped = 0            # 到期时在途请求已满而推迟的次数，说明设备跟不上设定节奏
+        self.unsolicited = 0        # 没有在途请求（或请求尚未写出）时收到的帧
+        self.last_rtt = None        # 最近一次往返时间(s)
+        self.smoothed_rtt = None
+        self.min_rtt = None
+        self.max_rtt = None
+
+    def stats(self):
+        '''
+        获取统计信息。
+        '''
+        return {'requests': self.requests, 'responses': self.responses, 'timeouts': self.timeouts,
+                'late': self.late, 'skipped': self.skipped, 'unsolicited': self.unsolicited,
+                'in_flight': len(self.in_flight), 'last_rtt': self.last_rtt, 'smoothed_rtt': self.smoothed_rtt,
+                'min_rtt': self.min_rtt, 'max_rtt': self.max_rtt}
+
+    def deadline_ns(self):
+        '''
+        最早的在途请求的超时时刻，没有在途请求时返回 None。
+        '''
+        if not self.in_flight:
+            return None
+        return self.in_flight[0].start_ns + int(self.timeout * 1e9)
+
+    def expire(self, now_ns):
+        '''
+        把到 now_ns 为止已超时的在途请求移入 expired，并清除迟到期限已过的超时请求。
+        '''
+        timeout_ns = int(self.timeout * 1e9)
+        while self.expired and self.expired[0] + timeout_ns <= now_ns:
+            self.expired.popleft()
+        while self.in_flight and self.in_flight[0].start_ns + timeout_ns <= now_ns:
+            request = self.in_flight.popleft()
+            self.expired.append(request.start_ns + timeout_ns)
+            self.timeouts += 1
+            logger.debug('串口 %s 轮询超时，累计 %d 次', self.operator.port, self.timeouts)
+
+    def _record_rtt(self, rtt):
+        self.last_rtt = rtt
+        if self.smoothed_rtt is None:
+            self.smoothed_rtt = self.min_rtt = self.max_rtt = rtt
+        else:
+            self.smoothed_rtt += (rtt - self.smoothed_rtt) * self.RTT_SMOOTHING
+            self.min_rtt = min(self.min_rtt, rtt)
+            self.max_rtt = max(self.max_rtt, rtt)
+
+
+class PollScheduler:
+    '''
+    轮询调度线程，所有串口共用一个。
+
+    每个串口按 interval 发送查询命令，在途请求达到 max_in_flight 时暂停发送，收到应答后立即补发；
+    interval 为 0 时只受在途请求数限制，即链路和设备所能达到的最高采样率。
+    接收线程解析出帧后调用 on_frames() 完成请求。
+    '''
+    def __init__(self):
+        self._targets = {}      # operator.id -> PollTarget
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def add(self, operator, command, interval=0.1, max_in_flight=1, timeout=0.5):
+        '''
+        开始轮询一个串口，已在轮询时按新参数重新开始。
+
+        :param operator: 已打开的 SerialOperator
+        :param command: 查询命令
+        :param interval: 发送间隔，单位为秒，0 表示在途请求数允许时立即发送
+        :param max_in_flight: 最多同时在途的请求数
+        :param timeout: 请求超时时间，单位为秒
+        :return: PollTarget
+        '''
+        if isinstance(command, str):
+            command = command.encode()
+        with self._condition:
+            target = PollTarget(operator, command, interval, max(1, max_in_flight), timeout)
+            self._targets[operator.id] = target
+            self._ensure_thread()
+            self._condition.notify()
+        logger.info('开始轮询串口 %s，间隔 %.3f s，最多 %d 个在途请求', operator.port, interval, max_in_flight)
+        return target
+
+    def remove(self, operator):
+        '''
+        停止轮询一个串口。
+        '''
+        with self._condition:
+            target = self._targets.pop(operator.id, None)
+        if target:
+            logger.info('停止轮询串口 %s: %s', operator.port, target.stats())
+
+    def get_target(self, operator):
+        return self._targets.get(operator.id)
+
+    def on_frames(self, operator, count, timestamp_ns):
+        '''
+        接收线程解析出 count 帧后调用，按先进先出完成在途请求，超时请求迟到的应答被丢弃。
+
+        :param timestamp_ns: 帧到达时刻 time.monotonic_ns()
+        '''
+        target = self._targets.get(operator.id)
+        if target is None or not count:
+            return
+        with self._condition:
+            # 按帧到达时刻判断超时，调度线程尚未处理的超时请求也不会匹配到这些帧
+            target.expire(timestamp_ns)
+            for _ in range(count):
+                if target.expired:
+                    # 应答按请求顺序返回，超时请求的应答先于后面请求的应答到达
+                    target.expired.popleft()
+                    target.late += 1
+                    continue
+                if not target.in_flight or target.in_flight[0].sent_ns is None:
+                    target.unsolicited += 1
+                    continue
+                request = target.in_flight.popleft()
+                target.responses += 1
+                target._record_rtt(max(0, timestamp_ns - request.sent_ns) / 1e9)
+            # 在途请求减少，可能可以立即补发
+            self._condition.notify()
+
+    def stop(self):
+        '''
+        停止调度线程。
+        '''
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='PollScheduler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                wake = []
+                for target in list(self._targets.values()):
+                    target.expire(time.monotonic_ns())
+                    self._poll(target, now)
+                    if len(target.in_flight) < target.max_in_flight:
+                        wake.append(target.next_due)
+                    deadline_ns = target.deadline_ns()
+                    if deadline_ns is not None:
+                        wake.append(deadline_ns / 1e9)
+                timeout = max(0, min(wake) - time.monotonic()) if wake else None
+                self._condition.wait(timeout)
+
+    def _poll(self, target, now):
+        if now < target.next_due:
+            return
+        if len(target.in_flight) >= target.max_in_flight:
+            if target.interval:
+                target.skipped += 1
+                target.next_due = now + target.interval
+            return
+        operator = target.operator
+        if not operator.is_open:
+            # 断开或重连中：在途请求作废，恢复后重新开始
+            target.in_flight.clear()
+            target.expired.clear()
+            target.next_due = now + max(target.interval, target.timeout)
+            return
+        # 发送队列中可能还有其他数据，往返时间从发送线程实际写出查询命令时算起
+        request = PollRequest(time.monotonic_ns())
+        if not operator.send_data(target.command, on_written=request.on_written):
+            # 发送队列已满，稍后重试
+            target.next_due = now + (target.interval or 0.01)
+            return
+        target.in_flight.append(request)
+        target.requests += 1
+        target.next_due = max(target.next_due + target.interval, now) if target.interval else now
+
+
+_scheduler = None
+
+
+def get_poll_scheduler():
+    '''
+    获取全局共享的轮询调度对象，调度线程在第一次添加串口时启动。
+    '''
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PollScheduler()
+    return _scheduler
@@ -0,0 +1,217 @@
+'''
+    串口池
+    按设备路径持有已打开的 SerialOperator，多个使用者（例如界面显示和数据记录）共享同一个句柄并引用计数，
+    最后一个使用者释放后再保留 LINGER_TIME 秒，期间重新连接同一串口不需要重新打开（重新打开会触发 DTR 翻转和设备复位）；
+    独占打开的串口不保留
+'''
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from serial_handle import SerialOperator
+from logger import logger
+
+
+class OpenResult:
+    '''
+    批量打开中一个串口的结果。
+    '''
+    def __init__(self, port, operator=None, latency=None, error=None):
+        self.port = port
+        self.operator = operator    # 打开成功时为共享的 SerialOperator，否则为 None
+        self.latency = latency      # 打开耗时(s)，超时时为 None
+        self.error = error          # 失败原因
+
+    @property
+    def ok(self):
+        return self.operator is not None
+
+    def __repr__(self):
+        if self.ok:
+            return f'OpenResult({self.port!r}, ok, {self.latency * 1000:.1f} ms)'
+        return f'OpenResult({self.port!r}, failed: {self.error})'
+
+
+class _PoolEntry:
+    def __init__(self, operator):
+        self.operator = operator
+        self.refcount = 0
+        self.lock = threading.Lock()    # 串行化同一串口的打开/关闭，不同串口之间互不阻塞
+        self.linger_timer = None
+
+
+class PortPool:
+    '''
+    串口池。
+
+    acquire() 返回共享的 SerialOperator 并增加引用计数，release() 减少引用计数。
+    同一串口同一时刻只应有一个线程读取，读到的数据通过信号分发给其他使用者。
+    '''
+    LINGER_TIME = 3.0   # 引用计数归零后保持打开的时间(s)，0 表示立即关闭
+
+    def __init__(self, supervisor=None):
+        '''
+        :param supervisor: 传给新建 SerialOperator 的重连监督对象
+        '''
+        self._supervisor = supervisor
+        self._entries = {}  # 设备路径 -> _PoolEntry
+        self._lock = threading.Lock()
+
+    def acquire(self, port, **options):
+        '''
+        获取串口的共享句柄，未打开时打开它。
+
+        :param port: 串口号，可以带 ' #描述' 后缀
+        :param options: 传给 SerialOperator.open_serial_port 的其他参数，只在第一次打开时生效
+        :return: 已打开的 SerialOperator；打开失败返回 None
+        '''
+        port_name = port.split(' #')[0]
+        with self._lock:
+            entry = self._entries.get(port_name)
+            if entry is None:
+                entry = _PoolEntry(SerialOperator(self._supervisor))
+                self._entries[port_name] = entry
+        with entry.lock:
+            operator = entry.operator
+            if entry.linger_timer:
+                entry.linger_timer.cancel()
+                entry.linger_timer = None
+            if operator.is_open or operator.is_reconnecting:
+                baudrate = options.get('baudrate')
+                settings = operator.port_settings
+                if baudrate and settings and baudrate != settings['baudrate']:
+                    logger.warning('串口 %s 已以 %s 波特率打开，忽略请求的 %s', port_name, settings['baudrate'], baudrate)
+                if entry.refcount == 0:
+                    # 复用保留中的句柄，丢弃无人读取期间积压的数据，以及上一个使用者释放时 cancel_read() 留下的唤醒
+                    operator.reset_input_buffer()
+                    operator.clear_cancel_read()
+                    logger.debug('复用保留中的串口 %s', port_name)
+                entry.refcount += 1
+                return operator
+            if not operator.open_serial_port(port_name, **options):
+                return None
+            entry.refcount = 1
+            return operator
+
+    def release(self, operator: SerialOperator):
+        '''
+        释放一次 acquire() 得到的句柄，引用计数归零并保留 LINGER_TIME 秒后关闭串口。
+        独占打开（exclusive）的串口不保留，立即关闭，否则界面显示已断开后其他程序仍然打不开它。
+        '''
+        entry = self._find(operator)
+        if entry is None:
+            logger.debug('串口 %s 不在串口池中', operator.port)
+            return
+        with entry.lock:
+            if entry.refcount == 0:
+                return
+            entry.refcount -= 1
+            if entry.refcount:
+                return
+            settings = operator.port_settings
+            if self.LINGER_TIME > 0 and not (settings and settings['exclusive']):
+                entry.linger_timer = threading.Timer(self.LINGER_TIME, self._close_idle, (entry,))
+                entry.linger_timer.daemon = True
+                entry.linger_timer.start()
+                return
+        self._close_idle(entry)
+
+    def open_many(self, ports, timeout=2.0, max_workers=16, **options):
+        '''
+        在线程池中并发打开多个串口，整体最多等待 timeout 秒，一次返回每个串口的打开耗时或失败原因。
+        超时的串口如果之后才打开成功，会自动释放，不占用句柄。
+
+        :param ports: 串口号列表
+        :param timeout: 最长等待时间，单位为秒
+        :param max_workers: 同时打开的串口数
+        :param options: 传给 acquire 的其他参数
+        :return: 与 ports 顺序一致的 OpenResult 列表，成功的串口需要调用方用 release() 释放
+        '''
+        def open_one(port):
+            start = time.perf_counter()
+            operator = self.acquire(port, **options)
+            return operator, time.perf_counter() - start
+
+        def release_late(port, future):
+            if not future.cancelled() and future.exception() is None and future.result()[0]:
+                logger.warning('串口 %s 在超时后才打开，已释放', port)
+                self.release(future.result()[0])
+
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ports))),
+                                      thread_name_prefix='PortOpen')
+        futures = [executor.submit(open_one, port) for port in ports]
+        done, not_done = wait(futures, timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+        results = []
+        for port, future in zip(ports, futures):
+            # 按 wait() 返回时的结果分类：之后才完成的串口同样算超时，由回调释放（已完成时回调立即执行）
+            if future in not_done:
+                future.add_done_callback(lambda f, port=port: release_late(port, f))
+                results.append(OpenResult(port, error=f'timed out after {timeout:.1f} s'))
+            elif future.exception() is not None:
+                results.append(OpenResult(port, error=str(future.exception())))
+            else:
+                operator, latency = future.result()
+                if operator is None:
+                    entry = self._entries.get(port.split(' #')[0])
+                    error = entry.operator.last_open_error if entry else None
+                    results.append(OpenResult(port, latency=latency, error=error or 'open failed'))
+                else:
+                    results.append(OpenResult(port, operator, latency))
+        opened = sum(result.ok for result in results)
+        logger.info('批量打开 %d 个串口，成功 %d 个，耗时 %.1f ms', len(ports), opened,
+                    (time.perf_counter() - start) * 1000)
+        for result in results:
+            if not result.ok:
+                logger.warning('串口 %s 打开失败: %s', result.port, result.error)
+        return results
+
+    def refcount(self, port):
+        '''
+        获取串口当前的引用计数。
+        '''
+        entry = self._entries.get(port.split(' #')[0])
+        return entry.refcount if entry else 0
+
+    def close_all(self):
+        '''
+        关闭池中所有串口（程序退出时调用）。
+        '''
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            with entry.lock:
+                if entry.linger_timer:
+                    entry.linger_timer.cancel()
+                    entry.linger_timer = None
+                entry.refcount = 0
+                if entry.operator.is_open or entry.operator.is_reconnecting:
+                    entry.operator.close_serial_port()
+
+    def _find(self, operator):
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.operator is operator:
+                    return entry
+        return None
+
+    def _close_idle(self, entry):
+        with entry.lock:
+            entry.linger_timer = None
+            if entry.refcount == 0 and (entry.operator.is_open or entry.operator.is_reconnecting):
+                entry.operator.close_serial_port()
+
+
+_pool = None
+
+
+def get_port_pool():
+    '''
+    获取全局共享的串口池。
+    '''
+    global _pool
+    if _pool is None:
+        from reconnect import get_reconnect_supervisor
+        _pool = PortPool(get_reconnect_supervisor())
+    return _pool
@@ -0,0 +1,115 @@
+'''
+    串口列表注册表
+    在后台线程中维护可用串口列表的缓存，串口插拔时把增删差异推送给所有下拉框，
+    打开下拉框时不再同步扫描串口
+'''
+import os
+import time
+
+import serial.tools.list_ports
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from logger import logger
+
+
+class PortScanThread(QThread):
+    '''
+    后台扫描串口的线程。
+
+    Linux/macOS 下先检查 /dev 目录的修改时间，只有设备节点增删时才调用 comports() 扫描 sysfs，
+    同时每隔 FULL_SCAN_INTERVAL 强制扫描一次；Windows 下每次都扫描。
+    '''
+    ports_scanned = pyqtSignal(list)     # 扫描到的完整串口列表
+    SCAN_INTERVAL = 0.5         # 检查间隔(s)
+    FULL_SCAN_INTERVAL = 10     # 强制完整扫描的间隔(s)
+    DEV_DIR = '/dev'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._running = True
+        self._dev_mtime = None
+        self._last_full_scan = 0
+
+    def run(self):
+        while self._running:
+            if self._need_scan():
+                try:
+                    ports = [port.device for port in serial.tools.list_ports.comports()]
+                    self._last_full_scan = time.monotonic()
+                    self.ports_scanned.emit(ports)
+                except Exception as e:
+                    logger.error('扫描串口失败: %s', e)
+            self.msleep(int(self.SCAN_INTERVAL * 1000))
+
+    def _need_scan(self):
+        if not os.path.isdir(self.DEV_DIR):
+            return True
+        mtime = os.stat(self.DEV_DIR).st_mtime_ns
+        changed = mtime != self._dev_mtime
+        self._dev_mtime = mtime
+        return changed or time.monotonic() - self._last_full_scan >= self.FULL_SCAN_INTERVAL
+
+    def stop(self):
+        self._running = False
+
+
+class PortRegistry(QObject):
+    '''
+    可用串口列表的缓存。
+
+    ports 属性直接返回缓存的列表；列表变化时发送 ports_changed(新增, 移除) 信号，
+    下拉框据此增量更新选项。通过 get_port_registry() 获取全局共享的实例。
+    '''
+    ports_changed = pyqtSignal(list, list)  # 新增的串口, 移除的串口
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ports = []
+        self._scan_thread = PortScanThread()
+        self._scan_thread.ports_scanned.connect(self._on_ports_scanned)
+
+    @property
+    def ports(self):
+        '''
+        获取缓存的可用串口列表。
+        '''
+        return list(self._ports)
+
+    def start(self):
+        '''
+        启动后台扫描线程。
+        '''
+        if not self._scan_thread.isRunning():
+            self._scan_thread.start()
+
+    def stop(self):
+        '''
+        停止后台扫描线程。
+        '''
+        self._scan_thread.stop()
+        self._scan_thread.wait()
+
+    def _on_ports_scanned(self, ports):
+        previous = set(self._ports)
+        current = set(ports)
+        added = [port for port in ports if port not in previous]
+        removed = [port for port in self._ports if port not in current]
+        if added or removed:
+            self._ports = list(ports)
+            logger.info('串口列表变化，新增: %s，移除: %s', added, removed)
+            self.ports_changed.emit(added, removed)
+
+
+_registry = None
+
+
+def get_port_registry():
+    '''
+    获取全局共享的串口注册表，首次调用时创建并启动后台扫描。
+    必须在 QApplication 创建之后、在主线程中调用。
+    '''
+    global _registry
+    if _registry is None:
+        _registry = PortRegistry()
+        _registry.start()
+    return _registry
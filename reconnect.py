@@ -0,0 +1,138 @@
+'''
+    串口重连监督
+    串口收发出错后，由一个后台线程按指数退避 + 随机抖动重新打开串口，收发线程不再原地阻塞重开
+'''
+import heapq
+import random
+import threading
+import time
+
+from logger import logger
+
+
+class ReconnectSupervisor:
+    '''
+    串口重连监督线程，所有串口共用一个。
+
+    SerialOperator 收发出错时关闭损坏的句柄并调用 request()，立即返回；监督线程在后台重试打开，
+    每次失败后等待时间按 FACTOR 倍增长（上限 MAX_DELAY），并在 [delay/2, delay] 之间随机抖动，
+    避免多个串口同时重试。连接在 STABLE_TIME 内再次断开（线缆接触不良）时沿用上一次的退避次数，
+    不会回到最短间隔形成开关串口的死循环。
+    '''
+    INITIAL_DELAY = 0.05    # 第一次重试前的等待时间(s)
+    MAX_DELAY = 5.0         # 最长等待时间(s)
+    FACTOR = 2
+    STABLE_TIME = 5.0       # 重连后保持连接超过该时间(s)才重置退避次数
+
+    def __init__(self):
+        self._queue = []            # (到期时间, 序号, operator)
+        self._pending = {}          # operator.id -> (已尝试次数, 回调)
+        self._history = {}          # operator.id -> (上次重连成功时间, 当时的尝试次数)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def request(self, operator, on_reconnected=None):
+        '''
+        请求重连一个已断开的串口，立即返回。
+
+        :param operator: 断开的 SerialOperator
+        :param on_reconnected: 可选回调 on_reconnected(operator, latency, attempts)，在监督线程中执行
+        '''
+        with self._condition:
+            if operator.id in self._pending:
+                return
+            attempts = 0
+            last_success = self._history.get(operator.id)
+            if last_success and time.monotonic() - last_success[0] < self.STABLE_TIME:
+                attempts = last_success[1]
+            self._pending[operator.id] = (attempts, on_reconnected)
+            self._schedule(operator, self._delay(attempts))
+            self._ensure_thread()
+            self._condition.notify()
+        logger.info('串口 %s 断开，开始后台重连', operator.port)
+
+    def cancel(self, operator):
+        '''
+        取消一个串口的重连（例如用户主动关闭串口）。
+        '''
+        with self._condition:
+            self._pending.pop(operator.id, None)
+
+    def stop(self):
+        '''
+        停止监督线程，未完成的重连全部取消。
+        '''
+        with self._condition:
+            self._running = False
+            self._pending.clear()
+            self._queue.clear()
+            self._condition.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _delay(self, attempts):
+        if attempts == 0:
+            return 0
+        delay = min(self.MAX_DELAY, self.INITIAL_DELAY * self.FACTOR ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _schedule(self, operator, delay):
+        self._sequence += 1
+        heapq.heappush(self._queue, (time.monotonic() + delay, self._sequence, operator))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='ReconnectSupervisor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                if not self._running:
+                    return
+                _, _, operator = heapq.heappop(self._queue)
+                if operator.id not in self._pending:
+                    continue    # 已取消
+            # 打开串口可能阻塞较长时间，不持有锁
+            success = operator.try_reconnect()
+            with self._condition:
+                pending = self._pending.get(operator.id)
+                if pending is None:
+                    continue
+                attempts, on_reconnected = pending
+                attempts += 1
+                if success:
+                    del self._pending[operator.id]
+                    self._history[operator.id] = (time.monotonic(), attempts)
+                else:
+                    self._pending[operator.id] = (attempts, on_reconnected)
+                    self._schedule(operator, self._delay(attempts))
+                    continue
+            if not operator.is_open:
+                continue    # 重连期间用户关闭了串口
+            latency = operator.last_reconnect_latency
+            logger.info('串口 %s 重连成功，耗时 %.1f ms，尝试 %d 次', operator.port, latency * 1000, attempts)
+            if on_reconnected:
+                try:
+                    on_reconnected(operator, latency, attempts)
+                except Exception as e:
+                    logger.error('串口 %s 重连回调出错: %s', operator.port, e)
+
+
+_supervisor = None
+
+
+def get_reconnect_supervisor():
+    '''
+    获取全局共享的重连监督对象，监督线程在第一次请求重连时启动。
+    '''
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = ReconnectSupervisor()
+    return _supervisor
@@ -0,0 +1,104 @@
+'''
+    接收环形缓冲区
+    每个串口预分配一块 bytearray，串口数据直接 readinto 到其中，帧以 memoryview 切片的形式交给下游，
+    接收链路上不再为每次读取和每一帧分配新的 bytes
+'''
+from logger import logger
+
+
+class ReceiveBuffer:
+    '''
+    预分配的接收缓冲区。
+
+    写入位置到达末尾时，把尚未消费的数据（通常不足一帧）搬回开头继续使用，
+    因此任何一段可读数据都是连续内存，帧可以直接以 memoryview 切片交给下游，不必拼接。
+
+    peek() 返回的切片只在下一次 writable()/write() 之前有效，下游需要保留数据时应自行 bytes() 复制。
+    '''
+    def __init__(self, capacity=4096):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0     # 第一个未消费字节的位置
+        self._end = 0       # 已写入数据的结束位置
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        '''
+        获取缓冲区总容量（字节）。
+        '''
+        return len(self._buffer)
+
+    def writable(self, min_size=1):
+        '''
+        获取可直接写入的连续空闲区域，写入后调用 commit() 提交。
+
+        :param min_size: 至少需要的空闲字节数，末尾空间不够时先搬移未消费数据，仍不够则扩容
+        :return: 指向空闲区域的 memoryview
+        '''
+        if self.capacity - self._end < min_size:
+            pending = self._end - self._start
+            if self.capacity - pending < min_size:
+                self._grow(pending + min_size)
+            elif pending:
+                self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        return self._view[self._end:]
+
+    def commit(self, size):
+        '''
+        提交通过 writable() 写入的 size 个字节。
+        '''
+        self._end += size
+
+    def write(self, data):
+        '''
+        把 data 复制到缓冲区末尾。
+        '''
+        size = len(data)
+        self.writable(size)[:size] = data
+        self._end += size
+
+    def peek(self, size):
+        '''
+        获取开头 size 个字节的只读视图（不消费）。
+        '''
+        return self._view[self._start:self._start + size]
+
+    def find(self, sub):
+        '''
+        在未消费数据中查找 sub。
+
+        :return: 相对开头的位置，找不到时返回 -1
+        '''
+        index = self._buffer.find(sub, self._start, self._end)
+        return index - self._start if index >= 0 else -1
+
+    def consume(self, size):
+        '''
+        消费开头的 size 个字节。
+        '''
+        self._start += size
+        if self._start >= self._end:
+            # 数据全部消费完时直接回到开头，不需要搬移
+            self._start = self._end = 0
+
+    def clear(self):
+        '''
+        丢弃全部未消费数据。
+        '''
+        self._start = self._end = 0
+
+    def _grow(self, size):
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+        logger.debug('接收缓冲区扩容: %d -> %d 字节', self.capacity, capacity)
+        # 已交给下游的旧切片仍引用旧的 bytearray，不受影响
+        buffer = bytearray(capacity)
+        pending = self._end - self._start
+        buffer[:pending] = self._view[self._start:self._end]
+        self._buffer = buffer
+        self._view = memoryview(buffer)
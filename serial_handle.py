@@ -1,20 +1,84 @@
 '''
     串口操作类
 '''
+import os
+import sys
+import time
+import array
+import select
+import socket
+import logging
+import threading
+import collections
+try:
+    import fcntl
+    import termios
+except ImportError:     # Windows
+    fcntl = termios = None
+
 import serial
 import serial.tools.list_ports
 
+from serial_writer import get_serial_writer
+from line_meter import LineMeter
 from logger import logger
 
+
+# TIOCGEXCL（Linux 3.8+，_IOR('T', 0x40, int)）读取 tty 是否已设置 TIOCEXCL，termios 模块没有导出该常量
+TIOCGEXCL = getattr(termios, 'TIOCGEXCL', 0x80045440 if sys.platform.startswith('linux') else None)
+
+
+def is_url(port):
+    '''
+    判断串口名是否为 pyserial 的 URL（例如 'socket://host:port'），而不是本地设备路径。
+    '''
+    return '://' in port
+
+
 class SerialOperator:
     '''
     串口操作类
     '''
-    def __init__(self):
+    MAX_WRITE_QUEUE = 64 * 1024     # 发送队列最多积压的字节数，超过后 send_data 拒绝新数据
+    WRITE_CHUNK = 4096              # 发送线程单次合并写出的最大字节数
+
+    def __init__(self, supervisor=None, writer=None):
+        '''
+        :param supervisor: 可选的重连监督对象（reconnect.ReconnectSupervisor），
+                           提供时收发出错后在后台重连，否则在出错的线程中直接重开串口
+        :param writer: 发送线程（serial_writer.SerialWriter），默认使用全局共享的发送线程
+        '''
         self.id = id(self)
         self._ser = None
         self._is_open = False
         self._opened_port = None
+        self._port_settings = None  # 最近一次打开串口的参数（open_serial_port 的关键字参数），重连时使用
+        self._tty_settings = {}     # 最近一次打开串口后实际生效的 tty 设置
+        self._saved_latency_timer = None    # (sysfs 路径, 原值)，低延迟模式改写 latency_timer 前的值，关闭时恢复
+        self._supervisor = supervisor
+        self._reconnect_lock = threading.RLock()
+        self._reconnecting = False
+        self._reconnected = threading.Event()
+        self._disconnected_at = None
+        self.reconnect_count = 0
+        self.last_receive_ns = None     # 最近一次读到数据的时刻，time.monotonic_ns()
+        self.last_reconnect_latency = None  # 最近一次重连耗时(s)
+        self.last_open_error = None     # 最近一次打开串口失败的原因
+        self.line_meter = LineMeter()   # 收发字节数和帧数的滑动窗口统计，打开串口时按波特率重建
+        self._read_timeouts = None  # 当前生效的 (timeout, inter_byte_timeout)，避免重复配置串口
+        self._writer = writer
+        self._write_queue = collections.deque()     # 待发送的数据块
+        self._write_queue_depth = 0                 # 发送队列中的字节数
+        self._write_lock = threading.Lock()
+        self._write_drained = threading.Condition(self._write_lock)
+        # 发送线程写串口时持有，关闭串口时持有：关闭等待正在进行的写入结束，之后发送线程不会再写这个句柄
+        self._flush_lock = threading.Lock()
+        self._write_enqueued = 0                    # 累计放入发送队列的字节数
+        self._write_completed = 0                   # 累计已写出（或丢弃）的字节数
+        self._write_callbacks = collections.deque() # (写完时 _write_completed 应达到的值, on_written)
+        self.bytes_sent = 0
+        self.write_batches = 0      # 实际调用写串口的次数，小于 send_data 调用次数说明发生了合并
+        self.bytes_dropped = 0      # 队列已满或串口断开而丢弃的字节数
 
     def __del__(self):
         self.close_serial_port()
@@ -36,8 +100,39 @@ class SerialOperator:
         :return: 如果串口已打开，返回 True；否则返回 False
         '''
         return self._is_open
+
+    @property
+    def tty_settings(self):
+        '''
+        获取最近一次打开串口后实际生效的 tty 设置，例如
+        {'low_latency': True, 'latency_timer_ms': 1, 'exclusive': True, 'vmin': 1, 'vtime': 0, ...}，
+        无法获取或平台不支持的项为 None。
+        '''
+        return dict(self._tty_settings)
+
+    @property
+    def is_reconnecting(self):
+        '''
+        获取串口是否已断开、正在后台重连的状态。
+        '''
+        return self._reconnecting
+
+    @property
+    def write_queue_depth(self):
+        '''
+        获取发送队列中尚未写出的字节数。
+        '''
+        return self._write_queue_depth
+
+    @property
+    def port_settings(self):
+        '''
+        获取最近一次打开串口的参数（open_serial_port 的关键字参数），从未打开过时返回 None。
+        '''
+        return dict(self._port_settings) if self._port_settings else None
     
-    def list_available_ports(self, description=False):
+    @staticmethod
+    def list_available_ports(description=False):
         '''
         获取可用的串口列表及其详细信息。
 
@@ -55,13 +150,24 @@ class SerialOperator:
         else:
             return [port.device for port in ports]
 
-    def open_serial_port(self, port:str, baudrate=115200, timeout=1):
+    def open_serial_port(self, port:str, baudrate=115200, timeout=1, low_latency=False, exclusive=None,
+                         inter_byte_timeout=None, rx_buffer_size=None, tx_buffer_size=None, rtscts=False,
+                         xonxoff=False):
         '''
         打开指定的串口。如果该串口已经打开，则先关闭它再重新打开。
 
-        :param port: 要打开的串口号，例如 'COM3' 或 '/dev/ttyUSB0'
+        :param port: 要打开的串口号，例如 'COM3' 或 '/dev/ttyUSB0'；也可以是 pyserial 的 URL，
+                     例如 'socket://192.168.1.20:4001'（串口服务器的原始 TCP 端口）、'rfc2217://host:port'、'loop://'
         :param baudrate: 串口通信的波特率，默认为 115200
         :param timeout: 串口操作的超时时间，单位为秒，默认为 1 秒
+        :param low_latency: 低延迟模式（Linux）：设置 ASYNC_LOW_LATENCY，并把 USB 转串口芯片（FTDI 等）
+                            的 latency_timer 从默认 16ms 调到 1ms（需要有 sysfs 写权限）
+        :param exclusive: 独占打开串口，其他进程无法再打开；为 None 时低延迟模式下默认独占
+        :param inter_byte_timeout: 字节间隔超时时间，单位为秒，对应 tty 的 VTIME（VMIN=1）
+        :param rx_buffer_size: 驱动接收缓冲区大小（仅 Windows 可设置）
+        :param tx_buffer_size: 驱动发送缓冲区大小（仅 Windows 可设置）
+        :param rtscts: 启用 RTS/CTS 硬件流控，下位机撤销 CTS 时暂停发送
+        :param xonxoff: 启用 XON/XOFF 软件流控（仅适用于不含 0x11/0x13 字节的数据）
         :return: 若成功打开串口，返回 True；若打开失败，返回 False
         '''
         # 提取实际的串口设备名
@@ -74,40 +180,234 @@ class SerialOperator:
             if self._is_open:
                 # 如果该实体已经打开了其他串口，先关闭它
                 self.close_serial_port()
-            self._ser = serial.Serial(port_name, baudrate, timeout=timeout)
+            if exclusive is None:
+                exclusive = low_latency
+            if is_url(port_name):
+                # pyserial URL 传输：socket://host:port、rfc2217://host:port、loop:// 等
+                self._ser = serial.serial_for_url(port_name, baudrate, timeout=timeout,
+                                                  inter_byte_timeout=inter_byte_timeout,
+                                                  rtscts=rtscts, xonxoff=xonxoff)
+            else:
+                self._ser = serial.Serial(port_name, baudrate, timeout=timeout,
+                                          inter_byte_timeout=inter_byte_timeout, exclusive=exclusive or None,
+                                          rtscts=rtscts, xonxoff=xonxoff)
+            self._read_timeouts = (timeout, inter_byte_timeout)
             if self._ser.is_open:
                 logger.debug('成功打开串口: %s', port_name)
                 self._is_open = True
+                self.last_open_error = None
+                self.line_meter = LineMeter(baudrate, self._ser.bytesize, self._ser.parity, self._ser.stopbits)
                 self._opened_port = port_name
+                self._port_settings = dict(port=port_name, baudrate=baudrate, timeout=timeout,
+                                           low_latency=low_latency, exclusive=exclusive,
+                                           inter_byte_timeout=inter_byte_timeout,
+                                           rx_buffer_size=rx_buffer_size, tx_buffer_size=tx_buffer_size,
+                                           rtscts=rtscts, xonxoff=xonxoff)
+                self._apply_tty_settings(low_latency, exclusive, rx_buffer_size, tx_buffer_size)
+                if low_latency:
+                    logger.info('串口 %s 低延迟模式生效设置: %s', port_name, self._tty_settings)
                 return True
             else:
                 logger.debug('打开串口 %s 失败', port_name)
+                self.last_open_error = 'port did not open'
                 return False
-        except serial.SerialException as e:
+        except (serial.SerialException, ValueError) as e:
             logger.debug('打开串口 %s 失败: %s', port_name, e)
+            self.last_open_error = str(e)
             return False
 
     def close_serial_port(self):
+        with self._reconnect_lock:
+            if self._reconnecting:
+                # 用户主动关闭，取消后台重连并唤醒等待重连的线程
+                self._reconnecting = False
+                if self._supervisor:
+                    self._supervisor.cancel(self)
+                self._reconnected.set()
         if self._ser and self._is_open:
-            self._ser.close()
+            # 唤醒阻塞在 receive_frame 中的读线程
+            self.cancel_read()
+            self._close_handle()
             logger.debug('串口%s已关闭', self._opened_port)
         else:
             logger.debug('没有打开的串口')
+        self._discard_write_queue()
+        self._restore_latency_timer()
         self._is_open = False
         self._opened_port = None
 
-    def send_data(self, data):
-        if self._ser and self._ser.is_open:
-            if isinstance(data, str):
-                data = data.encode()
-            try:
-                bytes_sent = self._ser.write(data)
-                logger.debug('已发送 %d 字节数据: [%s]', bytes_sent, SerialOperator.byte_array_to_hex_string(data))
-                return bytes_sent
-            except serial.SerialException as e:
-                logger.debug('发送数据时出错: %s，尝试重新开关串口', e)
-                self.serial_reopen()
-        return 0
+    def _close_handle(self):
+        '''
+        关闭底层串口句柄。持有 _flush_lock，等待发送线程正在进行的写入结束；置 _is_open 为 False 后
+        发送线程不会再写这个句柄，不会写到已关闭或被重新分配的文件描述符上。
+        调用方随后调用 _discard_write_queue()，清除发送线程中该串口的等待可写状态。
+        '''
+        with self._flush_lock:
+            self._is_open = False
+            self._ser.close()
+
+    def cancel_read(self):
+        '''
+        唤醒阻塞在 receive_frame/receive_into 中的读取，使其立即返回已收到的数据。
+
+        :return: 传输支持取消读取时返回 True；不支持时（socket:// 等）返回 False，读取要等到超时才返回
+        '''
+        if self._ser and self._is_open and hasattr(self._ser, 'cancel_read'):
+            self._ser.cancel_read()
+            return True
+        return False
+
+    def clear_cancel_read(self):
+        '''
+        清除尚未被读取消费的 cancel_read() 唤醒。pyserial 在 POSIX 上通过管道唤醒读取，没有读取在等待时
+        写入的字节会留在管道中，下一次读取会立即返回空数据；复用句柄前调用。
+        '''
+        abort_fd = getattr(self._ser, 'pipe_abort_read_r', None)
+        if abort_fd is None or not self._is_open:
+            return
+        try:
+            while os.read(abort_fd, 1000):
+                pass
+        except (BlockingIOError, OSError):
+            pass    # 管道已空（pyserial 把读端设为非阻塞）
+
+    @property
+    def can_cancel_read(self):
+        '''
+        传输是否支持 cancel_read()。
+        '''
+        return hasattr(self._ser, 'cancel_read')
+
+    def reset_input_buffer(self):
+        '''
+        丢弃驱动接收缓冲区中尚未读取的数据。
+        '''
+        if self._ser and self._is_open:
+            self._ser.reset_input_buffer()
+
+    def send_data(self, data, on_written=None):
+        '''
+        把数据放入发送队列，由发送线程在后台写出，立即返回，不会阻塞调用线程。
+
+        :param data: 要发送的数据，str 按 UTF-8 编码
+        :param on_written: 可选，这段数据的最后一个字节写入串口后在发送线程中调用 on_written(timestamp_ns)，
+                           timestamp_ns 为写入它的那次系统调用开始的时刻 time.monotonic_ns()；
+                           数据被丢弃（串口关闭或断开）时不调用
+        :return: 放入队列的字节数；串口未打开或发送队列已满时返回 0
+        '''
+        if not (self._ser and self._is_open):
+            return 0
+        if isinstance(data, str):
+            data = data.encode()
+        if not data:
+            return 0
+        with self._write_lock:
+            if self._write_queue_depth + len(data) > self.MAX_WRITE_QUEUE:
+                self.bytes_dropped += len(data)
+                logger.warning('串口 %s 发送队列已满（%d 字节），丢弃 %d 字节',
+                               self._opened_port, self._write_queue_depth, len(data))
+                return 0
+            self._write_queue.append(bytes(data))
+            self._write_queue_depth += len(data)
+            self._write_enqueued += len(data)
+            if on_written:
+                self._write_callbacks.append((self._write_enqueued, on_written))
+        if self._writer is None:
+            self._writer = get_serial_writer()
+        self._writer.submit(self)
+        return len(data)
+
+    def wait_write_drained(self, timeout=None):
+        '''
+        等待发送队列中的数据全部写出。
+
+        :param timeout: 最长等待时间，单位为秒，None 表示一直等待
+        :return: 队列已清空返回 True，超时返回 False
+        '''
+        with self._write_drained:
+            return self._write_drained.wait_for(lambda: not self._write_queue_depth, timeout)
+
+    def flush_write_queue(self):
+        '''
+        把发送队列中积压的数据合并后尽量写出，由发送线程调用。
+
+        :return: 串口暂时不可写（流控或内核发送缓冲区已满）且仍有数据待发送时返回文件描述符，
+                 调用方等待其可写后再次调用；否则返回 None
+        '''
+        while True:
+            with self._write_lock:
+                if not self._write_queue:
+                    self._write_drained.notify_all()
+                    return None
+                # 合并队列中的小块数据，一次系统调用写出
+                chunks, size = [], 0
+                while self._write_queue and size < self.WRITE_CHUNK:
+                    chunk = self._write_queue.popleft()
+                    chunks.append(chunk)
+                    size += len(chunk)
+                data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+            error = None
+            with self._flush_lock:
+                if not (self._ser and self._is_open):
+                    closed = True
+                else:
+                    closed = False
+                    fd = self.fileno()
+                    # 在写之前取时间：写串口的系统调用会释放 GIL，写完后再取可能晚于应答到达
+                    written_ns = time.monotonic_ns()
+                    try:
+                        if fd is not None:
+                            written = os.write(fd, data)
+                        else:
+                            written = self._ser.write(data) or len(data)
+                    except BlockingIOError:
+                        written = 0
+                    except (OSError, serial.SerialException) as e:
+                        error = e
+            if closed:
+                self._discard_write_queue()
+                return None
+            if error is not None:
+                # 在 _flush_lock 之外处理，handle_io_error 关闭句柄时需要获取它
+                logger.debug('发送数据时出错: %s', error)
+                self._discard_write_queue()
+                self.handle_io_error(error)
+                return None
+            callbacks = []
+            with self._write_lock:
+                self._write_queue_depth -= written
+                self._write_completed += written
+                if written < len(data):
+                    self._write_queue.appendleft(data[written:])
+                while self._write_callbacks and self._write_callbacks[0][0] <= self._write_completed:
+                    callbacks.append(self._write_callbacks.popleft()[1])
+            for on_written in callbacks:
+                on_written(written_ns)
+            if written:
+                self.bytes_sent += written
+                self.line_meter.add_tx(written)
+                self.write_batches += 1
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug('已发送 %d 字节数据: [%s]', written,
+                                 SerialOperator.byte_array_to_hex_string(data[:written]))
+            if written < len(data):
+                return fd
+
+    def _discard_write_queue(self):
+        '''
+        丢弃发送队列（串口关闭或断开时）。
+        '''
+        if self._writer:
+            self._writer.discard(self)
+        with self._write_lock:
+            if self._write_queue_depth:
+                self.bytes_dropped += self._write_queue_depth
+                logger.debug('串口 %s 丢弃未发送的 %d 字节', self._opened_port, self._write_queue_depth)
+            self._write_queue.clear()
+            self._write_queue_depth = 0
+            self._write_completed = self._write_enqueued
+            self._write_callbacks.clear()
+            self._write_drained.notify_all()
 
     def receive_data(self, size=None):
         if self._ser and self._ser.is_open:
@@ -117,25 +417,367 @@ class SerialOperator:
                 else:
                     data = self._ser.read(size)
                 if data:
+                    self.last_receive_ns = time.monotonic_ns()
+                    self.line_meter.add_rx(len(data))
                     logger.debug('接收到 %d 字节数据: [%s]', len(data), SerialOperator.byte_array_to_hex_string(data))
                 return data
             except serial.SerialException as e:
-                logger.debug('接收数据时出错: %s，尝试重新开关串口', e)
-                self.serial_reopen()
+                logger.debug('接收数据时出错: %s', e)
+                self.handle_io_error(e)
                     
         return b''
 
+    def receive_frame(self, size, timeout=0.5, inter_byte_timeout=0.01):
+        '''
+        阻塞接收一帧数据。线程在内核中等待（select / WaitCommEvent），直到收满 size 字节、
+        帧内字节间隔超过 inter_byte_timeout 或整帧等待超过 timeout 才返回，空闲时不会被唤醒。
+
+        :param size: 一帧的字节数
+        :param timeout: 等待整帧的超时时间，单位为秒，决定了停止线程时的最长响应时间
+        :param inter_byte_timeout: 帧内字节间隔超时时间，单位为秒，超时后返回已收到的不完整数据
+        :return: 接收到的数据，超时且没有数据时返回 b''
+        '''
+        if self._ser and self._ser.is_open:
+            try:
+                if self._read_timeouts != (timeout, inter_byte_timeout):
+                    # pyserial 每次修改超时都会重新配置串口，只在参数变化时设置
+                    self._ser.timeout = timeout
+                    self._ser.inter_byte_timeout = inter_byte_timeout
+                    self._read_timeouts = (timeout, inter_byte_timeout)
+                data = self._ser.read(size)
+                if data:
+                    self.last_receive_ns = time.monotonic_ns()
+                    self.line_meter.add_rx(len(data))
+                    logger.debug('接收到 %d 字节数据: [%s]', len(data), SerialOperator.byte_array_to_hex_string(data))
+                return data
+            except serial.SerialException as e:
+                logger.debug('接收数据时出错: %s', e)
+                self.handle_io_error(e)
+        return b''
+
+    def receive_into(self, buffer, size, timeout=0.5, inter_byte_timeout=0.01):
+        '''
+        阻塞接收数据，直接写入调用方预分配的缓冲区，不产生新的 bytes 对象。
+        等待规则与 receive_frame 相同：收满 size 字节、字节间隔超时或整帧超时后返回；
+        已有更多数据到达时会一并读入（最多填满 buffer），便于一次取出积压的多帧。
+
+        :param buffer: 可写的 memoryview，长度不小于 size
+        :param size: 至少需要的字节数（通常为补齐一帧所需的字节数）
+        :param timeout: 等待整帧的超时时间，单位为秒
+        :param inter_byte_timeout: 帧内字节间隔超时时间，单位为秒
+        :return: 实际写入的字节数，超时且没有数据时返回 0
+        '''
+        fd = self.fileno()
+        if fd is None:
+            # 没有文件描述符（Windows）时使用 pyserial 的 readinto
+            if self._ser and self._ser.is_open:
+                try:
+                    if self._read_timeouts != (timeout, inter_byte_timeout):
+                        self._ser.timeout = timeout
+                        self._ser.inter_byte_timeout = inter_byte_timeout
+                        self._read_timeouts = (timeout, inter_byte_timeout)
+                    received = self._ser.readinto(buffer[:size])
+                    if received:
+                        self.last_receive_ns = time.monotonic_ns()
+                        self.line_meter.add_rx(received)
+                    return received
+                except (OSError, serial.SerialException) as e:
+                    logger.debug('接收数据时出错: %s', e)
+                    self.handle_io_error(e)
+            return 0
+
+        # cancel_read() 通过该管道唤醒阻塞的读取
+        abort_fd = getattr(self._ser, 'pipe_abort_read_r', None)
+        read_fds = [fd] if abort_fd is None else [fd, abort_fd]
+        deadline = time.monotonic() + timeout
+        wait = timeout
+        received = 0
+        try:
+            while received < size:
+                ready, _, _ = select.select(read_fds, [], [], wait)
+                if not ready:
+                    break
+                if abort_fd in ready:
+                    os.read(abort_fd, 1000)
+                    break
+                try:
+                    count = os.readv(fd, [buffer[received:]])
+                except BlockingIOError:
+                    continue
+                if count == 0:
+                    raise serial.SerialException('device reports readiness to read but returned no data')
+                received += count
+                self.last_receive_ns = time.monotonic_ns()
+                self.line_meter.add_rx(count)
+                if inter_byte_timeout is not None:
+                    wait = inter_byte_timeout
+                else:
+                    wait = max(0, deadline - time.monotonic())
+        except (OSError, ValueError, serial.SerialException) as e:
+            logger.debug('接收数据时出错: %s', e)
+            self.handle_io_error(e)
+            return received
+        if received and logger.isEnabledFor(logging.DEBUG):
+            logger.debug('接收到 %d 字节数据: [%s]', received,
+                         SerialOperator.byte_array_to_hex_string(bytes(buffer[:received])))
+        return received
+
+    def fileno(self):
+        '''
+        获取底层串口的文件描述符，用于注册到 selectors/epoll。
+
+        :return: 文件描述符（socket:// 为套接字）；串口未打开、平台不支持（Windows）或传输没有文件描述符时返回 None
+        '''
+        if sys.platform == 'win32':
+            # Windows 的串口没有文件描述符，socket:// 的套接字句柄也不能用 os.read/os.readv/os.write，
+            # 收发都走 pyserial 的 readinto/write
+            return None
+        if self._ser and self._is_open:
+            try:
+                return self._ser.fileno()
+            except (AttributeError, OSError, ValueError, serial.SerialException):
+                # rfc2217://、loop:// 等 URL 传输没有可读的文件描述符
+                return None
+        return None
+
+    def receive_available(self, max_size=4096):
+        '''
+        非阻塞读取当前已经到达的数据，供 I/O 反应器在串口可读时调用。
+        与 receive_data 不同，出错时不会就地重开串口，而是抛出异常交给调用方处理。
+
+        :param max_size: 单次最多读取的字节数
+        :return: 读取到的数据，没有数据时返回 b''
+        :raises serial.SerialException: 串口已断开（可读但读不到数据）或读取出错
+        '''
+        fd = self.fileno()
+        if fd is None:
+            return self.receive_data()
+        try:
+            data = os.read(fd, max_size)
+        except BlockingIOError:
+            return b''
+        except OSError as e:
+            raise serial.SerialException(f'read failed: {e}') from e
+        self.last_receive_ns = time.monotonic_ns()
+        self.line_meter.add_rx(len(data))
+        if not data:
+            # 串口可读却读不到数据，说明设备已断开（例如拔掉了 USB）
+            raise serial.SerialException('device reports readiness to read but returned no data')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('接收到 %d 字节数据: [%s]', len(data), SerialOperator.byte_array_to_hex_string(data))
+        return data
+
     def serial_reopen(self):
         '''
         重新打开串口（收发异常时尝试）
         '''
         if self._ser and self._opened_port:
-            port = self._opened_port
+            settings = self._port_settings
             self.close_serial_port()
-            return self.open_serial_port(port)
+            return self.open_serial_port(**settings)
         else:
             logger.debug('没有打开的串口')
 
+    def _apply_tty_settings(self, low_latency, exclusive, rx_buffer_size, tx_buffer_size):
+        '''
+        应用低延迟和缓冲区设置，并记录实际生效的 tty 设置。设置失败（例如伪终端不支持 TIOCSSERIAL、
+        没有 sysfs 写权限）只记录日志，不影响串口使用。
+        '''
+        if is_url(self._opened_port):
+            self._tty_settings = self._apply_url_settings(low_latency)
+            return
+        settings = {'low_latency': None, 'latency_timer_ms': None, 'exclusive': bool(exclusive),
+                    'vmin': None, 'vtime': None, 'rx_buffer_size': None, 'tx_buffer_size': None}
+        if rx_buffer_size or tx_buffer_size:
+            if hasattr(self._ser, 'set_buffer_size'):
+                self._ser.set_buffer_size(rx_size=rx_buffer_size or 4096, tx_size=tx_buffer_size)
+                settings['rx_buffer_size'] = rx_buffer_size or 4096
+                settings['tx_buffer_size'] = tx_buffer_size
+            else:
+                logger.debug('当前平台不支持设置串口驱动缓冲区大小')
+
+        if sys.platform.startswith('linux'):
+            if low_latency:
+                try:
+                    self._ser.set_low_latency_mode(True)
+                except (AttributeError, OSError, ValueError) as e:
+                    logger.debug('串口 %s 设置 ASYNC_LOW_LATENCY 失败: %s', self._opened_port, e)
+            settings['low_latency'] = self._query_low_latency()
+            timer_path = self._latency_timer_path()
+            if timer_path:
+                original = self._read_latency_timer(timer_path)
+                if low_latency and original is not None and original != 1:
+                    try:
+                        with open(timer_path, 'w') as f:
+                            f.write('1')
+                        # 重连后再次设置时保留最初的值
+                        if not self._saved_latency_timer or self._saved_latency_timer[0] != timer_path:
+                            self._saved_latency_timer = (timer_path, original)
+                    except OSError as e:
+                        logger.debug('串口 %s 设置 latency_timer 失败: %s', self._opened_port, e)
+                settings['latency_timer_ms'] = self._read_latency_timer(timer_path)
+
+        fd = self.fileno()
+        if fd is None:
+            # Windows 的串口本身只能被一个进程打开
+            settings['exclusive'] = True if sys.platform == 'win32' else None
+        else:
+            applied = False
+            if exclusive and hasattr(termios, 'TIOCEXCL'):
+                # pyserial 的 exclusive 只是 flock 建议锁，TIOCEXCL 让内核拒绝其他进程再打开该 tty
+                try:
+                    fcntl.ioctl(fd, termios.TIOCEXCL)
+                    applied = True
+                except OSError as e:
+                    logger.debug('串口 %s 设置 TIOCEXCL 失败: %s', self._opened_port, e)
+            # 内核不支持 TIOCGEXCL 时以 TIOCEXCL 是否设置成功为准
+            exclusive_mode = self._query_exclusive(fd)
+            settings['exclusive'] = applied if exclusive_mode is None else exclusive_mode
+        if fd is not None:
+            try:
+                cc = termios.tcgetattr(fd)[6]
+                settings['vmin'] = cc[termios.VMIN] if isinstance(cc[termios.VMIN], int) else ord(cc[termios.VMIN])
+                settings['vtime'] = cc[termios.VTIME] if isinstance(cc[termios.VTIME], int) else ord(cc[termios.VTIME])
+            except termios.error as e:
+                logger.debug('读取串口 %s 的 termios 设置失败: %s', self._opened_port, e)
+        self._tty_settings = settings
+
+    def _apply_url_settings(self, low_latency):
+        '''
+        URL 传输没有 tty 设置；socket:// 低延迟模式下关闭 Nagle 算法，使短的请求帧立即发出。
+        '''
+        settings = {'transport': self._opened_port.split('://')[0], 'tcp_nodelay': None}
+        sock = getattr(self._ser, '_socket', None)
+        if sock is not None:
+            try:
+                if low_latency:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                settings['tcp_nodelay'] = bool(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+            except OSError as e:
+                logger.debug('串口 %s 设置 TCP_NODELAY 失败: %s', self._opened_port, e)
+        return settings
+
+    def _query_low_latency(self):
+        '''
+        通过 TIOCGSERIAL 查询 ASYNC_LOW_LATENCY 标志，不支持时返回 None。
+        '''
+        try:
+            buf = array.array('i', [0] * 32)
+            fcntl.ioctl(self._ser.fd, termios.TIOCGSERIAL, buf)
+            return bool(buf[4] & 0x2000)    # serial_struct.flags & ASYNC_LOW_LATENCY
+        except (AttributeError, OSError):
+            return None
+
+    def _query_exclusive(self, fd):
+        '''
+        通过 TIOCGEXCL 查询 tty 实际是否为独占模式，不支持时返回 None。
+        '''
+        if TIOCGEXCL is None:
+            return None
+        try:
+            buf = array.array('i', [0])
+            fcntl.ioctl(fd, TIOCGEXCL, buf)
+            return bool(buf[0])
+        except OSError:
+            return None
+
+    def _latency_timer_path(self):
+        '''
+        获取 USB 转串口芯片的 latency_timer sysfs 路径，不存在时返回 None。
+        '''
+        name = os.path.basename(os.path.realpath(self._opened_port))
+        path = f'/sys/class/tty/{name}/device/latency_timer'
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def _read_latency_timer(path):
+        try:
+            with open(path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _restore_latency_timer(self):
+        '''
+        恢复低延迟模式改写前的 latency_timer，其他程序打开该芯片时不受影响。
+        '''
+        if not self._saved_latency_timer:
+            return
+        path, value = self._saved_latency_timer
+        self._saved_latency_timer = None
+        try:
+            with open(path, 'w') as f:
+                f.write(str(value))
+            logger.debug('已恢复 %s 为 %d ms', path, value)
+        except OSError as e:
+            # 设备已拔出时 sysfs 节点不存在，驱动重新加载后本来就是默认值
+            logger.debug('恢复 %s 失败: %s', path, e)
+
+    def handle_io_error(self, error):
+        '''
+        处理收发错误。有重连监督对象时关闭损坏的句柄并交给后台重连，立即返回；
+        否则在当前线程中直接重开串口。用户已关闭串口时不做处理。
+
+        :param error: 收发时捕获的异常
+        '''
+        with self._reconnect_lock:
+            if not self._is_open:
+                return
+            if self._supervisor is None:
+                logger.debug('尝试重新开关串口%s', self._opened_port)
+                self.serial_reopen()
+                return
+            self._is_open = False
+            self._reconnecting = True
+            self._disconnected_at = time.monotonic()
+            self._reconnected.clear()
+            try:
+                self._close_handle()
+            except Exception as e:
+                logger.debug('关闭断开的串口%s时出错: %s', self._opened_port, e)
+            # 断开前排队的命令不再发送给重连后的设备
+            self._discard_write_queue()
+        logger.warning('串口%s收发出错: %s，交给后台重连', self._opened_port, error)
+        self._supervisor.request(self)
+
+    def try_reconnect(self):
+        '''
+        尝试重新打开断开的串口一次（由重连监督线程调用）。
+
+        :return: 重连成功或已取消重连时返回 True，打开失败返回 False
+        '''
+        with self._reconnect_lock:
+            if not self._reconnecting:
+                return True
+            settings = dict(self._port_settings)
+        # 打开串口可能阻塞到驱动超时，不持有锁，用户在界面线程中关闭串口时不必等待
+        opened = self.open_serial_port(**settings)
+        with self._reconnect_lock:
+            if not self._reconnecting:
+                # 打开期间用户已关闭串口（close_serial_port 取消了重连），关闭刚打开的句柄
+                if opened and self._is_open:
+                    logger.debug('串口%s重连期间已被关闭，放弃重连结果', self._opened_port)
+                    self.close_serial_port()
+                return True
+            if not opened:
+                return False
+            self._reconnecting = False
+            self.reconnect_count += 1
+            self.last_reconnect_latency = time.monotonic() - self._disconnected_at
+        self._reconnected.set()
+        return True
+
+    def wait_reconnected(self, timeout=None):
+        '''
+        等待后台重连结束。
+
+        :param timeout: 最长等待时间，单位为秒
+        :return: 串口已重新打开时返回 True
+        '''
+        if self._reconnecting:
+            self._reconnected.wait(timeout)
+        return self._is_open
+
     @staticmethod
     def byte_array_to_hex_string(byte_array):
         '''
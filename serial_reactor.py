@@ -0,0 +1,198 @@
+'''
+    串口 I/O 反应器
+    用一个线程 + selectors(Linux 下为 epoll) 监听所有已打开的串口，
+    替代每个串口一个接收线程的模型
+'''
+import os
+import selectors
+import threading
+
+import serial
+
+from serial_handle import SerialOperator
+from logger import logger
+
+
+class SerialReactor:
+    '''
+    串口 I/O 反应器。
+
+    所有串口的文件描述符注册到同一个 selector 中，反应器线程只在有串口可读时被唤醒，
+    一次唤醒读完所有就绪串口，并把数据交给各串口自己的解码回调。
+    仅支持能提供文件描述符的平台（Linux/macOS），Windows 下请继续使用 SerialThread。
+
+    回调均在反应器线程中执行，不能直接操作界面控件。
+    '''
+    READ_SIZE = 4096    # 单个串口单次最多读取的字节数
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        # 用管道唤醒阻塞在 select 中的反应器线程（注册/注销/停止）
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._pending = []  # 待反应器线程执行的 (操作, 参数)
+        self._lock = threading.Lock()
+        self._operators = {}  # fd -> SerialOperator
+        self._thread = None
+        self._running = False
+        self.wakeups = 0        # select 返回的次数
+        self.bytes_received = 0
+
+    @property
+    def port_count(self):
+        '''
+        获取当前注册的串口数量。
+        '''
+        return len(self._operators)
+
+    def register(self, operator: SerialOperator, on_data, on_error=None):
+        '''
+        注册一个已打开的串口。
+
+        :param operator: 已打开的串口操作对象
+        :param on_data: 数据回调 on_data(data, timestamp_ns)，每次读到数据时调用，
+                        timestamp_ns 为数据到达时刻 time.monotonic_ns()
+        :param on_error: 可选的错误回调 on_error(operator, exception)，串口断开或读取出错时调用，
+                         调用前串口已从反应器中注销
+        :return: 注册成功返回 True；串口未打开或平台不支持时返回 False
+        '''
+        fd = operator.fileno()
+        if fd is None:
+            logger.debug('串口 %s 没有可用的文件描述符，无法注册到反应器', operator.port)
+            return False
+        self._submit(self._do_register, (fd, operator, on_data, on_error))
+        return True
+
+    def unregister(self, operator: SerialOperator, wait=True):
+        '''
+        注销一个串口，注销后不再读取该串口的数据（不会关闭串口）。
+
+        :param wait: 等待反应器线程完成注销后再返回，之后可以安全地关闭串口（不会再读取已关闭或被复用的 fd）
+        '''
+        if threading.current_thread() is self._thread:
+            # 在回调中注销，直接执行
+            self._do_unregister(operator)
+            return
+        done = threading.Event()
+        self._submit(self._do_unregister, (operator, done))
+        if wait and self._thread and self._thread.is_alive():
+            done.wait()
+
+    def start(self):
+        '''
+        启动反应器线程。
+        '''
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='SerialReactor', daemon=True)
+        self._thread.start()
+        logger.debug('串口反应器线程启动')
+
+    def stop(self):
+        '''
+        停止反应器线程并等待其退出，已注册的串口保持打开。
+        '''
+        self._running = False
+        self._wakeup()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        logger.debug('串口反应器线程停止')
+
+    def close(self):
+        '''
+        停止反应器并释放 selector 和唤醒管道。
+        '''
+        self.stop()
+        self._selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def _submit(self, func, args):
+        with self._lock:
+            self._pending.append((func, args))
+        if self._thread and self._thread.is_alive():
+            self._wakeup()
+        else:
+            self._run_pending()
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            pass    # 管道已满，反应器线程必然会被唤醒
+
+    def _run_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for func, args in pending:
+            func(*args)
+
+    def _do_register(self, fd, operator, on_data, on_error):
+        if fd in self._operators:
+            self._selector.modify(fd, selectors.EVENT_READ, (operator, on_data, on_error))
+        else:
+            self._selector.register(fd, selectors.EVENT_READ, (operator, on_data, on_error))
+        self._operators[fd] = operator
+        logger.debug('串口 %s 注册到反应器, fd=%d', operator.port, fd)
+
+    def _do_unregister(self, operator, done=None):
+        for fd, registered in list(self._operators.items()):
+            if registered is operator:
+                self._selector.unregister(fd)
+                del self._operators[fd]
+                logger.debug('串口 %s 从反应器注销, fd=%d', operator.port, fd)
+        if done:
+            done.set()
+
+    def _run(self):
+        while self._running:
+            events = self._selector.select()
+            self.wakeups += 1
+            for key, _ in events:
+                if key.data is None:
+                    # 唤醒管道：清空后执行待处理的注册/注销操作
+                    try:
+                        while os.read(self._wakeup_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    self._run_pending()
+                    continue
+                operator, on_data, on_error = key.data
+                if self._operators.get(key.fd) is not operator:
+                    # 同一批事件中已被注销（注销后调用方可能已关闭串口），不再读取
+                    continue
+                try:
+                    data = operator.receive_available(self.READ_SIZE)
+                except serial.SerialException as e:
+                    logger.warning('串口 %s 读取失败，从反应器注销: %s', operator.port, e)
+                    self._do_unregister(operator)
+                    if on_error:
+                        on_error(operator, e)
+                    continue
+                if data:
+                    self.bytes_received += len(data)
+                    try:
+                        on_data(data, operator.last_receive_ns)
+                    except Exception as e:
+                        logger.error('串口 %s 数据回调出错: %s', operator.port, e)
+        # 停止时仍在等待的注册/注销操作就地执行，unregister(wait=True) 不会一直等待
+        self._run_pending()
+
+
+_reactor = None
+
+
+def get_serial_reactor():
+    '''
+    获取全局共享的串口反应器，反应器线程在第一次获取时启动。
+    '''
+    global _reactor
+    if _reactor is None:
+        _reactor = SerialReactor()
+        _reactor.start()
+    return _reactor
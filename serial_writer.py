@@ -0,0 +1,134 @@
+'''
+    串口发送线程
+    所有串口的发送队列由一个后台线程写出，调用 send_data 的界面线程和接收线程不会阻塞在写串口上
+'''
+import socket
+import selectors
+import threading
+
+from logger import logger
+
+
+class SerialWriter:
+    '''
+    串口发送线程，所有串口共用一个。
+
+    SerialOperator.send_data 把数据放入自己的发送队列并调用 submit()，立即返回；发送线程把队列中
+    积压的小块数据合并后一次写出。串口以非阻塞方式写入，内核发送缓冲区已满（例如硬件流控 CTS 无效、
+    收到 XOFF）时不再重试，而是用 selector 等待串口可写，其他串口的发送不受影响。
+    没有文件描述符的传输（Windows、rfc2217://、loop://）直接调用 pyserial 的 write。
+    '''
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        # 用一对套接字唤醒阻塞在 select 中的发送线程（Windows 的 select 只支持套接字，不能用管道）
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._ready = {}        # operator.id -> 有数据待发送的 SerialOperator
+        self._blocked = {}      # fd -> 等待可写的 SerialOperator
+        self._thread = None
+        self._running = False
+
+    def submit(self, operator):
+        '''
+        通知发送线程该串口的发送队列中有新数据，立即返回。
+        '''
+        with self._lock:
+            if any(blocked is operator for blocked in self._blocked.values()):
+                return  # 正在等待串口可写，可写后会一并发送
+            self._ready[operator.id] = operator
+            self._ensure_thread()
+        self._wakeup()
+
+    def discard(self, operator):
+        '''
+        串口关闭或断开时调用，取消该串口的等待可写和待发送状态。
+        SerialOperator 在关闭句柄之后调用，清除发送线程在关闭前刚登记的等待可写。
+        '''
+        with self._lock:
+            self._ready.pop(operator.id, None)
+            for fd, blocked in list(self._blocked.items()):
+                if blocked is operator:
+                    self._selector.unregister(fd)
+                    del self._blocked[fd]
+
+    def stop(self):
+        '''
+        停止发送线程，未发送的数据保留在各串口的发送队列中。
+        '''
+        self._running = False
+        self._wakeup()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='SerialWriter', daemon=True)
+            self._thread.start()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except BlockingIOError:
+            pass    # 套接字缓冲区已满，发送线程必然会被唤醒
+
+    def _run(self):
+        try:
+            self._serve()
+        except Exception:
+            # 记录下来，下一次 submit() 会重新启动发送线程，不会静默地只入队不发送
+            logger.exception('串口发送线程异常退出')
+
+    def _serve(self):
+        while self._running:
+            events = self._selector.select()
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self._wakeup_r.recv(512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                # 串口恢复可写
+                with self._lock:
+                    if self._blocked.get(key.fd) is not key.data:
+                        continue    # 已被 discard() 取消
+                    self._selector.unregister(key.fd)
+                    del self._blocked[key.fd]
+                    self._ready[key.data.id] = key.data
+            with self._lock:
+                ready, self._ready = self._ready, {}
+            for operator in ready.values():
+                fd = operator.flush_write_queue()
+                if fd is not None:
+                    with self._lock:
+                        if operator.is_open:    # 已关闭的串口不再等待可写
+                            self._register_blocked(fd, operator)
+
+    def _register_blocked(self, fd, operator):
+        if fd in self._blocked:
+            return
+        try:
+            self._selector.register(fd, selectors.EVENT_WRITE, operator)
+        except (ValueError, OSError) as e:
+            logger.debug('串口 %s 无法等待可写: %s', operator.port, e)
+            return
+        self._blocked[fd] = operator
+
+
+_writer = None
+
+
+def get_serial_writer():
+    '''
+    获取全局共享的串口发送线程，线程在第一次发送数据时启动。
+    '''
+    global _writer
+    if _writer is None:
+        _writer = SerialWriter()
+    return _writer
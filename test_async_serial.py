@@ -0,0 +1,72 @@
+'''
+    async_serial.AsyncSerialOperator 的测试：用伪终端模拟下位机，在普通 asyncio 事件循环中读取帧，
+    包括内置型号之外的帧长（插件型号，帧格式上限来自型号注册表）
+    运行: python -m pytest -q test_async_serial.py
+'''
+import os
+import sys
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='需要伪终端')
+
+from async_serial import AsyncSerialOperator
+from frame_schema import FrameSchema, Field, SCHEMAS
+from port_pool import get_port_pool
+
+
+@pytest.fixture
+def pty_port():
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    yield master, os.ttyname(slave)
+    get_port_pool().close_all()
+    os.close(slave)
+    os.close(master)
+
+
+def read_frames(port, size, payload, count, frame_limits=None):
+    async def run():
+        operator = AsyncSerialOperator()
+        operator.model.frame_limits = frame_limits
+        assert await operator.open(port)
+        os.write(payload[0], payload[1])
+        frames = []
+        for _ in range(count):
+            frame, timestamp_ns = await operator.read_frame(size, timeout=2)
+            frames.append(bytes(frame))
+        await operator.close()
+        return frames
+    return asyncio.run(run())
+
+
+def test_read_builtin_frames(pty_port):
+    master, port = pty_port
+    frame = bytes([60, 50, 30, 60, 90, 20])
+    frames = read_frames(port, 6, (master, frame * 3), 3, SCHEMAS['CYPD7299'].limits)
+    assert frames == [frame] * 3
+
+
+def test_read_plugin_frame_size(pty_port):
+    # 5 字节帧不在 FRAME_LIMITS 中，按 model.frame_limits（插件型号的帧格式）检查
+    master, port = pty_port
+    schema = FrameSchema('PLUGIN5', 5, [Field('pow', 0, maximum=100), Field('vol', 1, width=2),
+                                        Field('cur', 3, width=2)])
+    frame = bytes([60, 0xF4, 0x01, 0x2C, 0x01])
+    frames = read_frames(port, 5, (master, frame * 2), 2, schema.limits)
+    assert frames == [frame] * 2
+
+
+def test_read_frame_timeout(pty_port):
+    _, port = pty_port
+
+    async def run():
+        operator = AsyncSerialOperator()
+        assert await operator.open(port)
+        result = await operator.read_frame(5, timeout=0.1)
+        await operator.close()
+        return result
+    assert asyncio.run(run()) is None
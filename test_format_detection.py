@@ -0,0 +1,76 @@
+'''
+    SerialModel.detect_format 的测试：用伪终端模拟下位机，检查嗅探到的数据无论能否识别都不会丢失，
+    且重组出的帧保留各自的到达时刻，不会在丢帧检测中表现为一次积压
+    运行: python -m pytest -q test_format_detection.py
+'''
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='需要伪终端')
+
+from model import SerialModel
+from frame_schema import SCHEMAS
+from port_pool import get_port_pool
+
+FRAME = bytes([60, 50, 30, 60, 90, 20])     # CYPD7299
+
+
+@pytest.fixture
+def model_port():
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    model = SerialModel()
+    assert model.open_serial_port(os.ttyname(slave))
+    yield model, master
+    model.close_serial_port()
+    get_port_pool().close_all()
+    os.close(slave)
+    os.close(master)
+
+
+def send_frames(master, count, period):
+    def run():
+        for _ in range(count):
+            os.write(master, FRAME)
+            time.sleep(period)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def receive_all(model, size, count):
+    frames = []
+    deadline = time.monotonic() + 2
+    while len(frames) < count and time.monotonic() < deadline:
+        received, _ = model.receive_frame_with_message(size, timeout=0.1)
+        frames.extend((bytes(frame), timestamp_ns) for frame, timestamp_ns in received)
+    return frames
+
+
+def test_detected_frames_keep_arrival_time(model_port):
+    model, master = model_port
+    sender = send_frames(master, 40, 0.01)
+    schema = model.detect_format()
+    assert schema is SCHEMAS['CYPD7299']
+    frames = receive_all(model, schema.size, 40)
+    sender.join()
+    assert [frame for frame, _ in frames] == [FRAME] * 40
+    timestamps = [timestamp_ns for _, timestamp_ns in frames]
+    assert timestamps == sorted(timestamps)
+    assert len(set(timestamps)) > 30
+    assert model.gap_detector.bursts == 0
+
+
+def test_undetected_data_kept(model_port):
+    # 帧数不足以识别，按调用方使用的帧长重组
+    model, master = model_port
+    os.write(master, FRAME * 3)
+    assert model.detect_format(timeout=0.1, max_timeout=0.2) is None
+    model.frame_limits = SCHEMAS['CYPD7299'].limits
+    assert [frame for frame, _ in receive_all(model, 6, 3)] == [FRAME] * 3
@@ -0,0 +1,125 @@
+'''
+    frame_schema 编译出的解码函数的测试：与原来手写的逐字段换算（round(x / 10, 1)、round(vol * cur / 100, 2)、
+    0xFF 为无效值）逐值比较，覆盖数值/文本解码、带无效掩码的解码和 numpy 批量解码
+    运行: python -m pytest -q test_frame_schema.py
+'''
+import itertools
+import random
+
+import pytest
+
+from frame_schema import SCHEMAS, INVALID_BYTE
+
+# 型号 -> 每个口的 (协商功率, 电压, 电流) 字节偏移，与原来手写的解码代码一致
+PORT_OFFSETS = {
+    'CYPD7291': [(0, 1, 2), (3, 4, 5), (None, 6, 7), (None, 8, 9)],
+    'CYPD7299': [(0, 1, 2), (3, 4, 5)],
+}
+
+
+def baseline_decode(device, frame):
+    '''
+    原来手写的解码：电压、电流 round(x / 10, 1)，实时功率 round(vol * cur / 100, 2)，0xFF 为无效值（None）。
+    '''
+    values = []
+    for power, voltage, current in PORT_OFFSETS[device]:
+        vol, cur = frame[voltage], frame[current]
+        if power is not None:
+            values.append(None if frame[power] == INVALID_BYTE else frame[power])
+        values.append(None if vol == INVALID_BYTE else round(vol / 10, 1))
+        values.append(None if cur == INVALID_BYTE else round(cur / 10, 1))
+        values.append(None if INVALID_BYTE in (vol, cur) else round(vol * cur / 100, 2))
+    return tuple(values)
+
+
+def random_frames(device, count, invalid_rate=0.1, seed=0):
+    rnd = random.Random(seed)
+    size = SCHEMAS[device].size
+    return [bytes(INVALID_BYTE if rnd.random() < invalid_rate else rnd.randrange(INVALID_BYTE) for _ in range(size))
+            for _ in range(count)]
+
+
+def voltage_current_frames(device):
+    '''
+    每个口的电压、电流取遍 0~0xFF 的全部组合（包括 0xFF），其他字节固定。
+    '''
+    size = SCHEMAS[device].size
+    for vol, cur in itertools.product(range(256), repeat=2):
+        frame = bytearray(range(1, size + 1))
+        for _, voltage, current in PORT_OFFSETS[device]:
+            frame[voltage], frame[current] = vol, cur
+        yield bytes(frame)
+
+
+@pytest.mark.parametrize('device', sorted(SCHEMAS))
+def test_numeric_decoder_matches_baseline(device):
+    decode = SCHEMAS[device].compile()
+    for frame in voltage_current_frames(device):
+        assert decode(frame) == baseline_decode(device, frame), frame.hex()
+
+
+@pytest.mark.parametrize('device', sorted(SCHEMAS))
+def test_text_decoder_matches_baseline(device):
+    decode = SCHEMAS[device].compile(text=True)
+    for frame in random_frames(device, 2000):
+        expected = tuple(None if value is None else f'{value}' for value in baseline_decode(device, frame))
+        assert decode(frame) == expected, frame.hex()
+
+
+@pytest.mark.parametrize('device', sorted(SCHEMAS))
+def test_decoder_accepts_memoryview(device):
+    decode = SCHEMAS[device].compile()
+    frame = random_frames(device, 1)[0]
+    assert decode(memoryview(bytearray(frame))) == decode(frame)
+
+
+@pytest.mark.parametrize('device', sorted(SCHEMAS))
+def test_mask_matches_values(device):
+    schema = SCHEMAS[device]
+    decode, decode_mask = schema.compile(), schema.compile(mask=True)
+    for frame in random_frames(device, 2000, invalid_rate=0.2):
+        values, invalid = decode_mask(frame)
+        assert values == decode(frame)
+        # 第 i 位对应 outputs 中的第 i 个值，置位的值正好是 None 的值
+        expected = sum(1 << index for index, value in enumerate(values) if value is None)
+        assert invalid == expected, frame.hex()
+        assert set(schema.invalid_names(invalid)) == {name for name, value in zip(schema.outputs, values)
+                                                      if value is None}
+
+
+def test_invalid_input_invalidates_derived():
+    schema = SCHEMAS['CYPD7299']
+    frame = bytes((60, 200, INVALID_BYTE, 60, 200, 30))
+    values, invalid = schema.compile(mask=True)(frame)
+    assert values == (60, 20.0, None, None, 60, 20.0, 3.0, 60.0)
+    assert invalid == schema.bits['usb4_c1_cur'] | schema.bits['usb4_c1_cur_pow']
+    assert schema.compile(mask=True)(bytes(6))[1] == 0
+
+
+def test_compile_is_cached():
+    schema = SCHEMAS['CYPD7291']
+    assert schema.compile() is schema.compile()
+    assert schema.compile(text=True) is not schema.compile()
+    assert schema.compile(mask=True) is not schema.compile()
+
+
+@pytest.mark.parametrize('device', sorted(SCHEMAS))
+def test_batch_matches_per_frame(device):
+    np = pytest.importorskip('numpy')
+    schema = SCHEMAS[device]
+    decode = schema.compile(mask=True)
+    frames = list(voltage_current_frames(device)) + random_frames(device, 2000, invalid_rate=0.2)
+    result = schema.compile_batch()(b''.join(frames))
+    assert len(result) == len(frames)
+    for frame, row in zip(frames, result):
+        values, invalid = decode(frame)
+        assert int(row['invalid']) == invalid, frame.hex()
+        # 批量解码中无效值为 NaN
+        assert [None if np.isnan(row[name]) else float(row[name]) for name in schema.outputs] == list(values)
+
+
+def test_batch_rejects_partial_frame():
+    pytest.importorskip('numpy')
+    schema = SCHEMAS['CYPD7299']
+    with pytest.raises(ValueError):
+        schema.compile_batch()(bytes(schema.size + 1))
@@ -0,0 +1,67 @@
+'''
+    poll_scheduler.PollScheduler 的测试：用不接串口的假 SerialOperator 控制查询命令的写出时刻，
+    检查往返时间从实际写出时算起、超时请求迟到的应答不会匹配到后面的请求
+    运行: python -m pytest -q test_poll_scheduler.py
+'''
+import time
+
+import pytest
+
+from poll_scheduler import PollScheduler
+
+
+class FakeOperator:
+    '''
+    只记录 send_data 的假串口，auto_write 为 False 时由测试调用 on_written 模拟发送线程写出。
+    '''
+    def __init__(self, auto_write=True):
+        self.id = id(self)
+        self.port = 'fake'
+        self.is_open = True
+        self.auto_write = auto_write
+        self.sent = []      # 每个查询命令的 on_written
+
+    def send_data(self, data, on_written=None):
+        self.sent.append(on_written)
+        if self.auto_write:
+            on_written(time.monotonic_ns())
+        return len(data)
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = PollScheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_rtt_measured_from_write(scheduler):
+    operator = FakeOperator(auto_write=False)
+    target = scheduler.add(operator, b'\x01', interval=10, timeout=1)
+    wait_until(lambda: operator.sent)
+    # 尚未写出的请求不能完成，此时的帧不是它的应答
+    scheduler.on_frames(operator, 1, time.monotonic_ns())
+    assert target.unsolicited == 1 and target.responses == 0
+    sent_ns = time.monotonic_ns()
+    operator.sent[0](sent_ns)
+    scheduler.on_frames(operator, 1, sent_ns + 2_000_000)
+    assert target.responses == 1
+    assert target.last_rtt == pytest.approx(0.002)
+
+
+def test_late_response_not_matched_to_next_request(scheduler):
+    operator = FakeOperator()
+    target = scheduler.add(operator, b'\x01', interval=0, max_in_flight=1, timeout=0.2)
+    # 第一个请求超时后立即补发第二个
+    wait_until(lambda: target.timeouts == 1 and target.requests == 2)
+    scheduler.on_frames(operator, 1, time.monotonic_ns())
+    assert target.late == 1 and target.responses == 0
+    scheduler.on_frames(operator, 1, time.monotonic_ns())
+    assert target.responses == 1 and target.late == 1
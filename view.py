@@ -4,50 +4,18 @@
     并与controller之间传递数据
 '''
 import ctypes
-from PyQt5.QtGui import QIcon, QPixmap, QColor, QFontMetrics, QFont
+from PyQt5.QtGui import QIcon, QPixmap, QColor, QFont
 from PyQt5.QtWidgets import QWidget, QLabel, QLineEdit, QListWidgetItem, QPushButton, QComboBox
 from PyQt5.QtCore import Qt, QSize
 from Ui_horizontal import Ui_Form
 
-#导入串口模块
-from serial_handle import SerialOperator
+from my_QWidget import MyComboBoxControl
 from logger import logger
 
-class MyComboBoxControl(QComboBox):
-
-    def __init__(self, parent = None):
-        super(MyComboBoxControl,self).__init__(parent) #调用父类初始化方法
-
-    # 重写showPopup函数
-    def showPopup(self):  
-        # 获取原选项
-        index = self.currentIndex()
-        logger.info('当前索引:%d', index)
-        font_metrics = QFontMetrics(self.font())
-        # 先清空原有的选项
-        self.clear()
-        # 初始化串口列表
-        available_ports = SerialOperator().list_available_ports()
-        logger.info('可用串口:%s', available_ports)
-        # 添加关闭串口选项
-        # self.addItem('close')
-        max_width = 0
-        for port in available_ports:
-            self.addItem(port)
-
-            width = font_metrics.width(port) + 20
-            if max_width < width:
-                max_width = width
-        if max_width > self.maximumWidth():
-            self.view().setFixedWidth(width)
-
-        # if self.count() >= index:
-        #     self.setCurrentIndex(index)
-        #     logger.info('重置串口数据，设置索引:%d', index)
-        QComboBox.showPopup(self)   # 弹出选项框  
-
 class SerialView(QWidget):
     MAX_LOG_ITEMS = 100  # 设定最大日志项数
+    LINE_BUSY = 80  # 线路利用率(%)达到该值时提示接近饱和
+    INVALID_TEXT = '--'  # 无效值（FF）的显示文本
     BTN_CONNECT = 'connect'
     BTN_DISCONNECT = 'disconnect'
 
@@ -64,6 +32,7 @@ class SerialView(QWidget):
         self.setWindowIcon(QIcon(icon_path))
         self.init_panel()
         self.update_date = True # 用于控制是否更新数据，True时button显示暂停图片，False时button显示继续运行图片
+        self.shown_values = {}  # QLineEdit -> 当前显示的数值，数值不变时不重新格式化和写入
 
     def init_panel(self):
         '''
@@ -74,6 +43,7 @@ class SerialView(QWidget):
         # 初始化界面控件
         for i in range(1,7):
             self.set_led(i, False)
+            self.add_line_stats_label(i)
 
         self.ui.connectButton1.setText(self.BTN_CONNECT)
         self.ui.connectButton2.setText(self.BTN_CONNECT)
@@ -193,6 +163,7 @@ class SerialView(QWidget):
             cur_pow_edit = self.findChild(QLineEdit, f'curPowEdit{i}')
             if cur_pow_edit:
                 cur_pow_edit.setText('')
+        self.shown_values.clear()
         self.log_message('Data cleared') # ('清空数据')
 
     def change_portlabel_color(self, index, status):
@@ -228,6 +199,43 @@ class SerialView(QWidget):
         except:
             logger.debug('ledLabel%d不存在', index)
     
+    def add_line_stats_label(self, index):
+        '''
+            在led右侧添加显示线路利用率的标签 lineLabel{index}
+            index: 控件序号
+        '''
+        led = self.findChild(QLabel, f'ledLabel{index}')
+        if led is None or led.parentWidget().layout() is None:
+            logger.debug('ledLabel%d不存在', index)
+            return
+        label = QLabel(led.parentWidget())
+        label.setObjectName(f'lineLabel{index}')
+        label.setFont(led.font())
+        layout = led.parentWidget().layout()
+        layout.insertWidget(layout.indexOf(led) + 1, label)
+
+    def set_line_stats(self, index, text, utilization):
+        '''
+            显示线路利用率、每秒字节数和帧数，利用率超过 LINE_BUSY 时标红
+            index: 控件序号
+            text: 显示的文字
+            utilization: 接收方向的线路利用率(%)
+        '''
+        label = self.findChild(QLabel, f'lineLabel{index}')
+        if label:
+            label.setText(text)
+            label.setStyleSheet('color: #CC0000;' if utilization >= self.LINE_BUSY else '')
+
+    def set_led_tooltip(self, index, text):
+        '''
+            设置led的提示信息（接收线程负载等）
+            index: 控件序号
+            text: 提示信息
+        '''
+        led = self.findChild(QLabel, f'ledLabel{index}')
+        if led:
+            led.setToolTip(text)
+    
     def set_line_data(self, line_edit: QLineEdit, value):
         '''
             向界面的QLineEdit中写值（电压，电流，功率）
@@ -247,6 +255,36 @@ class SerialView(QWidget):
             except:
                 logger.debug('向控件写值 %s 失败', value)
 
+    def set_line_values(self, line_edits, values, invalid=0):
+        '''
+            向一组QLineEdit中写数值，数值在这里才格式化为文本
+            line_edits: QLineEdit 控件列表，为 None 的项不显示
+            values: 与 line_edits 一一对应的数值
+            invalid: 无效掩码，第 i 位置位时第 i 个控件显示 INVALID_TEXT
+
+            暂停更新时不做任何格式化；数值与当前显示的相同时跳过
+        '''
+        if not self.update_date:
+            return
+        shown = self.shown_values
+        for index, (line_edit, value) in enumerate(zip(line_edits, values)):
+            if line_edit is None:
+                continue
+            if invalid >> index & 1:
+                value = self.INVALID_TEXT
+            if shown.get(line_edit) == value:
+                continue
+            shown[line_edit] = value
+            line_edit.setText(str(value))
+
+    def clear_line_values(self, line_edits):
+        '''
+            清空一组QLineEdit（串口位置换接了其他型号时，清除上一个型号留下的数值）
+        '''
+        for line_edit in line_edits:
+            line_edit.setText('')
+            self.shown_values.pop(line_edit, None)
+
     def show_selected_combobox(self, combobox:QComboBox):
         '''
         显示选择的combobox的内容